@@ -170,7 +170,7 @@ def test_special_annotations():
         # ),
         (
             Argument("choice", annotation=Literal["run", "walk"]),
-            (["choice"], dict(choices=["run", "walk"])),
+            (["choice"], dict(choices={"run": "run", "walk": "walk"})),
         ),
         (
             Argument("list", annotation=list[int]),
@@ -384,3 +384,45 @@ def test_optional_setup_argument(
     argument.generate_call_arg(result.get(argument.name), args, kwargs)
     print("processed %r" % argument)
     assert (args, kwargs) == expected, f"{argument.name} failed"
+
+
+def test_file_and_path_metavars():
+    from pathlib import Path
+
+    from xntricweb.xapi.files import InputFile, OutputFile
+
+    assert gen(Argument("source", annotation=InputFile)) == (["source"], {})
+    assert gen(Argument("target", annotation=OutputFile | None, default=None)) == (
+        ["--target"],
+        _dd(None, metavar="FILE"),
+    )
+    assert gen(Argument("root", annotation=Path, default=None)) == (
+        ["--root"],
+        _dd(None, metavar="PATH"),
+    )
+
+
+def test_large_choice_sets():
+    from enum import Enum
+
+    Region = Enum("Region", {f"region-{i}": i for i in range(1000)})
+    args, kwargs = gen(Argument("region", annotation=Region))
+
+    assert args == ["region"]
+    assert "region-999" in kwargs["choices"] and "describe" not in kwargs["choices"]
+    assert kwargs["metavar"] == (
+        "{region-0,region-1,region-2,region-3,"
+        "region-4,region-5,region-6,region-7,... 992 more}"
+    )
+
+    _, kwargs = gen(Argument("small", annotation=Literal["a", "b"]))
+    assert list(kwargs["choices"]) == ["a", "b"] and "metavar" not in kwargs
+
+
+def test_annotated():
+    from typing import Annotated
+
+    assert gen(Argument("values", annotation=Annotated[list[int], "hint"])) == (
+        ["values"],
+        dict(nargs="*"),
+    )
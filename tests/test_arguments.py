@@ -1,3 +1,4 @@
+import sys
 from typing import Any
 import pytest
 from xntricweb.xapi.arguments import (
@@ -116,3 +117,128 @@ def test_arguments(case: TestParams, expected: ExpectedParams):
     # for case, expected in basic_test_cases:
     actual = _generate_arg(*case)
     assert actual == expected, f"{case} failed"
+
+
+def test_argument_is_immutable():
+    arg = Argument("".join(["na", "me"]), index=0, aliases=["n"])
+
+    assert arg.name is sys.intern("name")
+    assert arg.aliases == ("n",)
+    assert arg == Argument("name", index=0, aliases=("n",))
+    assert hash(arg) == hash(Argument("name", index=0, aliases=("n",)))
+
+    with pytest.raises(AttributeError):
+        arg.name = "other"  # type: ignore
+
+
+def test_bulk_conversion(monkeypatch: pytest.MonkeyPatch):
+    from xntricweb.xapi import arguments
+
+    values = [str(v) for v in range(1000)]
+
+    converted: list[Any] = []
+    convert = arguments._convert  # type: ignore
+
+    def tracking_convert(value: Any, annotation: Any):
+        converted.append(value)
+        return convert(value, annotation)
+
+    monkeypatch.setattr(arguments, "_convert", tracking_convert)
+
+    assert arguments._convert(values, list[int]) == list(range(1000))  # type: ignore
+    assert arguments._convert(values, tuple[float, ...]) == tuple(  # type: ignore
+        float(v) for v in range(1000)
+    )
+    assert arguments._convert(values, list[str]) == values  # type: ignore
+    assert len(converted) == 3
+
+    args, _ = _generate_arg(
+        Argument("values", index=0, vararg=True, annotation=int), values
+    )
+    assert args == list(range(1000))
+
+    with pytest.raises(ValueError):
+        arguments._convert(["1", "a"], list[int])  # type: ignore
+
+
+def test_array_conversion(tmp_path: Any, monkeypatch: pytest.MonkeyPatch):
+    import array
+    import io
+
+    from xntricweb.xapi.arguments import ConversionError
+
+    assert _convert(["1", "2.5"], array.array) == array.array("d", [1, 2.5])
+    assert _convert(["1", "2"], array.array[int]) == array.array("q", [1, 2])
+    typed = array.array["i"]  # type: ignore[name-defined]
+    assert _convert(["1", "2"], typed) == array.array("i", [1, 2])
+
+    source = tmp_path / "values.txt"
+    source.write_text("1 2\n3\n")
+    assert _convert([f"@{source}"], array.array[int]) == array.array("q", [1, 2, 3])
+
+    monkeypatch.setattr(sys, "stdin", io.StringIO("4 5"))
+    assert _convert(["-"], array.array[float]) == array.array("d", [4, 5])
+
+    with pytest.raises(ConversionError):
+        _convert(["1", "a"], array.array[int])
+
+
+def test_ndarray_conversion(tmp_path: Any):
+    np = pytest.importorskip("numpy")
+    npt = pytest.importorskip("numpy.typing")
+
+    from xntricweb.xapi.arguments import ConversionError
+
+    value = _convert(["1", "2", "3"], npt.NDArray[np.int32])
+    assert value.dtype == np.int32 and value.tolist() == [1, 2, 3]
+
+    value = _convert(["1.5", "2"], np.ndarray)
+    assert value.dtype == np.float64 and value.tolist() == [1.5, 2]
+
+    source = tmp_path / "values.txt"
+    source.write_text("1\n2\n")
+    assert _convert([f"@{source}"], npt.NDArray[np.float32]).tolist() == [1, 2]
+
+    with pytest.raises(ConversionError):
+        _convert(["1", "a"], npt.NDArray[np.float64])
+
+    args, kwargs = _generate_arg(
+        Argument("values", annotation=np.ndarray, default=None), ["1"]
+    )
+    assert args == [] and kwargs["values"].tolist() == [1]
+
+
+def test_choice_conversion():
+    from enum import Enum, IntEnum
+    from typing import Literal
+
+    from xntricweb.xapi.arguments import ConversionError
+
+    class Color(Enum):
+        red = "r"
+        green = "g"
+
+        def describe(self):
+            return self.name
+
+    class Level(IntEnum):
+        low = 1
+        high = 2
+
+    assert _convert("1", Literal[1, 2]) == 1
+    assert _convert(2, Literal[1, 2]) == 2
+    assert _convert("max", Literal["min", "max"]) == "max"
+    assert _convert("red", Color) is Color.red
+    assert _convert("g", Color) is Color.green
+    assert _convert(Color.red, Color) is Color.red
+    assert _convert("high", Level) is Level.high
+    assert _convert("1", Level) is Level.low
+    assert _convert(2, Level) is Level.high
+    assert _convert("1", Literal[1, True]) == 1
+    assert _convert("True", Literal[True]) is True
+
+    with pytest.raises(ConversionError):
+        _convert("3", Literal[1, 2])
+
+    with pytest.raises(ConversionError):
+        _convert("describe", Color)
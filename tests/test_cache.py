@@ -0,0 +1,150 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from xntricweb.xapi.cache import CachePolicy
+from xntricweb.xapi.files import InputFile
+from xntricweb.xapi.xapi import XAPI
+
+
+def test_cached_results(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    xapi = XAPI()
+    calls: list[int] = []
+    policy = CachePolicy(path=str(tmp_path / "results.sqlite3"))
+
+    @xapi.entrypoint(cache=policy)
+    def square(value: int):
+        calls.append(value)
+        return value * value
+
+    assert xapi.run(["square", "3"]) == 9
+    assert xapi.run(["square", "3"]) == 9
+    assert xapi.run(["square", "4"]) == 16
+    assert calls == [3, 4]
+
+    assert xapi.run(["square", "3", "--refresh"]) == 9
+    assert xapi.run(["square", "3", "--no-cache"]) == 9
+    assert calls == [3, 4, 3, 3]
+
+    assert xapi.run(["square", "3", "--cache-stats"]) == 9
+    assert capsys.readouterr().err.split() == [
+        "hits=2",
+        "misses=2",
+        "entries=2",
+        f"bytes={policy.stats(square)['bytes']}",
+    ]
+
+    policy.clear(square)
+    assert policy.stats(square) == {"hits": 0, "misses": 0, "entries": 0, "bytes": 0}
+
+
+def test_cache_across_threads(tmp_path: Path):
+    xapi = XAPI()
+    calls: list[int] = []
+
+    @xapi.entrypoint(cache=CachePolicy(path=str(tmp_path / "results.sqlite3")))
+    def square(value: int):
+        calls.append(value)
+        return value * value
+
+    assert xapi.run(["--concurrently", "square 2", "square 3", "square 4"]) == [
+        4,
+        9,
+        16,
+    ]
+    assert xapi.run(["square", "5"]) == 25
+    assert xapi.run(["--concurrently", "square 2", "square 5"]) == [4, 25]
+    assert sorted(calls) == [2, 3, 4, 5]
+
+
+def test_cache_hits_across_processes(tmp_path: Path):
+    app = tmp_path / "app.py"
+    app.write_text(
+        "import sys\n"
+        "from xntricweb.xapi import XAPI\n"
+        "from xntricweb.xapi.cache import CachePolicy\n\n"
+        "xapi = XAPI()\n\n"
+        f"@xapi.entrypoint(cache=CachePolicy(path={str(tmp_path / 'r.sqlite3')!r}))\n"
+        "def total(*values: int):\n"
+        "    return sum(v for v in values if v not in {'a', 'b', 'c'})\n\n"
+        "xapi.run(sys.argv[1:])\n"
+    )
+    root = str(Path(__file__).parent.parent)
+    for _ in range(3):
+        process = subprocess.run(
+            [sys.executable, str(app), "total", "1", "2", "--cache-stats"],
+            capture_output=True,
+            text=True,
+            env=os.environ | {"PYTHONPATH": root},
+            check=True,
+        )
+    assert process.stderr.split()[-4:-1] == ["hits=2", "misses=1", "entries=1"]
+
+
+def test_edited_inputs_miss(tmp_path: Path):
+    xapi = XAPI()
+    calls: list[str] = []
+    source = tmp_path / "input.txt"
+
+    @xapi.entrypoint(cache=CachePolicy(path=str(tmp_path / "results.sqlite3")))
+    def size(data: InputFile, other: Path):
+        calls.append(other.read_text())
+        return len(data.read())
+
+    source.write_text("abc")
+    argv = ["size", str(source), str(source)]
+    assert xapi.run(argv) == 3
+    assert xapi.run(argv) == 3
+    assert calls == ["abc"]
+
+    source.write_text("abcdef")
+    assert xapi.run(argv) == 6
+    assert calls == ["abc", "abcdef"]
+
+
+def test_cache_eviction(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    from xntricweb.xapi import cache
+
+    xapi = XAPI()
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", lambda: now[0])
+
+    policy = CachePolicy(ttl=10, max_entries=2, path=str(tmp_path / "r.sqlite3"))
+
+    @xapi.entrypoint(cache=policy)
+    def echo(value: str):
+        return value
+
+    for value in "abc":
+        now[0] += 1
+        xapi.run(["echo", value])
+    assert policy.stats(echo)["entries"] == 2
+
+    now[0] += 20
+    xapi.run(["echo", "c"])
+    assert policy.stats(echo)["misses"] == 4
+
+    sized = CachePolicy(max_bytes=100, path=str(tmp_path / "r.sqlite3"))
+
+    @xapi.entrypoint(cache=sized)
+    def blob(size: int):
+        return b"x" * size
+
+    xapi.run(["blob", "40"])
+    xapi.run(["blob", "50"])
+    assert sized.stats(blob)["entries"] == 1
+
+
+def test_uncachable_results(tmp_path: Path):
+    xapi = XAPI()
+    policy = CachePolicy(path=str(tmp_path / "results.sqlite3"))
+
+    @xapi.entrypoint(cache=policy)
+    def numbers(count: int):
+        return (n for n in range(count))
+
+    assert list(xapi.run(["numbers", "3"])) == [0, 1, 2]
+    assert policy.stats(numbers)["entries"] == 0
@@ -0,0 +1,160 @@
+import pytest
+
+from xntricweb.xapi.xapi import XAPI
+
+
+def test_chained_commands_share_results():
+    xapi = XAPI()
+    effects: list[str] = []
+
+    @xapi.effect
+    def verbose(level: str = "warning"):
+        effects.append(level)
+
+    @xapi.entrypoint
+    def load(count: int):
+        return list(range(count))
+
+    @xapi.entrypoint
+    def filter(rows: list[int], min: int = 0):
+        return [row for row in rows if row >= min]
+
+    @xapi.entrypoint(aliases=["sum"])
+    def summarize(rows: list[int], scale: int = 1):
+        return sum(rows) * scale
+
+    argv = ["load", "6", "::", "filter", "--min", "3", "::", "sum", "--scale", "2"]
+    assert xapi.run(["--level", "debug", *argv]) == 24
+    assert effects == ["debug"]
+
+
+class Table:
+    def __init__(self, rows: list[str]):
+        self.rows = rows
+
+
+def test_chained_values_are_not_converted():
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def read(*names: str):
+        return Table(list(names))
+
+    @xapi.entrypoint(chain_input="table")
+    def count(label: str = "rows", table: Table | None = None):
+        assert isinstance(table, Table)
+        return f"{label}={len(table.rows)}"
+
+    assert xapi.run(["read", "a", "b", "::", "count", "--label", "n"]) == "n=2"
+
+
+def test_chained_segments_are_parsed_first():
+    xapi = XAPI()
+    runs: list[int] = []
+
+    @xapi.entrypoint
+    def produce(value: int):
+        runs.append(value)
+        return value
+
+    @xapi.entrypoint
+    def consume(value: int, factor: int = 1):
+        return value * factor
+
+    @xapi.entrypoint(chain_input="value")
+    def scale(factor: int, value: int):
+        return value * factor
+
+    with pytest.raises(SystemExit):
+        xapi.run(["produce", "1", "::", "consume", "--unknown", "x"])
+    assert runs == []
+
+    @xapi.entrypoint
+    def stop():
+        pass
+
+    with pytest.raises(SystemExit) as exit:
+        xapi.run(["produce", "1", "::", "stop"])
+    assert exit.value.code == 2
+    with pytest.raises(SystemExit) as exit:
+        xapi.run(["produce", "1", "::"])
+    assert exit.value.code == 2
+    assert runs == []
+
+    assert xapi.run(["produce", "2", "::", "consume", "--factor", "3"]) == 6
+    assert xapi.run(["produce", "2", "::", "scale", "5"]) == 10
+
+
+def test_chained_positionals_with_choices_and_nargs():
+    from typing import Literal
+
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def pick(mode: Literal["a", "b"]):
+        return mode
+
+    @xapi.entrypoint
+    def pair(values: tuple[int, int]):
+        return values
+
+    @xapi.entrypoint
+    def echo(*words: str):
+        return list(words)
+
+    assert xapi.run(["pick", "a", "::", "pick"]) == "a"
+    assert xapi.run(["pair", "1", "2", "::", "pair"]) == (1, 2)
+    assert xapi.run(["pick", "b", "::", "pick", "::", "pick", "a"]) == "b"
+    assert xapi.run(["echo", "--", "a", "::", "b"]) == ["a", "::", "b"]
+
+
+def test_chained_nested_commands():
+    from xntricweb.xapi.entrypoint import Entrypoint
+
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def load(count: int):
+        return list(range(count))
+
+    @xapi.entrypoint
+    def grp2():
+        pass
+
+    @xapi.entrypoint(parent=grp2)
+    def sub(rows: list[int], scale: int = 1):
+        return sum(rows) * scale
+
+    class Grp(Entrypoint):
+        def leaf(self, rows: list[int]):
+            return len(rows)
+
+    xapi.entrypoint(Grp())
+
+    assert xapi.run(["load", "3", "::", "grp2", "sub", "--scale", "2"]) == 6
+    assert xapi.run(["load", "3", "::", "grp", "leaf"]) == 3
+
+
+def test_chained_effect_options_only_lead():
+    xapi = XAPI()
+    effects: list[str] = []
+
+    @xapi.effect
+    def verbose(level: str = "warning"):
+        effects.append(level)
+
+    @xapi.entrypoint
+    def load(count: int):
+        return list(range(count))
+
+    @xapi.entrypoint
+    def total(rows: list[int]):
+        return sum(rows)
+
+    assert xapi.run(["load", "3", "--level", "info", "::", "total"]) == 3
+    assert effects == ["info"]
+
+    with pytest.raises(SystemExit) as exit:
+        xapi.run(["load", "3", "::", "total", "--level", "debug"])
+    assert exit.value.code == 2
+    assert effects == ["info"]
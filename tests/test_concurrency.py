@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import pytest
+
+from xntricweb.xapi.xapi import XAPI
+
+
+def make_xapi(started: list[str], effects: list[str]):
+    xapi = XAPI()
+    barrier = threading.Barrier(2, timeout=5)
+
+    @xapi.effect
+    def region(region: str = "eu"):
+        effects.append(region)
+
+    @xapi.entrypoint
+    def sync(target: str, wait: bool = False):
+        started.append(target)
+        if wait:
+            # only passes when both waiting commands run at the same time
+            barrier.wait()
+        print(f"synced {target}")
+        return target.upper()
+
+    @xapi.entrypoint
+    def fail(code: int = 3):
+        print("failing")
+        raise SystemExit(code)
+
+    @xapi.entrypoint
+    async def fetch(target: str):
+        await asyncio.sleep(0)
+        print(f"fetched {target}")
+        return target
+
+    return xapi
+
+
+def test_concurrent_commands(capsys: pytest.CaptureFixture[str]):
+    started: list[str] = []
+    effects: list[str] = []
+    xapi = make_xapi(started, effects)
+
+    commands = ["sync a --wait", "sync b --wait", "sync c"]
+    results = xapi.run(["--region", "us", "--concurrently", *commands])
+
+    assert results == ["A", "B", "C"]
+    assert effects == ["us"]
+    assert sorted(started) == ["a", "b", "c"]
+    # output is written per command, in order
+    assert capsys.readouterr().out == "synced a\nsynced b\nsynced c\n"
+
+
+@pytest.mark.parametrize("runner", ["thread", "asyncio"])
+def test_concurrent_exit_codes(runner: str, capsys: pytest.CaptureFixture[str]):
+    xapi = make_xapi([], [])
+
+    commands = ["fetch x", "fail --code 4", "sync y", "fail"]
+    with pytest.raises(SystemExit) as e:
+        xapi.run(["--runner", runner, "--jobs", "2", "--concurrently", *commands])
+
+    assert e.value.code == 4
+    output = capsys.readouterr()
+    assert output.out == "fetched x\nfailing\nsynced y\nfailing\n"
+    assert "fail --code 4: failed with exit code 4" in output.err
+    assert "fail: failed with exit code 3" in output.err
+
+
+@pytest.mark.parametrize("jobs", ["0", "-2"])
+def test_bad_jobs(jobs: str):
+    xapi = make_xapi([], [])
+
+    with pytest.raises(SystemExit) as e:
+        xapi.run(["--jobs", jobs, "--concurrently", "fetch x", "sync y"])
+    assert e.value.code == 2
+
+
+def test_commands_are_parsed_first():
+    started: list[str] = []
+    xapi = make_xapi(started, [])
+
+    with pytest.raises(SystemExit):
+        xapi.run(["--concurrently", "sync a", "sync --unknown"])
+    assert started == []
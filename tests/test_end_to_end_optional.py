@@ -320,6 +320,27 @@ def test_enum():
     assert_called(case, 2)
 
 
+def test_enum_by_value(capsys: pytest.CaptureFixture[str]):
+    from enum import IntEnum
+
+    xapi = XAPI()
+
+    class Level(IntEnum):
+        low = 1
+        high = 2
+
+    @xapi.entrypoint
+    def case(level: Level = Level.low):
+        return level
+
+    assert xapi.run(["case", "--level", "2"], exit_on_error=False) is Level.high
+    assert xapi.run(["case", "--level", "high"], exit_on_error=False) is Level.high
+
+    with pytest.raises(SystemExit):
+        xapi.run(["case", "--help"])
+    assert "--level {low,high}" in capsys.readouterr().out
+
+
 def test_class_optional():
     xapi = XAPI()
 
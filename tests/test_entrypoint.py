@@ -122,3 +122,136 @@ def test_fn_details():
 
     assert _get_fn_details(testfn) == dict(name="testfn", description="test1")
     assert _get_fn_details(testclass) == dict(name="testclass", description="test2")
+
+
+def test_entrypoint_compact_registry():
+    from xntricweb.xapi.entrypoint import Entrypoint
+
+    def fn(a: int, b: int = 2):
+        pass
+
+    first = Entrypoint.from_function(fn)
+    second = Entrypoint.from_function(fn)
+
+    assert isinstance(first.arguments, tuple)
+    assert first.entrypoints == ()
+    assert first != second and first == first
+    assert len({first: 1, second: 2}) == 2
+    assert not vars(first)
+
+    with pytest.raises(AttributeError):
+        first.name = "other"  # type: ignore
+    with pytest.raises(AttributeError):
+        first.entrypoints = []  # type: ignore
+    with pytest.raises(AttributeError):
+        del first.arguments
+
+
+def test_subclass_discovery_is_lazy_and_cached(monkeypatch: pytest.MonkeyPatch):
+    from xntricweb.xapi import entrypoint as module
+    from xntricweb.xapi.entrypoint import Entrypoint
+
+    introspected: list[Callable[..., Any]] = []
+    inspect_fn = module._inspect  # type: ignore
+
+    def tracking_inspect(fn: Callable[..., Any]):
+        introspected.append(fn)
+        return inspect_fn(fn)
+
+    monkeypatch.setattr(module, "_inspect", tracking_inspect)
+
+    class Group(Entrypoint):
+        _exclude_entries_ = ["skipped"]
+
+        def add(self, a: int, b: int = 1):
+            return a + b
+
+        def skipped(self):
+            pass
+
+    first = Group()
+    second = Group()
+    assert introspected == []
+    assert first.name == "group"
+
+    assert [e.name for e in first.entrypoints] == ["add"]
+    assert [e.name for e in second.entrypoints] == ["add"]
+    assert len(introspected) == 1
+    assert Group._exclude_entries_ == ["skipped"]
+
+    assert second.entrypoints[0](1, b=2) == 3
+    assert second.entrypoints[0].entrypoint.__self__ is second  # type: ignore
+
+
+def test_introspection_cache(monkeypatch: pytest.MonkeyPatch):
+    from xntricweb.xapi import entrypoint as module
+    from xntricweb.xapi.entrypoint import Entrypoint
+
+    introspected: list[Callable[..., Any]] = []
+    inspect_fn = module._inspect  # type: ignore
+
+    def tracking_inspect(fn: Callable[..., Any]):
+        introspected.append(fn)
+        return inspect_fn(fn)
+
+    monkeypatch.setattr(module, "_inspect", tracking_inspect)
+
+    def make(default: int = 2):
+        def fn(a: int, b: int = default):
+            pass
+
+        return fn
+
+    first = Entrypoint.from_function(make())
+    second = Entrypoint.from_function(make())
+    assert len(introspected) == 1
+    assert first.arguments is second.arguments
+
+    changed = Entrypoint.from_function(make(3))
+    assert len(introspected) == 2
+    assert changed.arguments[1].default == 3
+
+    Entrypoint.invalidate_introspection(first)
+    Entrypoint.from_function(make(3))
+    assert len(introspected) == 3
+
+    Entrypoint.invalidate_introspection()
+    Entrypoint.from_function(make(3))
+    assert len(introspected) == 4
+
+
+def test_introspection_cache_compares_defaults_by_type(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    from xntricweb.xapi import entrypoint as module
+    from xntricweb.xapi.entrypoint import Entrypoint
+
+    introspected: list[Callable[..., Any]] = []
+    inspect_fn = module._inspect  # type: ignore
+
+    def tracking_inspect(fn: Callable[..., Any]):
+        introspected.append(fn)
+        return inspect_fn(fn)
+
+    monkeypatch.setattr(module, "_inspect", tracking_inspect)
+
+    class Ambiguous:
+        def __eq__(self, other: Any):
+            raise ValueError("ambiguous truth value")
+
+    def make(default: Any):
+        def fn(a: Any = default, *, b: Any = default):
+            pass
+
+        return fn
+
+    assert type(Entrypoint.from_function(make(1)).arguments[0].default) is int
+    assert Entrypoint.from_function(make(True)).arguments[0].default is True
+    assert Entrypoint.from_function(make(True)).arguments[1].default is True
+    assert len(introspected) == 2
+
+    value = Ambiguous()
+    Entrypoint.from_function(make(value))
+    Entrypoint.from_function(make(value))
+    Entrypoint.from_function(make(Ambiguous()))
+    assert len(introspected) == 4
@@ -0,0 +1,113 @@
+import io
+import mmap
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from xntricweb.xapi.arguments import ConversionError, _convert  # type: ignore
+from xntricweb.xapi.files import InputFile, MappedFile, OutputFile
+from xntricweb.xapi.xapi import XAPI
+
+
+def test_mapped_file(tmp_path: Path):
+    source = tmp_path / "data.bin"
+    source.write_bytes(b"header\nbody\n")
+
+    xapi = XAPI()
+    mapped: list[Any] = []
+
+    @xapi.entrypoint
+    def scan(data: MappedFile, raw: mmap.mmap | None = None):
+        mapped.extend((data, raw))
+        return data.find(b"body")
+
+    assert xapi.run(["scan", str(source), "--raw", str(source)]) == 7
+    assert isinstance(mapped[0], MappedFile) and mapped[0].closed
+    assert type(mapped[1]) is mmap.mmap and mapped[1].closed
+
+
+def test_mapped_file_errors(tmp_path: Path):
+    empty = tmp_path / "empty.bin"
+    empty.touch()
+
+    with pytest.raises(ConversionError):
+        _convert(str(empty), MappedFile)
+
+    with pytest.raises(ConversionError):
+        _convert(str(tmp_path / "missing.bin"), MappedFile)
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz", ".bz2", ".xz"])
+def test_input_output_files(tmp_path: Path, suffix: str):
+    source = str(tmp_path / f"in{suffix}")
+    target = str(tmp_path / f"out{suffix}")
+
+    xapi = XAPI()
+    files: list[Any] = []
+
+    @xapi.entrypoint
+    def copy(source: InputFile, target: OutputFile | None = None):
+        files.extend((source, target))
+        assert target and not source.opened and not target.opened
+        for line in source:
+            target.write(line.upper())
+
+    @xapi.entrypoint
+    def write(target: OutputFile):
+        target.write(b"a\nb\n")
+
+    @xapi.entrypoint
+    def read(source: InputFile):
+        return source.read()
+
+    xapi.run(["write", source])
+    xapi.run(["copy", source, "--target", target])
+    assert all(file.opened and file.closed for file in files)
+    assert xapi.run(["read", target]) == b"A\nB\n"
+
+
+def test_input_file_stdio(monkeypatch: pytest.MonkeyPatch):
+    stdin = io.TextIOWrapper(io.BytesIO(b"data"))
+    stdout = io.TextIOWrapper(io.BytesIO())
+    monkeypatch.setattr(sys, "stdin", stdin)
+    monkeypatch.setattr(sys, "stdout", stdout)
+
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def echo(source: InputFile, target: OutputFile):
+        target.write(source.read())
+
+    xapi.run(["echo", "-", "-"])
+    assert not stdin.closed and not stdout.closed
+    assert stdout.buffer.getvalue() == b"data"  # type: ignore
+
+
+def test_lazy_file_conversion(tmp_path: Path):
+    missing = tmp_path / "missing.txt"
+    source = _convert(str(missing), InputFile)
+    assert isinstance(source, InputFile) and source.path == str(missing)
+
+    with pytest.raises(FileNotFoundError):
+        source.read()
+
+    assert _convert(None, Path | None) is None
+    assert _convert(str(missing), Path) == missing
+
+
+def test_lazy_file_inspection_does_not_open(tmp_path: Path):
+    target = tmp_path / "out.txt"
+    output = OutputFile(target, buffer_size=16)
+
+    assert output.name == output.path == str(target)
+    assert output.mode == "wb" and output.buffer_size == 16
+    assert not output.closed and "out.txt" in repr(output)
+    assert not hasattr(output, "missing")
+    assert not output.opened and not target.exists()
+
+    output.close()
+    assert output.closed and not target.exists()
+    with pytest.raises(ValueError):
+        output.write(b"data")
@@ -0,0 +1,91 @@
+import pytest
+
+from xntricweb.xapi.hooks import HookEvent, Hooks
+from xntricweb.xapi.xapi import XAPI
+
+
+def test_hook_order():
+    xapi = XAPI()
+    events: list[HookEvent] = []
+
+    for name in (
+        "on_registered",
+        "before_parse",
+        "after_parse",
+        "before_convert",
+        "before_effect",
+        "before_execute",
+        "after_execute",
+    ):
+        xapi.hook(name, events.append)  # type: ignore
+
+    @xapi.effect
+    def effect(verbose: bool = False):
+        pass
+
+    @xapi.entrypoint
+    def case(value: int):
+        return value * 2
+
+    assert xapi.run(["case", "21"]) == 42
+    assert [(e.name, e.entrypoint and e.entrypoint.name) for e in events] == [
+        ("on_registered", "effect"),
+        ("on_registered", "case"),
+        ("before_parse", None),
+        ("after_parse", "case"),
+        ("before_effect", "effect"),
+        ("before_convert", "effect"),
+        ("before_execute", "effect"),
+        ("after_execute", "effect"),
+        ("before_convert", "case"),
+        ("before_execute", "case"),
+        ("after_execute", "case"),
+    ]
+
+    before_execute, after_execute = events[-2:]
+    assert before_execute.args == [21]
+    assert before_execute.elapsed is not None
+    assert after_execute.result == 42
+    assert after_execute.elapsed is not None
+
+
+def test_hook_decorator_and_error():
+    xapi = XAPI()
+    errors: list[BaseException] = []
+
+    @xapi.hook("on_error")
+    def on_error(event: HookEvent):
+        assert event.entrypoint is case
+        errors.append(event.error)  # type: ignore
+
+    @xapi.entrypoint
+    def case():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        xapi.run(["case"])
+
+    assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+
+
+def test_hooks_registry():
+    hooks = Hooks()
+    assert not hooks
+    assert hooks.emit("before_parse") is None
+
+    def hook(_: HookEvent):
+        pass
+
+    hooks.add("before_parse", hook)
+    assert hooks and "before_parse" in hooks
+    event = hooks.emit("before_parse", argv=["a"])
+    assert event and event.name == "before_parse" and event.argv == ["a"]
+
+    hooks.remove("before_parse", hook)
+    assert not hooks
+
+    with pytest.raises(ValueError):
+        hooks.add("before_everything", hook)  # type: ignore
+
+    with pytest.raises(KeyError):
+        hooks.remove("before_parse", hook)
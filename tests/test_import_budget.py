@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from xntricweb.xapi.testing import StartupProfile, measure_startup
+
+IMPORT_TIME_BUDGET = 0.3
+"""Seconds ``import xntricweb.xapi`` may take in a fresh interpreter."""
+
+MODULE_BUDGET = 55
+"""Modules ``import xntricweb.xapi`` may add to ``sys.modules``."""
+
+
+timing = pytest.mark.skipif(
+    not os.environ.get("XAPI_TIMING_TESTS"),
+    reason="wall clock budgets are opt-in, set XAPI_TIMING_TESTS=1",
+)
+
+
+@pytest.fixture(scope="module")
+def imported() -> StartupProfile:
+    return measure_startup("xntricweb.xapi")
+
+
+@timing
+def test_import_time(imported: StartupProfile):
+    assert imported.elapsed_ms < IMPORT_TIME_BUDGET * 1000
+
+
+def test_import_module_count(imported: StartupProfile):
+    assert len(imported.modules) <= MODULE_BUDGET, sorted(imported.modules)
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["argparse", "inspect", "json", "datetime", "dataclasses", "docstring_parser"],
+)
+def test_heavy_modules_deferred(imported: StartupProfile, module: str):
+    assert module not in imported.modules
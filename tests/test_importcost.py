@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from xntricweb.xapi.importcost import measure, parse_importtime
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_parse_importtime():
+    records = parse_importtime(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:        10 |         10 |     leaf",
+            "import time:        20 |         30 |   middle",
+            "import time:         5 |          5 |   sibling",
+            "import time:       100 |        135 | top",
+            "unrelated stderr output",
+            "import time:         7 |          7 | other",
+        ]
+    )
+
+    assert [record.name for record in records] == ["top", "other"]
+    top = records[0]
+    assert [child.name for child in top.children] == ["middle", "sibling"]
+    assert top.children[0].children[0].name == "leaf"
+    assert [record.name for record in top.walk()] == [
+        "top",
+        "middle",
+        "leaf",
+        "sibling",
+    ]
+
+
+@pytest.fixture
+def app(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    (tmp_path / "slowdep.py").write_text("import time\ntime.sleep(0.05)\n")
+    (tmp_path / "heavy_commands.py").write_text(
+        "import slowdep\n\n\ndef report(path: str):\n    pass\n"
+    )
+    (tmp_path / "light_commands.py").write_text("def ping():\n    pass\n")
+    (tmp_path / "app.py").write_text(
+        "from xntricweb.xapi import XAPI\n"
+        "from heavy_commands import report\n"
+        "from light_commands import ping\n\n"
+        "xapi = XAPI()\n"
+        "xapi.entrypoint(report)\n"
+        "xapi.entrypoint(ping)\n"
+    )
+    path = os.pathsep.join([str(tmp_path), str(ROOT)])
+    monkeypatch.setenv("PYTHONPATH", path)
+    return tmp_path
+
+
+def test_measure_attributes_commands(app: Path):
+    target, costs, _ = measure("app:xapi")
+
+    assert target == "app"
+    assert [cost.module for cost in costs] == ["heavy_commands", "light_commands"]
+    heavy = costs[0]
+    assert heavy.commands == ["report"]
+    assert heavy.cumulative_us >= 50_000
+    assert heavy.heaviest(1)[0].name == "slowdep"
+
+
+def test_imports_command(app: Path):
+    output = subprocess.run(
+        [sys.executable, "-m", "xntricweb.xapi", "imports", "app:xapi", "--top", "1"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+
+    assert output[0].endswith("app (total)")
+    assert output[1].endswith("heavy_commands: report")
+    assert output[2].strip().endswith("slowdep")
+    assert output[3].endswith("light_commands: ping")
+
+
+def test_imports_command_reports_failed_imports(app: Path):
+    process = subprocess.run(
+        [sys.executable, "-m", "xntricweb.xapi", "imports", "missing_app:xapi"],
+        capture_output=True,
+        text=True,
+    )
+
+    assert process.returncode == 2
+    assert process.stderr.splitlines()[-1] == (
+        "python -m xntricweb.xapi imports: error: Importing missing_app:xapi"
+        " failed: ModuleNotFoundError: No module named 'missing_app'"
+    )
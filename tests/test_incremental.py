@@ -0,0 +1,142 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from xntricweb.xapi.files import InputFile, OutputFile
+from xntricweb.xapi.xapi import XAPI
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("XAPI_CACHE_DIR", str(tmp_path / "cache"))
+
+
+def test_skips_up_to_date_outputs(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    source = tmp_path / "source.txt"
+    target = tmp_path / "target.txt"
+    source.write_text("data")
+
+    xapi = XAPI()
+    runs: list[str] = []
+
+    @xapi.entrypoint(inputs=["source"], outputs=["target"])
+    def build(source: InputFile, target: OutputFile):
+        runs.append(source.path)
+        target.write(source.read().upper())
+
+    xapi.run(["build", str(source), str(target)])
+    assert target.read_text() == "DATA" and len(runs) == 1
+
+    assert xapi.run(["build", str(source), str(target)]) is None
+    assert len(runs) == 1
+    assert "build: skipped (up to date)" in capsys.readouterr().err
+
+    # touched but unchanged inputs match the stamp of the last run
+    os.utime(source, ns=(0, os.stat(target).st_mtime_ns + 10**9))
+    xapi.run(["build", str(source), str(target)])
+    assert len(runs) == 1
+
+    source.write_text("changed")
+    os.utime(source, ns=(0, os.stat(target).st_mtime_ns + 10**9))
+    xapi.run(["build", str(source), str(target)])
+    assert target.read_text() == "CHANGED" and len(runs) == 2
+
+    xapi.run(["build", str(source), str(target), "--force"])
+    assert len(runs) == 3
+
+
+def test_missing_outputs_and_path_lists(tmp_path: Path):
+    sources = [tmp_path / f"{name}.txt" for name in "ab"]
+    for source in sources:
+        source.write_text(source.stem)
+    target = tmp_path / "joined.txt"
+
+    xapi = XAPI()
+    runs: list[int] = []
+
+    @xapi.entrypoint(inputs=["sources"], outputs=["target"])
+    def join(target: Path, *sources: Path):
+        runs.append(len(sources))
+        target.write_text("".join(source.read_text() for source in sources))
+
+    xapi.run(["join", str(target), *map(str, sources)])
+    xapi.run(["join", str(target), *map(str, sources)])
+    assert runs == [2]
+
+    target.unlink()
+    xapi.run(["join", str(target), *map(str, sources)])
+    assert runs == [2, 2]
+
+
+def test_unknown_declared_argument():
+    xapi = XAPI()
+
+    with pytest.raises(ValueError):
+
+        @xapi.entrypoint(outputs=["missing"])
+        def build(target: str):
+            pass
+
+
+def test_changed_arguments_rerun(tmp_path: Path):
+    source = tmp_path / "source.txt"
+    target = tmp_path / "target.txt"
+    source.write_text("data")
+
+    xapi = XAPI()
+    runs: list[bool] = []
+
+    @xapi.entrypoint(inputs=["source"], outputs=["target"])
+    def build(source: Path, target: Path, upper: bool = False):
+        runs.append(upper)
+        text = source.read_text()
+        target.write_text(text.upper() if upper else text)
+
+    xapi.run(["build", str(source), str(target)])
+    xapi.run(["build", str(source), str(target)])
+    assert runs == [False]
+
+    xapi.run(["build", str(source), str(target), "--upper"])
+    assert runs == [False, True] and target.read_text() == "DATA"
+    xapi.run(["build", str(source), str(target), "--upper"])
+    assert runs == [False, True]
+
+    xapi.run(["build", str(source), str(target)])
+    assert runs == [False, True, False] and target.read_text() == "data"
+
+
+def test_stamps_streams_once_exhausted(tmp_path: Path):
+    source = tmp_path / "source.txt"
+    target = tmp_path / "target.txt"
+    source.write_text("a\nb\n")
+
+    xapi = XAPI()
+    runs: list[int] = []
+    fail = [True]
+
+    @xapi.entrypoint(inputs=["source"], outputs=["target"])
+    def lines(source: Path, target: Path):
+        runs.append(1)
+        with open(target, "w") as f:
+            for line in source.read_text().splitlines():
+                if fail[0]:
+                    raise RuntimeError("stream failed")
+                f.write(line)
+                yield line
+
+    with pytest.raises(RuntimeError):
+        list(xapi.run(["lines", str(source), str(target)]))
+    assert len(runs) == 1
+
+    fail[0] = False
+    stream = xapi.run(["lines", str(source), str(target)])
+    next(stream)
+    stream.close()
+    assert len(runs) == 2
+
+    assert list(xapi.run(["lines", str(source), str(target)])) == ["a", "b"]
+    assert len(runs) == 3 and target.read_text() == "ab"
+
+    assert xapi.run(["lines", str(source), str(target)]) is None
+    assert len(runs) == 3
@@ -0,0 +1,45 @@
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from xntricweb.xapi import memprofile
+from xntricweb.xapi.xapi import XAPI
+
+
+def test_memprofile_phases(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    xapi = XAPI()
+    kept: list[bytearray] = []
+
+    @xapi.entrypoint
+    def grow(*values: int):
+        block = bytearray(4 << 20)
+        kept.append(block)
+        return len(values)
+
+    values = [str(i) for i in range(2000)]
+    dump = tmp_path / "snapshots"
+    argv = ["--xapi-memprofile", "--xapi-memprofile-top", "3"]
+    argv += ["--xapi-memprofile-dump", str(dump), "grow", *values]
+    assert xapi.run(argv) == 2000
+
+    report = capsys.readouterr().err.splitlines()
+    convert = next(line for line in report if line.startswith("grow convert:"))
+    execute = next(line for line in report if line.startswith("grow execute:"))
+    assert "peak +" in convert and "retained" in convert
+    assert "MiB" in execute.split(",")[0]
+    assert any("test_memprofile.py" in line for line in report)
+    assert not any(memprofile.__file__ in line for line in report)
+
+    assert sorted(path.name for path in dump.iterdir()) == [
+        "1-grow-convert.snapshot",
+        "2-grow-execute.snapshot",
+    ]
+    snapshot = tracemalloc.Snapshot.load(str(dump / "2-grow-execute.snapshot"))
+    assert snapshot.traces
+
+    # profiling is confined to the invocation
+    assert not tracemalloc.is_tracing()
+    assert not xapi.hooks
+    assert xapi.run(["grow", "1"]) == 1
+    assert capsys.readouterr().err == ""
@@ -0,0 +1,99 @@
+import socket
+from pathlib import Path
+
+import pytest
+
+from xntricweb.xapi.metrics import PrometheusTextfile, StatsD
+from xntricweb.xapi.xapi import XAPI
+
+
+def make_xapi():
+    xapi = XAPI()
+
+    @xapi.effect
+    def verbose(verbose: bool = False):
+        pass
+
+    @xapi.entrypoint
+    def sync(target: str):
+        return target
+
+    @xapi.entrypoint
+    def fail(code: int = 3):
+        raise SystemExit(code)
+
+    @xapi.entrypoint
+    def remote(name: str = "origin"):
+        pass
+
+    @xapi.entrypoint(parent=remote)
+    def prune(dry_run: bool = False):
+        return dry_run
+
+    return xapi
+
+
+def test_prometheus_textfile(tmp_path: Path):
+    path = tmp_path / "metrics" / "xapi.prom"
+    xapi = make_xapi()
+    sink = xapi.export_metrics(PrometheusTextfile(path))
+
+    xapi.run(["sync", "a"])
+    with pytest.raises(SystemExit):
+        xapi.run(["fail"])
+    sink.flush()
+
+    text = path.read_text()
+    assert "# TYPE xapi_invocations_total counter" in text
+    assert 'xapi_invocations_total{entrypoint="sync",exit_code="0"} 1' in text
+    assert 'xapi_invocations_total{entrypoint="fail",exit_code="3"} 1' in text
+    for phase in ("parse", "convert", "execute"):
+        labels = f'{{entrypoint="sync",phase="{phase}"}}'
+        assert f"xapi_phase_seconds_count{labels} 1" in text
+    assert 'xapi_phase_seconds_count{entrypoint="sync",phase="effects"} 1' in text
+    assert 'xapi_phase_seconds_count{entrypoint="fail",phase="effects"} 1' in text
+    assert 'entrypoint="verbose"' not in text
+    assert 'xapi_peak_rss_bytes{entrypoint="sync"}' in text
+
+    # later invocations add to the file
+    xapi.run(["sync", "b"])
+    sink.flush()
+    text = path.read_text()
+    assert 'xapi_invocations_total{entrypoint="sync",exit_code="0"} 2' in text
+    assert 'xapi_invocations_total{entrypoint="fail",exit_code="3"} 1' in text
+    assert text.count("# TYPE xapi_phase_seconds summary") == 1
+
+
+def test_nested_commands_count_once(tmp_path: Path):
+    path = tmp_path / "xapi.prom"
+    xapi = make_xapi()
+    sink = xapi.export_metrics(PrometheusTextfile(path))
+
+    assert xapi.run(["remote", "prune", "--dry-run"]) is True
+    sink.flush()
+
+    text = path.read_text()
+    assert 'xapi_invocations_total{entrypoint="remote.prune",exit_code="0"} 1' in text
+    for phase in ("parse", "effects", "convert", "execute"):
+        labels = f'{{entrypoint="remote.prune",phase="{phase}"}}'
+        assert f"xapi_phase_seconds_count{labels} 1" in text
+    assert 'entrypoint="remote"' not in text
+
+
+def test_statsd():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server:
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(5)
+
+        xapi = make_xapi()
+        sink = xapi.export_metrics(StatsD(port=server.getsockname()[1], prefix="cli"))
+        xapi.run(["sync", "a"])
+        sink.flush()
+
+        lines = server.recv(65536).decode().splitlines()
+
+    assert "cli.sync.invocations:1|c" in lines
+    assert "cli.sync.exit_code.0:1|c" in lines
+    assert any(line.startswith("cli.sync.execute:") for line in lines)
+    assert any(line.startswith("cli.sync.effects:") for line in lines)
+    assert not sink.invocations and not sink.timings
@@ -0,0 +1,135 @@
+import multiprocessing
+from pathlib import Path
+from typing import Iterable
+
+import pytest
+
+from xntricweb.xapi.files import InputFile
+from xntricweb.xapi.pipeline import Pipeline
+from xntricweb.xapi.xapi import XAPI
+
+
+def make_xapi(opened: list[InputFile]):
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def read(source: InputFile):
+        opened.append(source)
+        for line in source:
+            yield line.decode().strip()
+
+    @xapi.entrypoint
+    def filter(lines: Iterable[str], level: str = "error"):
+        for line in lines:
+            if line.startswith(level):
+                yield line
+
+    @xapi.entrypoint
+    def count(lines: Iterable[str]):
+        return sum(1 for _ in lines)
+
+    return xapi
+
+
+@pytest.fixture
+def log_file(tmp_path: Path):
+    path = tmp_path / "big.log"
+    lines = (f"{'error' if i % 3 else 'info'} {i}\n" for i in range(300))
+    path.write_text("".join(lines))
+    return str(path)
+
+
+@pytest.mark.parametrize("stages", ["inline", "thread", "process"])
+def test_streaming_pipeline(log_file: str, stages: str):
+    if stages == "process" and "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("process stages need fork")
+
+    xapi = make_xapi([])
+
+    argv = ["--xapi-stages", stages, "--xapi-queue-size", "2"]
+    argv += ["read", log_file, "::", "filter", "::", "count"]
+    assert xapi.run(argv) == 200
+
+
+def test_inline_stages_close_files_when_exhausted(log_file: str):
+    opened: list[InputFile] = []
+    xapi = make_xapi(opened)
+
+    lines = xapi.run(["read", log_file])
+    assert next(lines) == "info 0"
+    assert opened[0].opened and not opened[0].stream.closed
+
+    assert len(list(lines)) == 299
+    assert opened[0].stream.closed
+
+
+def test_pipeline_stats(log_file: str, capsys: pytest.CaptureFixture[str]):
+    xapi = make_xapi([])
+
+    argv = ["--xapi-stages", "thread", "--xapi-pipeline-stats", "read", log_file]
+    assert xapi.run([*argv, "::", "filter", "--level", "info", "::", "count"]) == 100
+
+    read, filter = capsys.readouterr().err.splitlines()
+    assert read.startswith("read: 300 items in ") and "queue depth max" in read
+    assert filter.startswith("filter: 100 items in ")
+
+
+def test_commands_keep_their_own_options(
+    log_file: str, capsys: pytest.CaptureFixture[str]
+):
+    xapi = make_xapi([])
+
+    @xapi.entrypoint
+    def batch(lines: Iterable[str], queue_size: int = 7, stages: int = 1):
+        return sum(1 for _ in lines), queue_size, stages
+
+    argv = ["read", log_file, "::", "batch", "--queue-size", "99", "--stages", "2"]
+    assert xapi.run(argv) == (300, 99, 2)
+
+    argv = ["--xapi-pipeline-stats", "read", log_file, "::", "filter"]
+    lines = xapi.run(argv)
+    assert next(lines) == "error 1"
+    assert capsys.readouterr().err == ""
+
+    assert len(list(lines)) == 199
+    assert capsys.readouterr().err.startswith("read: 300 items in ")
+
+
+@pytest.mark.parametrize("size", ["0", "-1", "many"])
+def test_bad_queue_size(log_file: str, size: str):
+    xapi = make_xapi([])
+
+    with pytest.raises(SystemExit) as exit:
+        xapi.run(["--xapi-queue-size", size, "read", log_file, "::", "filter"])
+    assert exit.value.code == 2
+
+
+def test_stage_errors_reach_the_consumer():
+    def produce():
+        yield 1
+        raise KeyError("broken")
+
+    pipeline = Pipeline("thread", queue_size=1)
+    items = pipeline.connect("produce", produce())
+    assert next(items) == 1
+    with pytest.raises(KeyError):
+        next(items)
+
+    with pytest.raises(ValueError):
+        Pipeline("cluster")
+
+
+def test_closing_a_consumer_stops_the_producer():
+    produced: list[int] = []
+
+    def produce():
+        for i in range(10_000):
+            produced.append(i)
+            yield i
+
+    pipeline = Pipeline("thread", queue_size=2)
+    items = pipeline.connect("produce", produce())
+    assert next(items) == 0
+    items.close()
+    # the bounded queue keeps the producer from running ahead
+    assert len(produced) < 10
@@ -0,0 +1,55 @@
+import pytest
+
+from xntricweb.xapi.resources import ResourceScope, register_teardown
+
+
+def test_resource_scope():
+    closed: list[int] = []
+
+    assert not register_teardown(lambda: closed.append(0))
+
+    with ResourceScope():
+        assert register_teardown(lambda: closed.append(1))
+        with ResourceScope():
+            register_teardown(lambda: closed.append(2))
+        register_teardown(lambda: closed.append(3))
+
+    assert closed == [2, 3, 1]
+
+
+def test_resource_scope_errors():
+    closed: list[int] = []
+
+    def fail():
+        raise OSError("close failed")
+
+    with pytest.raises(OSError):
+        with ResourceScope():
+            register_teardown(lambda: closed.append(1))
+            register_teardown(fail)
+
+    with pytest.raises(KeyError):
+        with ResourceScope():
+            register_teardown(fail)
+            register_teardown(lambda: closed.append(2))
+            raise KeyError("entrypoint failed")
+
+    assert closed == [1, 2]
+
+
+def test_resource_scope_defer():
+    closed: list[int] = []
+
+    with ResourceScope() as scope:
+        register_teardown(lambda: closed.append(1))
+        items = scope.defer(iter([1, 2]))
+
+    assert closed == [] and next(items) == 1
+    assert list(items) == [2] and closed == [1]
+
+    with ResourceScope() as scope:
+        register_teardown(lambda: closed.append(2))
+        items = scope.defer(iter([1, 2]))
+    next(items)
+    items.close()
+    assert closed == [1, 2]
@@ -0,0 +1,81 @@
+from typing import Iterable
+
+import pytest
+
+from xntricweb.xapi.sharding import ShardPolicy, parse_shard, stable_hash
+from xntricweb.xapi.xapi import XAPI
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (0, 4)
+    assert parse_shard("4/4") == (3, 4)
+
+    for value in ("0/4", "5/4", "1", "a/b", "1/0"):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_partition_covers_every_item_once():
+    items = [f"file-{i}.txt" for i in range(100)]
+
+    for by in ("hash", "range"):
+        policy = ShardPolicy(by=by)
+        shards = [policy.partition(items, (index, 3)) for index in range(3)]
+        assert sorted(item for shard in shards for item in shard) == sorted(items)
+        assert all(isinstance(shard, list) and shard for shard in shards)
+
+    ranged = ShardPolicy(by="range").partition(items, (0, 3))
+    assert ranged == items[:33]
+    assert stable_hash("file-1.txt") == stable_hash(b"file-1.txt")
+
+
+def test_sharded_varargs(capsys: pytest.CaptureFixture[str]):
+    xapi = XAPI()
+
+    @xapi.entrypoint(shard=ShardPolicy())
+    def process(prefix: str, *paths: str):
+        return [f"{prefix}{path}" for path in paths]
+
+    paths = [f"p{i}" for i in range(20)]
+    assert xapi.run(["process", "x", *paths]) == [f"x{path}" for path in paths]
+
+    first = xapi.run(["process", "x", *paths, "--shard", "1/2"])
+    second = xapi.run(["process", "x", *paths, "--shard", "2/2"])
+    assert sorted(first + second) == sorted(f"x{path}" for path in paths)
+    # deterministic across invocations
+    assert xapi.run(["process", "x", *paths, "--shard", "1/2"]) == first
+
+    ranged = ["process", "x", *paths, "--shard", "2/4", "--shard-by", "range"]
+    assert xapi.run(ranged) == ["xp5", "xp6", "xp7", "xp8", "xp9"]
+
+    with pytest.raises(SystemExit):
+        xapi.run(["process", "x", *paths, "--shard", "3/2"])
+    assert "expected INDEX/COUNT" in capsys.readouterr().err
+
+
+def test_sharded_streams():
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def produce(count: int):
+        yield from range(count)
+
+    @xapi.entrypoint(shard=ShardPolicy("items", by="range"))
+    def total(items: Iterable[int]):
+        return sum(items)
+
+    assert xapi.run(["produce", "10", "::", "total", "--shard", "1/2"]) == 10
+    assert xapi.run(["produce", "10", "::", "total", "--shard", "2/2"]) == 35
+
+
+def test_shard_requires_an_argument():
+    xapi = XAPI()
+
+    with pytest.raises(ValueError):
+
+        @xapi.entrypoint(shard=ShardPolicy())
+        def single(path: str):
+            pass
+
+    with pytest.raises(ValueError):
+        ShardPolicy(by="random")
@@ -0,0 +1,95 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from xntricweb.xapi.testing import assert_startup_budget
+
+ROOT = Path(__file__).parent.parent
+
+BASE_MS = 500
+"""Milliseconds an invocation of a single command registry may take."""
+
+MS_PER_COMMAND = 1.0
+"""Milliseconds every further registered command may add."""
+
+MODULE_BUDGET = 90
+"""Modules an invocation may import, whatever the registry size."""
+
+
+timing = pytest.mark.skipif(
+    not os.environ.get("XAPI_TIMING_TESTS"),
+    reason="wall clock budgets are opt-in, set XAPI_TIMING_TESTS=1",
+)
+
+
+def _registry(path: Path, commands: int) -> str:
+    lines = ["from xntricweb.xapi import XAPI", "", "xapi = XAPI()", ""]
+    for index in range(commands):
+        lines += [
+            "",
+            "@xapi.entrypoint",
+            f"def command_{index}(value: int, scale: float = 1.0):",
+            f'    """Command {index}."""',
+            "    print(value * scale)",
+            "",
+        ]
+    module = f"registry_{commands}"
+    (path / f"{module}.py").write_text("\n".join(lines))
+    return f"{module}:xapi"
+
+
+@pytest.fixture
+def pythonpath(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(tmp_path), str(ROOT)]))
+    return tmp_path
+
+
+@pytest.mark.parametrize("commands", [1_000, 10_000])
+def test_registry_startup_budget(pythonpath: Path, commands: int):
+    app = _registry(pythonpath, commands)
+
+    profile = assert_startup_budget(
+        app,
+        ["command_7", "3", "--scale", "2"],
+        max_modules=MODULE_BUDGET,
+        forbidden_modules=["docstring_parser", "json"],
+        repeat=1,
+    )
+
+    assert f"registry_{commands}" in profile.modules
+    assert profile.exit_code == 0
+
+
+@timing
+@pytest.mark.parametrize("commands", [1_000, 10_000])
+def test_registry_startup_time(pythonpath: Path, commands: int):
+    assert_startup_budget(
+        _registry(pythonpath, commands),
+        ["command_7", "3", "--scale", "2"],
+        max_ms=BASE_MS + commands * MS_PER_COMMAND,
+    )
+
+
+def test_budget_exceeded(pythonpath: Path):
+    app = _registry(pythonpath, 1)
+
+    with pytest.raises(AssertionError, match="budget is 1:"):
+        assert_startup_budget(app, ["command_0", "1"], max_modules=1, repeat=1)
+    with pytest.raises(AssertionError, match="budget is 0.0 ms"):
+        assert_startup_budget(app, ["command_0", "1"], max_ms=0, repeat=1)
+    with pytest.raises(AssertionError, match="imported argparse"):
+        assert_startup_budget(
+            app, ["command_0", "1"], forbidden_modules=["argparse"], repeat=1
+        )
+
+
+def test_failed_invocation(pythonpath: Path):
+    app = _registry(pythonpath, 1)
+
+    with pytest.raises(AssertionError, match="exited with 2"):
+        assert_startup_budget(app, ["command_0"], repeat=1)
+    with pytest.raises(AssertionError, match="ValueError"):
+        assert_startup_budget(app, ["command_0", "not a number"], repeat=1)
+    with pytest.raises(AssertionError, match="ModuleNotFoundError"):
+        assert_startup_budget("missing_registry:xapi", [], repeat=1)
@@ -0,0 +1,260 @@
+import gzip
+import io
+import json
+import sys
+from dataclasses import InitVar, dataclass, field
+from pathlib import Path
+from typing import Any, ClassVar, TypedDict
+
+import pytest
+
+from xntricweb.xapi.arguments import ConversionError, _convert  # type: ignore
+from xntricweb.xapi.xapi import XAPI
+
+
+@dataclass
+class Region:
+    name: str
+    zones: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Config:
+    region: Region
+    replicas: int = 1
+
+
+class Limits(TypedDict):
+    cpu: float
+    memory: int
+
+
+def test_dict_values():
+    assert _convert('{"a": "1", "b": 2}', dict[str, int]) == {"a": 1, "b": 2}
+    assert _convert({"1": ["2"]}, dict[int, list[int]]) == {1: [2]}
+    assert _convert('{"a": 1}', dict) == {"a": 1}
+
+    with pytest.raises(ConversionError):
+        _convert("[1]", dict[str, int])
+
+
+def test_structures():
+    config = _convert('{"region": {"name": "eu", "zones": ["a"]}}', Config)
+    assert config == Config(Region("eu", ["a"]))
+    assert _convert(config, Config) is config
+    assert _convert('{"cpu": "0.5", "memory": 512}', Limits) == {
+        "cpu": 0.5,
+        "memory": 512,
+    }
+
+    with pytest.raises(ConversionError):
+        _convert('{"region": {"name": "eu"}, "zone": 1}', Config)
+
+    with pytest.raises(ConversionError):
+        _convert("{}", Config)
+
+
+def test_json_sources(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    source = tmp_path / "config.json.gz"
+    with gzip.open(source, "wt") as f:
+        json.dump({"region": {"name": "us"}, "replicas": 3}, f)
+
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def deploy(config: Config, limits: dict[str, int] | None = None):
+        return config, limits
+
+    assert xapi.run(["deploy", f"@{source}"]) == (Config(Region("us"), 3), None)
+
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(b'{"cpu": 2}')))
+    assert xapi.run(["deploy", '{"region": {"name": "eu"}}', "--limits", "-"]) == (
+        Config(Region("eu")),
+        {"cpu": 2},
+    )
+
+
+def test_ndjson_records(tmp_path: Path):
+    source = tmp_path / "regions.ndjson"
+    source.write_text('{"name": "eu"}\n\n{"name": "us", "zones": ["b"]}\n')
+
+    regions: Any = _convert([f"@{source}"], list[Region])
+    assert regions == [Region("eu"), Region("us", ["b"])]
+
+    assert _convert(['{"name": "ap"}'], list[Region]) == [Region("ap")]
+    assert _convert(['{"a": "1"}', '{"b": 2}'], list[dict[str, int]]) == [
+        {"a": 1},
+        {"b": 2},
+    ]
+
+
+def test_json_errors(tmp_path: Path):
+    with pytest.raises(ConversionError):
+        _convert("{not json", dict[str, int])
+    with pytest.raises(ConversionError):
+        _convert(f"@{tmp_path / 'missing.json'}", Config)
+    with pytest.raises(ConversionError):
+        _convert([f"@{tmp_path / 'missing.ndjson'}"], list[Region])
+
+
+def _stdin(data: bytes) -> io.TextIOWrapper:
+    return io.TextIOWrapper(io.BufferedReader(io.BytesIO(data)))
+
+
+def test_json_array_sources(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    source = tmp_path / "regions.json"
+    source.write_text('[{"name": "eu"}, {"name": "us"}]')
+    assert _convert([f"@{source}"], list[Region]) == [Region("eu"), Region("us")]
+
+    document = b'\n  [\n  {"name": "eu"},\n  {"name": "us"}\n]\n'
+    monkeypatch.setattr(sys, "stdin", _stdin(document))
+    assert _convert(["-"], list[Region]) == [Region("eu"), Region("us")]
+
+    records = b'{"name": "eu"}\n{"name": "us"}\n'
+    monkeypatch.setattr(sys, "stdin", _stdin(records))
+    assert _convert(["-"], list[Region]) == [Region("eu"), Region("us")]
+
+
+def test_dataclass_pseudo_fields():
+    @dataclass
+    class Scaled:
+        value: int
+        factor: InitVar[int] = 1
+        unit: ClassVar[str] = "m"
+
+        def __post_init__(self, factor: int):
+            self.value *= factor
+
+    assert _convert('{"value": 2, "factor": 3}', Scaled) == Scaled(6)
+
+    with pytest.raises(ConversionError):
+        _convert('{"value": 2, "unit": "km"}', Scaled)
+
+
+def test_flattened_options(tmp_path: Path):
+    @dataclass
+    class Options:
+        region: Region
+        max_replicas: int = 1
+        dry_run: bool = False
+
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def deploy(options: Options, limits: Limits | None = None):
+        return options
+
+    assert xapi.run(
+        [
+            "deploy",
+            "--region.name",
+            "eu",
+            "--region.zones",
+            "a",
+            "b",
+            "--max-replicas",
+            "3",
+            "--dry-run",
+        ]
+    ) == Options(Region("eu", ["a", "b"]), 3, True)
+
+    source = tmp_path / "options.json"
+    source.write_text('{"region": {"name": "us", "zones": ["c"]}, "max_replicas": 2}')
+    assert xapi.run(
+        ["deploy", "--options", f"@{source}", "--region.name", "ap"]
+    ) == Options(Region("ap", ["c"]), 2)
+
+    with pytest.raises(SystemExit):
+        xapi.run(["deploy", "--max-replicas", "2"])
+
+
+def test_flattened_options_with_bad_json(capsys: pytest.CaptureFixture[str]):
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def connect(cfg: Endpoint):
+        return cfg
+
+    with pytest.raises(SystemExit) as e:
+        xapi.run(["connect", "--cfg", "{bad", "--port", "3"])
+    assert e.value.code == 2
+    assert "argument cfg: Unable to load json" in capsys.readouterr().err
+
+
+def test_flattened_typed_dict():
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def limit(limits: Limits):
+        return limits
+
+    assert xapi.run(["limit", "--cpu", "0.5", "--memory", "64"]) == {
+        "cpu": 0.5,
+        "memory": 64,
+    }
+
+
+@dataclass
+class Endpoint:
+    host: str
+    port: int = 80
+
+
+def test_flattened_option_clashes():
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def copy(src: Endpoint, dst: Endpoint):
+        return src, dst
+
+    @xapi.entrypoint
+    def run(cfg: Endpoint, host: str = "x"):
+        return cfg, host
+
+    assert xapi.run(
+        ["copy", "--src.host", "a", "--dst.host", "b", "--dst.port", "2"]
+    ) == (Endpoint("a"), Endpoint("b", 2))
+    assert xapi.run(["run", "--cfg.host", "a", "--port", "1", "--host", "y"]) == (
+        Endpoint("a", 1),
+        "y",
+    )
+
+
+def test_same_named_structures_per_command():
+    @dataclass
+    class Limits:
+        cpu: float
+
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def connect(cfg: Endpoint):
+        return cfg
+
+    @xapi.entrypoint
+    def limit(cfg: Limits):
+        return cfg
+
+    assert xapi.run(
+        ["--concurrently", "connect --host a --port 2", "limit --cpu 0.5"]
+    ) == [Endpoint("a", 2), Limits(0.5)]
+
+
+def test_positional_structure(capsys: pytest.CaptureFixture[str]):
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def connect(cfg: Endpoint):
+        return cfg
+
+    assert xapi.run(["connect", '{"host": "a"}', "--port", "2"]) == Endpoint("a", 2)
+
+    with pytest.raises(SystemExit):
+        xapi.run(["connect", "-h"])
+    assert capsys.readouterr().out.count("the Endpoint as json") == 1
+
+    for source in ("not json", "@missing.json"):
+        with pytest.raises(SystemExit) as e:
+            xapi.run(["connect", source, "--host", "b"])
+        assert e.value.code == 2
+        assert "argument cfg: Unable to load json" in capsys.readouterr().err
@@ -0,0 +1,108 @@
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Annotated, Any
+
+import pytest
+
+from xntricweb.xapi import temporal
+from xntricweb.xapi.arguments import ConversionError, _convert  # type: ignore
+from xntricweb.xapi.temporal import EPOCH, TimeFormat
+from xntricweb.xapi.xapi import XAPI
+
+
+def test_iso_values():
+    assert _convert("2024-05-01T10:30:00", datetime) == datetime(2024, 5, 1, 10, 30)
+    assert _convert("2024-05-01", date) == date(2024, 5, 1)
+    assert _convert("10:30", time) == time(10, 30)
+    assert _convert(None, datetime) is None
+    assert _convert("", date) is None
+
+    with pytest.raises(ConversionError):
+        _convert("tomorrow", date)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("90", timedelta(seconds=90)),
+        ("-1.5", timedelta(seconds=-1.5)),
+        ("1:30", timedelta(hours=1, minutes=30)),
+        ("2 days, 0:00:01.5", timedelta(days=2, seconds=1.5)),
+        ("1d2h30m", timedelta(days=1, hours=2, minutes=30)),
+        ("500ms", timedelta(milliseconds=500)),
+        ("-1w", timedelta(weeks=-1)),
+    ],
+)
+def test_timedelta(value: str, expected: timedelta):
+    assert _convert(value, timedelta) == expected
+
+
+def test_timedelta_invalid():
+    with pytest.raises(ConversionError):
+        _convert("1x", timedelta)
+
+
+@pytest.mark.parametrize(
+    "value, annotation",
+    [
+        ("inf", timedelta),
+        ("1e15", timedelta),
+        ("1e20", Annotated[datetime, EPOCH]),
+        (["2024-01-01", "bad"], list[date]),
+    ],
+)
+def test_out_of_range(value: Any, annotation: Any):
+    with pytest.raises(ConversionError):
+        _convert(value, annotation)
+
+
+def test_bulk_empty_values():
+    assert _convert(["2024-01-01", ""], list[date]) == [date(2024, 1, 1), None]
+
+
+def test_format_hints():
+    assert _convert("01/05/2024", Annotated[date, TimeFormat("%d/%m/%Y")]) == date(
+        2024, 5, 1
+    )
+    assert _convert("0", Annotated[datetime, EPOCH]) == datetime(
+        1970, 1, 1, tzinfo=timezone.utc
+    )
+    assert _convert(86400, Annotated[date, EPOCH]) == date(1970, 1, 2)
+
+
+def test_cached_and_bulk(monkeypatch: pytest.MonkeyPatch):
+    temporal.clear_cache()
+    parsed: list[Any] = []
+    parse = temporal._parse_uncached  # type: ignore
+
+    def tracking_parse(*args: Any):
+        parsed.append(args)
+        return parse(*args)
+
+    monkeypatch.setattr(
+        temporal, "_parse_cached", lru_cache(maxsize=16)(tracking_parse)
+    )
+
+    values = ["2024-05-01", "2024-05-02"] * 500
+    assert _convert(values, list[date]) == [
+        date(2024, 5, 1),
+        date(2024, 5, 2),
+    ] * 500
+    assert _convert(values, list[Annotated[date, TimeFormat("%Y-%m-%d")]])[1] == (
+        date(2024, 5, 2)
+    )
+    assert len(parsed) == 4
+
+
+def test_annotated_entrypoint():
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def since(
+        start: Annotated[date, TimeFormat("%d.%m.%Y")],
+        every: timedelta = timedelta(days=1),
+    ):
+        return start + every
+
+    assert xapi.run(["since", "01.05.2024"]) == date(2024, 5, 2)
+    assert xapi.run(["since", "01.05.2024", "--every", "1w"]) == date(2024, 5, 8)
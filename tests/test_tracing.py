@@ -0,0 +1,124 @@
+import json
+from pathlib import Path
+from typing import Any, Iterable
+
+import pytest
+
+from xntricweb.xapi.tracing import current_span, span
+from xntricweb.xapi.xapi import XAPI
+
+
+def load_spans(path: Path) -> list[dict[str, Any]]:
+    spans: list[dict[str, Any]] = []
+    for line in path.read_text().splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return spans
+
+
+def by_name(spans: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    return {span["name"]: span for span in spans}
+
+
+def make_xapi(path: Path):
+    xapi = XAPI()
+    xapi.trace(path)
+
+    @xapi.effect
+    def verbose(verbose: bool = False):
+        pass
+
+    @xapi.entrypoint
+    def sync(target: str, retries: int = 1):
+        with span("load", target=target) as load:
+            assert load
+            load.set_attribute("rows", 3)
+        return target
+
+    @xapi.entrypoint
+    def fail():
+        raise ValueError("broken")
+
+    @xapi.entrypoint
+    def produce(count: int):
+        yield from range(count)
+
+    @xapi.entrypoint
+    def total(items: Iterable[int]):
+        return sum(items)
+
+    return xapi
+
+
+def test_invocation_spans(tmp_path: Path):
+    path = tmp_path / "traces.jsonl"
+    xapi = make_xapi(path)
+    assert xapi.run(["sync", "a", "--retries", "2"]) == "a"
+
+    spans = by_name(load_spans(path))
+    root = spans["xapi"]
+    assert "parentSpanId" not in root
+    assert len({span["traceId"] for span in spans.values()}) == 1
+
+    def parent(name: str) -> str:
+        parent_id = spans[name]["parentSpanId"]
+        return next(n for n, span in spans.items() if span["spanId"] == parent_id)
+
+    assert parent("parse") == "xapi"
+    assert parent("effect verbose") == "xapi"
+    assert parent("execute verbose") == "effect verbose"
+    assert parent("execute sync") == "xapi"
+    assert parent("convert target") == "execute sync"
+    assert parent("convert retries") == "execute sync"
+    assert parent("call sync") == "execute sync"
+    assert parent("load") == "call sync"
+
+    attributes = {a["key"]: a["value"] for a in spans["load"]["attributes"]}
+    assert attributes == {"target": {"stringValue": "a"}, "rows": {"intValue": "3"}}
+    assert root["status"] == {"code": 1}
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+
+
+def test_error_status(tmp_path: Path):
+    path = tmp_path / "traces.jsonl"
+    xapi = make_xapi(path)
+
+    with pytest.raises(ValueError):
+        xapi.run(["fail"])
+
+    spans = by_name(load_spans(path))
+    assert spans["call fail"]["status"] == {
+        "code": 2,
+        "message": "ValueError: broken",
+    }
+    assert spans["xapi"]["status"]["code"] == 2
+
+
+def test_untraced_spans_are_no_ops():
+    assert current_span() is None
+    with span("anything") as untraced:
+        assert untraced is None
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--concurrently", "sync a", "sync b"],
+        ["--xapi-stages", "thread", "produce", "5", "::", "total"],
+    ],
+)
+def test_trace_context_propagates(tmp_path: Path, argv: list[str]):
+    path = tmp_path / "traces.jsonl"
+    xapi = make_xapi(path)
+    xapi.run(argv)
+
+    spans = load_spans(path)
+    root = by_name(spans)["xapi"]
+    assert {span["traceId"] for span in spans} == {root["traceId"]}
+    ids = {span["spanId"] for span in spans}
+    assert all(span["parentSpanId"] in ids for span in spans if span is not root)
+    if "--xapi-stages" in argv:
+        assert "stage produce" in by_name(spans)
+    else:
+        assert [s["name"] for s in spans].count("call sync") == 2
@@ -17,6 +17,14 @@ def test_origin_args():
     assert get_origin_args(Literal["abc", "123"]) == (Literal, ("abc", "123"))
 
 
+def test_origin_args_type_alias():
+    type Names = list[str]
+    type Pair[T] = tuple[T, T]
+
+    assert get_origin_args(Names) == (list, (str,))
+    assert get_origin_args(Pair[int]) == (tuple, (int, int))
+
+
 def test_is_any() -> None:
     assert is_any(type(""), [str])
     assert is_any(True, [True])
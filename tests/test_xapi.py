@@ -35,3 +35,144 @@ def test_get_entrypoint():
 
     with pytest.raises(KeyError):
         assert xapi.get_entrypoint("missing")
+
+
+def test_shared_instance():
+    import xntricweb.xapi
+
+    assert isinstance(xntricweb.xapi.xapi, XAPI)
+
+
+def test_class_entrypoint():
+    from xntricweb.xapi.entrypoint import Entrypoint
+
+    xapi = XAPI()
+
+    class Math(Entrypoint):
+        def add(self, a: int, b: int = 1):
+            return a + b
+
+    xapi.entrypoint(Math())
+
+    assert xapi.run(["math", "add", "2", "--b", "5"]) == 7
+
+
+def test_effect_options():
+    xapi = XAPI()
+    levels: list[str] = []
+
+    @xapi.effect
+    def log_level(level: str = "warning"):
+        levels.append(level)
+
+    @xapi.entrypoint
+    def case(value: int, flag: bool = False):
+        return value, flag
+
+    assert xapi.run(["--level", "debug", "case", "1"]) == (1, False)
+    assert xapi.run(["case", "2", "--level", "info", "--flag"]) == (2, True)
+    assert xapi.run(["case", "3"]) == (3, False)
+    assert levels == ["debug", "info", "warning"]
+
+
+def test_abbreviated_effect_options():
+    xapi = XAPI()
+    levels: list[str] = []
+
+    @xapi.effect
+    def log_level(level: str = "warning"):
+        levels.append(level)
+
+    @xapi.entrypoint
+    def case(value: int):
+        return value
+
+    assert xapi.run(["--lev", "debug", "case", "1"]) == 1
+    assert xapi.run(["--concurrently", "case 2", "--lev", "info"]) == [2]
+    assert levels == ["debug", "info"]
+
+
+def test_command_options_take_precedence_over_effects():
+    xapi = XAPI()
+    levels: list[str] = []
+
+    @xapi.effect
+    def verbose(level: str = "warning", quiet: bool = False):
+        levels.append(f"{quiet}")
+
+    @xapi.entrypoint
+    def case(level: str = "a"):
+        return level
+
+    assert xapi.run(["case", "--level", "b"]) == "b"
+    assert xapi.run(["case", "--quiet"]) == "a"
+    assert xapi.run(["--quiet", "case", "--level", "c"]) == "c"
+    assert levels == ["False", "True", "True"]
+
+
+def test_effect_options_not_copied_into_subparsers():
+    from xntricweb.xapi.xapi import XAPIExecutor
+    import argparse
+
+    xapi = XAPI()
+
+    @xapi.effect
+    def verbose(verbose: bool = False):
+        pass
+
+    @xapi.entrypoint
+    def case():
+        pass
+
+    executor = XAPIExecutor(
+        xapi,
+        root_parser=argparse.ArgumentParser(),
+        effect_parser=argparse.ArgumentParser(add_help=False),
+    )
+    executor.run(["case"])
+
+    assert "--verbose" in executor.root_parser.format_help()
+    assert "--verbose" not in executor.parsers[case].format_help()
+
+
+def test_array_entrypoint():
+    np = pytest.importorskip("numpy")
+    npt = pytest.importorskip("numpy.typing")
+
+    xapi = XAPI()
+
+    @xapi.entrypoint
+    def total(
+        values: npt.NDArray[np.int64],  # type: ignore[name-defined]
+        scale: np.ndarray | None = None,  # type: ignore[name-defined]
+    ):
+        return int(values.sum() * (1 if scale is None else scale.prod()))
+
+    assert xapi.run(["total", "1", "2", "3"]) == 6
+    assert xapi.run(["total", "1", "2", "--scale", "2", "3"]) == 18
+
+
+def test_root_help_lists_run_options(capsys: pytest.CaptureFixture[str]):
+    xapi = XAPI()
+
+    @xapi.effect
+    def limits(jobs: int = 1):
+        pass
+
+    @xapi.entrypoint
+    def sync(target: str = "all"):
+        return target
+
+    with pytest.raises(SystemExit):
+        xapi.run(["--help"])
+
+    help = " ".join(capsys.readouterr().out.split())
+    for title in ("concurrency", "pipeline", "memory profiling"):
+        assert f"{title} options:" in help
+    for option in ("--concurrently", "--xapi-stages", "--xapi-memprofile-top"):
+        assert option in help
+    assert "(default: inline)" in help and "SUPPRESS" not in help
+
+    # the listed options never end up in the parsed parameters
+    assert xapi.run(["sync"]) == "all"
+    assert xapi.run(["--jobs", "2", "sync"]) == "all"
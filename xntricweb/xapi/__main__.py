@@ -0,0 +1,35 @@
+import sys
+
+from .xapi import XAPI
+
+PROG = "python -m xntricweb.xapi"
+
+xapi = XAPI()
+
+
+@xapi.entrypoint
+def imports(target: str, top: int = 5, python: str | None = None):
+    """
+    Attributes import time to the modules defining the registered commands.
+
+    :param target: The XAPI instance to inspect, as module:attribute.
+    :param top: The heaviest imports listed per command module.
+    :param python: The interpreter to measure with, defaults to this one.
+    """
+    from .importcost import measure, report
+
+    try:
+        module, costs, records = measure(target, python)
+    except RuntimeError as e:
+        # the last line of the failed import names the problem, the rest
+        # of its traceback is noise here
+        heading, _, details = str(e).partition("\n")
+        reason = " ".join([heading, *details.strip().splitlines()[-1:]])
+        print(f"{PROG} imports: error: {reason}", file=sys.stderr)
+        sys.exit(2)
+
+    report(module, costs, records, top)
+
+
+if __name__ == "__main__":
+    xapi.run(sys.argv[1:], prog=PROG)
@@ -1,56 +1,149 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
-import json
+import sys
+from enum import Enum, IntEnum, StrEnum
+from functools import lru_cache, partial
+from sys import intern
 from types import UnionType
-from typing import Any, Literal, Optional, Protocol, Union
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    Optional,
+    Protocol,
+    Sequence,
+    Union,
+    cast,
+    get_args,
+    is_typeddict,
+)
+from weakref import WeakKeyDictionary
 
 from xntricweb.xapi.utility import get_origin_args
 
 from .const import NOT_SPECIFIED, AnyType, NotSpecified, log
+from .resources import register_teardown
+
+if TYPE_CHECKING:
+    from array import array
+    from mmap import mmap
+    from pathlib import PurePath
+
+    from .files import _LazyFile
+
+    import numpy
 
 
-@dataclass
 class Argument:
-    """Describes a method argument."""
+    """
+    Describes a method argument.
+
+    Arguments are immutable, names and aliases are interned so large
+    command trees share their strings.
+    """
 
     name: str
     """The argument name."""
 
-    annotation: Optional[AnyType] = None
+    annotation: Optional[AnyType]
     """
     The arguments annotation type.
     This must be a Callable and will be used to coerce the value to the
     correct type for the function.
     """
 
-    index: Optional[int] = None
+    index: Optional[int]
     """
     The positional index of the argument. If the argument is keyword
     only it should be set to None.
     """
 
-    default: Any | NotSpecified = NOT_SPECIFIED
+    default: Any | NotSpecified
     """
     The default value of the argument. If NOT_SPECIFIED then the
     argument is considered required.
     """
 
-    vararg: Optional[bool] = None
+    vararg: Optional[bool]
     """
     Whether the argument is a vararg type of argument... e.g. *args, **kwargs
     """
 
-    aliases: Optional[list[str]] = None
-    help: Optional[str] = None
-    metavar: Optional[str] = None
+    aliases: Optional[tuple[str, ...]]
+    help: Optional[str]
+    metavar: Optional[str]
+
+    __slots__ = (
+        "name",
+        "annotation",
+        "index",
+        "default",
+        "vararg",
+        "aliases",
+        "help",
+        "metavar",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        annotation: Optional[AnyType] = None,
+        index: Optional[int] = None,
+        default: Any | NotSpecified = NOT_SPECIFIED,
+        vararg: Optional[bool] = None,
+        aliases: Optional[Sequence[str]] = None,
+        help: Optional[str] = None,
+        metavar: Optional[str] = None,
+    ):
+        _set = object.__setattr__
+        _set(self, "name", intern(name))
+        _set(self, "annotation", annotation)
+        _set(self, "index", index)
+        _set(self, "default", default)
+        _set(self, "vararg", vararg)
+        _set(
+            self,
+            "aliases",
+            tuple(intern(alias) for alias in aliases) if aliases else None,
+        )
+        _set(self, "help", help)
+        _set(self, "metavar", metavar)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def _fields(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other: Any):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self):
+        return hash((self.name, self.index, self.vararg))
+
+    def __reduce__(self):
+        return self.__class__, self._fields()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({
+            ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        })"
 
     def generate_call_arg(
         self,
         value: Any,
         args: Optional[list[Any]] = None,
         kwargs: Optional[dict[str, Any]] = None,
+        convert: bool = True,
     ):
         if args is None:
             args = []
@@ -62,23 +155,23 @@ class Argument:
 
         if self.vararg:
             if self.index is not None:
-                _value = _convert(value, list[self.annotation])
+                _value = _convert(value, list[self.annotation]) if convert else value
                 log.debug("generated varargs for %r with value %r", self, _value)
                 args.extend(_value)
                 return args, kwargs
 
-            _value = _convert(value, dict)
+            _value = _convert(value, dict) if convert else value
             log.debug("generating kwargs for %r: %r", self.name, _value)
             kwargs.update(_value)
             return args, kwargs
 
-        _value = _convert(value, self.annotation)
+        _value = _convert(value, self.annotation) if convert else value
         if self.index is not None and self.default is NOT_SPECIFIED:
             log.debug("generating positional for %r with value %r", self, _value)
             args.append(_value)
             return args, kwargs
 
-        if _value != self.default:
+        if not _is_default(_value, self.default):
             log.debug("generating kwarg for %r with value %r", self.name, _value)
             kwargs[self.name] = _value
             return args, kwargs
@@ -102,6 +195,16 @@ class Argument:
         return r
 
 
+def _is_default(value: Any, default: Any) -> bool:
+    if value is default:
+        return True
+    try:
+        return bool(value == default)
+    except (TypeError, ValueError):
+        # arrays compare element wise, they never equal a default
+        return False
+
+
 class ConversionError(TypeError):
     """The error that is raised when value conversion fails."""
 
@@ -114,6 +217,7 @@ class _Converter[T](Protocol):
         origin: AnyType,
         origin_args: tuple[AnyType, ...],
         annotation: AnyType,
+        metadata: tuple[Any, ...],
     ) -> T:
         raise NotImplementedError()
 
@@ -184,7 +288,12 @@ def _iterable_converter(
             return None
 
             # return [_convert(value, origin_args)]
-        params = [_convert(sub_value, origin_args[0]) for sub_value in value]
+        if bulk_converter := _get_bulk_converter(origin_args[0]):
+            params = bulk_converter(value)
+            if origin is list:
+                return params
+        else:
+            params = [_convert(sub_value, origin_args[0]) for sub_value in value]
 
     elif arg_count > 1:
         log.debug(
@@ -215,16 +324,288 @@ def _iterable_converter(
     )
 
 
+type _BulkConverter = Callable[[Iterable[Any]], list[Any]]
+
+_bulk_converters: dict[AnyType, _BulkConverter] = {
+    Any: list,
+}
+"""
+Converters turning a whole sequence of raw values into a list of the
+keyed element type in one pass, used by iterable and vararg conversion.
+"""
+
+
+def _get_bulk_converter(annotation: AnyType) -> _BulkConverter | None:
+    if not annotation or annotation is None.__class__:
+        return list
+
+    if bulk_converter := _bulk_converters.get(annotation):
+        return bulk_converter
+
+    origin, origin_args = get_origin_args(annotation)
+    metadata: tuple[Any, ...] = ()
+    if origin is Annotated:
+        metadata = origin_args[1:]
+        origin, _ = get_origin_args(origin_args[0])
+
+    converter = _get_converter(origin)
+    if converter in (_dict_converter, _structure_converter):
+        return partial(_load_records, annotation)
+
+    # temporal parsers are cached, a list of them maps the parser itself
+    if converter is _temporal_converter:
+        log.debug("using bulk temporal conversion for %r", annotation)
+        return partial(
+            _map_to_list, _get_temporal_parser(cast(type, origin), metadata)
+        )
+
+    # plain classes end up being called with each value, map does the
+    # same without dispatching every element through _convert
+    if isinstance(annotation, type) and converter in (None, _function_converter):
+        log.debug("using bulk conversion for %r", annotation)
+        return partial(_map_to_list, annotation)
+
+    return None
+
+
+def _map_to_list(
+    converter: Callable[[Any], Any], values: Iterable[Any]
+) -> list[Any]:
+    return list(map(converter, values))
+
+
+class _Choices(dict[str, Any]):
+    """
+    Maps the command line token of each choice to its value, built once
+    per Literal or Enum. Also used as the argparse ``choices`` container,
+    membership is a dict lookup and iterating yields the tokens.
+    """
+
+    __slots__ = ("members", "aliases")
+
+    members: frozenset[Any]
+    """The choice values themselves, already converted values pass as is."""
+
+    aliases: dict[str, Any]
+    """Further accepted tokens, e.g. enum values, left out of the usage."""
+
+    def __init__(
+        self,
+        choices: Iterable[tuple[str, Any]],
+        aliases: Iterable[tuple[str, Any]] = (),
+    ):
+        super().__init__()
+        for token, value in choices:
+            self.setdefault(token, value)
+        self.members = frozenset(self.values())
+        self.aliases = {}
+        for token, value in aliases:
+            if token not in self:
+                self.aliases.setdefault(token, value)
+
+    def __contains__(self, token: Any) -> bool:
+        return super().__contains__(token) or token in self.aliases
+
+    def __missing__(self, token: Any) -> Any:
+        return self.aliases[token]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+
+CHOICES_CACHE_SIZE = 1024
+"""Literal choice maps kept, the least recently used are dropped."""
+
+_enum_choices: WeakKeyDictionary[type[Enum], _Choices] = WeakKeyDictionary()
+
+
+@lru_cache(maxsize=CHOICES_CACHE_SIZE)
+def _build_literal_choices(typed_args: tuple[tuple[type, Any], ...]) -> _Choices:
+    return _Choices((str(value), value) for _, value in typed_args)
+
+
+def _get_literal_choices(origin_args: tuple[Any, ...]) -> _Choices:
+    # keyed with the value types, Literal[1] and Literal[True] differ
+    return _build_literal_choices(tuple((type(value), value) for value in origin_args))
+
+
+def _get_enum_choices(origin: type[Enum]) -> _Choices:
+    choices = _enum_choices.get(origin)
+    if choices is None:
+        # member names are listed, their values are accepted as well
+        choices = _enum_choices[origin] = _Choices(
+            origin.__members__.items(),
+            ((str(member.value), member) for member in origin),
+        )
+    return choices
+
+
 def _literal_converter(value: Any, origin_args: tuple[AnyType, ...], **_: Any):
-    if value in origin_args:
+    choices = _get_literal_choices(origin_args)
+    try:
+        if value in choices.members:
+            return value
+        return choices[value]
+    except (KeyError, TypeError):
+        raise ConversionError(f"Expected one of {list(choices)} found {value!r}")
+
+
+def _enum_converter(value: Any, origin: AnyType, **_: Any):
+    enum = cast(type[Enum], origin)
+    if value is None or isinstance(value, enum):
         return value
-    raise TypeError(f"Expected {origin_args} found '{type(value)}'")
+
+    try:
+        return _get_enum_choices(enum)[value]
+    except (KeyError, TypeError):
+        pass
+
+    # values that aren't tokens, e.g. an int passed from code
+    try:
+        return enum(value)
+    except ValueError as e:
+        raise ConversionError(str(e))
 
 
-def _datetime_converter(value: str | None, **_) -> datetime | None:
-    if not value:
+def _parse_temporal(parser: Callable[[Any], Any], origin: type[Any], value: Any) -> Any:
+    if value is None or value == "":
         return None
-    return datetime.fromisoformat(value)
+
+    try:
+        return parser(value)
+    except (ValueError, OverflowError, OSError) as e:
+        # out of range values overflow, or fail in the platform's time functions
+        raise ConversionError(f"Unable to convert {value!r} to {origin}: {e}")
+
+
+def _get_temporal_parser(
+    origin: type[Any], metadata: Sequence[Any] = ()
+) -> Callable[[Any], Any]:
+    from .temporal import get_parser
+
+    return partial(_parse_temporal, get_parser(origin, metadata), origin)
+
+
+def _temporal_converter(
+    value: Any, origin: AnyType, metadata: tuple[Any, ...] = (), **_: Any
+) -> Any:
+    return _get_temporal_parser(cast(type, origin), metadata)(value)
+
+
+def _annotated_converter(
+    value: Any,
+    origin_args: tuple[Any, ...],
+    metadata: tuple[Any, ...] = (),
+    **_: Any,
+) -> Any:
+    # Annotated[T, *hints] converts as T, with the hints available to
+    # converters that understand them
+    return _convert(value, origin_args[0], metadata + origin_args[1:])
+
+
+def _array_text(value: str | Sequence[str]) -> str:
+    """
+    Returns the whitespace separated text behind `value`: the argv tokens
+    themselves, or the contents of an ``@file`` or ``-`` (stdin) token.
+    """
+    if isinstance(value, str):
+        value = (value,)
+
+    if len(value) == 1:
+        if (token := value[0]) == "-":
+            return sys.stdin.read()
+        if token.startswith("@"):
+            with open(token[1:]) as f:
+                return f.read()
+
+    return " ".join(value)
+
+
+def _ndarray_converter(
+    value: Any, origin: AnyType, origin_args: tuple[AnyType, ...], **_: Any
+) -> numpy.ndarray[Any, Any] | None:
+    import warnings
+
+    import numpy
+
+    if value is None or isinstance(value, numpy.ndarray):
+        return value
+
+    # ndarray[shape, dtype[scalar]], unbound scalars use numpy's default
+    dtype = None
+    if len(origin_args) == 2 and (dtype_args := get_args(origin_args[1])):
+        if isinstance(dtype_args[0], type):
+            dtype = dtype_args[0]
+
+    # the tokens are parsed by numpy directly, without a python list
+    # of elements in between
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            return numpy.fromstring(_array_text(value), dtype=dtype, sep=" ")
+        except (ValueError, DeprecationWarning) as e:
+            raise ConversionError(f"Unable to convert {value!r} to {origin}: {e}")
+
+
+_array_typecodes: dict[Any, str] = {int: "q", float: "d", str: "u"}
+"""Array typecodes for the element types of ``array.array[...]``."""
+
+
+def _array_converter(
+    value: Any, origin: AnyType, origin_args: tuple[AnyType, ...], **_: Any
+) -> array[Any] | None:
+    array_type = cast("type[array[Any]]", origin)
+    if value is None or isinstance(value, array_type):
+        return value
+
+    # array.array[int] or array.array["i"], plain arrays hold doubles
+    typecode = "d"
+    if origin_args:
+        typecode = _array_typecodes.get(origin_args[0]) or cast(str, origin_args[0])
+
+    text = _array_text(value)
+    try:
+        if typecode == "u":
+            return array_type(typecode, text)
+        element = float if typecode in ("f", "d") else int
+        return array_type(typecode, map(element, text.split()))
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ConversionError(f"Unable to convert {value!r} to {origin}: {e}")
+
+
+def _mmap_converter(value: Any, origin: AnyType, **_: Any) -> mmap | None:
+    mmap_type = cast("type[mmap]", origin)
+    if value is None or isinstance(value, mmap_type):
+        return value
+
+    from mmap import ACCESS_READ
+
+    try:
+        with open(value, "rb") as f:
+            mapped = mmap_type(f.fileno(), 0, access=ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise ConversionError(f"Unable to map {value!r}: {e}")
+
+    register_teardown(mapped.close)
+    return mapped
+
+
+def _file_converter(value: Any, origin: AnyType, **_: Any) -> Any:
+    file_type = cast("type[_LazyFile]", origin)
+    if value is None or isinstance(value, file_type):
+        return value
+
+    # opening is deferred to the first read or write
+    file = file_type(value)
+    register_teardown(file.close)
+    return file
+
+
+def _path_converter(value: Any, origin: AnyType, **_: Any) -> Any:
+    path_type = cast("type[PurePath]", origin)
+    if value is None or isinstance(value, path_type):
+        return value
+    return path_type(value)
 
 
 def _union_converter(value: Any, origin_args: tuple[AnyType, ...], **_: Any):
@@ -251,31 +632,113 @@ def _dict_converter(
     if value is None and None.__class__ in origin_args:
         return None
 
-    if isinstance(value, str):
-        value = json.loads(value)
+    if isinstance(value, (str, bytes)):
+        value = _load_json(value)
+
+    if origin is not dict and is_typeddict(origin):
+        return _structure_converter(value, origin)
 
     if not origin_args:
         return _default_type_converter(value, origin, origin_args)
 
-    raise ConversionError()
+    from .structures import get_dict_plan
+
+    return get_dict_plan(origin_args)(value)
+
+
+def _structure_converter(value: Any, origin: AnyType, **_: Any) -> Any:
+    if value is None:
+        return None
+
+    if isinstance(value, (str, bytes)):
+        value = _load_json(value)
+
+    from .structures import get_structure_plan
+
+    return get_structure_plan(cast(type, origin))(value)
+
+
+def _load_json(value: str | bytes) -> Any:
+    from .files import load_json
 
+    try:
+        return load_json(value)
+    except (ValueError, OSError) as e:
+        raise ConversionError(f"Unable to load json from {value!r}: {e}")
 
-type_converters: dict[AnyType, _Converter[Any]] = {
+
+def _read_ndjson(path: str) -> Iterator[Any]:
+    from .files import iter_ndjson
+
+    try:
+        yield from iter_ndjson(path)
+    except (ValueError, OSError) as e:
+        raise ConversionError(f"Unable to read json records from {path!r}: {e}")
+
+
+def _load_records(annotation: AnyType, values: Iterable[Any]) -> list[Any]:
+    # a single source holds all the records, ndjson is converted one
+    # record at a time as it is read, a json array as a whole
+    if isinstance(values, Sequence) and len(values) == 1:
+        from .files import get_source, is_ndjson
+
+        token = values[0]
+        if isinstance(token, str) and (path := get_source(token)):
+            if is_ndjson(path):
+                log.debug("streaming %r records from %r", annotation, path)
+                return [_convert(record, annotation) for record in _read_ndjson(path)]
+
+            data = _load_json(token)
+            if isinstance(data, list):
+                return [_convert(record, annotation) for record in data]
+            return [_convert(data, annotation)]
+
+    return [_convert(value, annotation) for value in values]
+
+
+# typing special forms like Union aren't types, so the keys are Any
+type_converters: dict[Any, _Converter[Any]] = {
     Union: _union_converter,
     UnionType: _union_converter,
     Literal: _literal_converter,
+    Annotated: _annotated_converter,
+    Enum: _enum_converter,
+    IntEnum: _enum_converter,
+    StrEnum: _enum_converter,
     dict: _dict_converter,
     list: _iterable_converter,
     tuple: _iterable_converter,
-    datetime: _datetime_converter,
     Any: _passthrough_converter,
     _function_converter.__class__.__base__: _function_converter,
 }
 
+_lazy_type_converters: dict[str, _Converter[Any]] = {
+    "datetime.datetime": _temporal_converter,
+    "datetime.date": _temporal_converter,
+    "datetime.time": _temporal_converter,
+    "datetime.timedelta": _temporal_converter,
+    "numpy.ndarray": _ndarray_converter,
+    "array.array": _array_converter,
+    "mmap.mmap": _mmap_converter,
+    "xntricweb.xapi.files.InputFile": _file_converter,
+    "xntricweb.xapi.files.OutputFile": _file_converter,
+    "pathlib.Path": _path_converter,
+    "pathlib.PurePath": _path_converter,
+}
+"""
+Converters for types from modules xapi doesn't import itself, keyed by
+qualified name. An entry is moved into type_converters the first time its
+type is seen, annotating with the type implies its module is loaded.
+"""
+
 
 def _get_converter(origin: AnyType) -> _Converter[Any] | None:
     log.debug("Getting converter for origin %r", origin)
     converter = type_converters.get(origin, None)
+    if not converter and _lazy_type_converters:
+        converter = _get_lazy_converter(origin)
+    if not converter and hasattr(origin, "__dataclass_fields__"):
+        converter = _structure_converter
     if not converter:
         log.debug("searching base converters for origin: %r", origin)
         _bases = getattr(origin, "__bases__", None)
@@ -283,6 +746,8 @@ def _get_converter(origin: AnyType) -> _Converter[Any] | None:
             log.debug("found base types %r", _bases)
             for base in reversed(_bases):
                 converter = type_converters.get(base)
+                if not converter and _lazy_type_converters:
+                    converter = _get_lazy_converter(base)
                 if converter:
                     break
         # else:
@@ -299,7 +764,21 @@ def _get_converter(origin: AnyType) -> _Converter[Any] | None:
     return converter
 
 
-def _convert(value: Any, annotation: AnyType):
+def _get_lazy_converter(origin: AnyType) -> _Converter[Any] | None:
+    qualname = getattr(origin, "__qualname__", None)
+    if not qualname:
+        return None
+
+    converter = _lazy_type_converters.pop(
+        f"{getattr(origin, '__module__', None)}.{qualname}", None
+    )
+    if converter:
+        log.debug("registering lazy converter %r for %r", converter, origin)
+        type_converters[origin] = converter
+    return converter
+
+
+def _convert(value: Any, annotation: AnyType, metadata: tuple[Any, ...] = ()):
     log.debug("Attempting conversion for %r as %r", value, annotation)
     if not annotation or annotation is None.__class__:
         return value
@@ -322,4 +801,5 @@ def _convert(value: Any, annotation: AnyType):
         origin=origin,
         origin_args=origin_args,
         annotation=annotation,
+        metadata=metadata,
     )
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import os
+import pickle
+from hashlib import sha256
+from time import time
+from types import CodeType
+from typing import TYPE_CHECKING, Any, Literal, Optional, cast
+from weakref import WeakKeyDictionary
+
+from .const import log
+
+if TYPE_CHECKING:
+    import sqlite3
+
+    from .entrypoint import Entrypoint
+
+type CacheMode = Literal["off", "refresh"]
+
+
+def default_cache_dir() -> str:
+    """
+    The directory results are persisted under, ``$XAPI_CACHE_DIR`` or
+    ``xntricweb-xapi`` in the user's cache directory.
+    """
+    if path := os.environ.get("XAPI_CACHE_DIR"):
+        return path
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "xntricweb-xapi")
+
+
+_SCHEMA = """
+PRAGMA journal_mode=WAL;
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    entrypoint TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (entrypoint, accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    entrypoint TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class _ResultStore:
+    """Pickled results in a sqlite database, shared per file."""
+
+    def __init__(self, path: str):
+        import threading
+
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._local = threading.local()
+        self._db.executescript(_SCHEMA)
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # a sqlite connection only works on the thread that opened it, so
+        # commands run --concurrently each get their own
+        if not (db := getattr(self._local, "db", None)):
+            import sqlite3
+
+            db = self._local.db = sqlite3.connect(self.path)
+        return db
+
+    def get(self, name: str, key: str, ttl: Optional[float]) -> tuple[bool, Any]:
+        row = self._db.execute(
+            "SELECT value, created FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return False, None
+
+        now = time()
+        with self._db:
+            if ttl is not None and row[1] + ttl < now:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return False, None
+
+            self._db.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return True, pickle.loads(row[0])
+
+    def put(self, name: str, key: str, value: bytes, policy: CachePolicy):
+        now = time()
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, name, value, len(value), now, now),
+            )
+            self._evict(name, policy, now)
+
+    def _evict(self, name: str, policy: CachePolicy, now: float):
+        if policy.ttl is not None:
+            self._db.execute(
+                "DELETE FROM entries WHERE entrypoint = ? AND created < ?",
+                (name, now - policy.ttl),
+            )
+
+        if policy.max_entries is not None:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries"
+                " WHERE entrypoint = ? ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (name, policy.max_entries),
+            )
+
+        if policy.max_bytes is not None:
+            total = 0
+            evicted: list[tuple[str]] = []
+            for key, size in self._db.execute(
+                "SELECT key, size FROM entries WHERE entrypoint = ?"
+                " ORDER BY accessed DESC",
+                (name,),
+            ):
+                total += size
+                if total > policy.max_bytes:
+                    evicted.append((key,))
+            if evicted:
+                self._db.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def count(self, name: str, hit: bool):
+        column = "hits" if hit else "misses"
+        with self._db:
+            self._db.execute(
+                f"INSERT INTO stats (entrypoint, {column}) VALUES (?, 1)"
+                f" ON CONFLICT (entrypoint) DO UPDATE SET {column} = {column} + 1",
+                (name,),
+            )
+
+    def stats(self, name: str) -> dict[str, int]:
+        hits, misses = self._db.execute(
+            "SELECT hits, misses FROM stats WHERE entrypoint = ?", (name,)
+        ).fetchone() or (0, 0)
+        entries, size = self._db.execute(
+            "SELECT count(*), coalesce(sum(size), 0) FROM entries"
+            " WHERE entrypoint = ?",
+            (name,),
+        ).fetchone()
+        return {"hits": hits, "misses": misses, "entries": entries, "bytes": size}
+
+    def clear(self, name: str):
+        with self._db:
+            self._db.execute("DELETE FROM entries WHERE entrypoint = ?", (name,))
+            self._db.execute("DELETE FROM stats WHERE entrypoint = ?", (name,))
+
+
+_stores: dict[str, _ResultStore] = {}
+
+
+def _hash_code(digest: Any, code: CodeType):
+    # the repr of nested code objects (genexprs, lambdas, inner functions)
+    # holds their address, so they are hashed field by field to get the
+    # same digest in every process
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        _hash_const(digest, const)
+
+
+def _hash_const(digest: Any, const: Any):
+    if isinstance(const, CodeType):
+        _hash_code(digest, const)
+    elif isinstance(const, tuple):
+        digest.update(b"(")
+        for item in cast(tuple[Any, ...], const):
+            _hash_const(digest, item)
+        digest.update(b")")
+    elif isinstance(const, frozenset):
+        # set order depends on string hashing, which differs per process
+        digest.update(repr(sorted(map(repr, cast(frozenset[Any], const)))).encode())
+    else:
+        digest.update(repr(const).encode())
+
+
+def _stamp_files(value: Any) -> Any:
+    # files are keyed by their path, modification time and size, results
+    # computed from an earlier version of an input file aren't reused
+    from .files import InputFile
+
+    if isinstance(value, (list, tuple)):
+        return [_stamp_files(item) for item in cast(list[Any], value)]
+    if isinstance(value, InputFile):
+        path = value.path
+    elif isinstance(value, os.PathLike):
+        path = os.fspath(cast("os.PathLike[str]", value))
+    else:
+        return value
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (path, None)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+class CachePolicy:
+    """
+    Caches the results of a deterministic entrypoint on disk, keyed by a
+    hash of its converted call arguments and its code.
+
+    Pass it as ``@xapi.entrypoint(cache=CachePolicy(...))``, the command
+    then accepts ``--no-cache``, ``--refresh`` and ``--cache-stats``.
+    Arguments and results that can't be pickled are never cached.
+    """
+
+    ttl: Optional[float]
+    """Seconds a result stays valid, None keeps it until evicted."""
+
+    max_entries: Optional[int]
+    """Results kept for the entrypoint, least recently used are evicted."""
+
+    max_bytes: Optional[int]
+    """Pickled bytes kept for the entrypoint, least recently used are evicted."""
+
+    path: Optional[str]
+    """The sqlite file, defaults to ``results.sqlite3`` in the cache dir."""
+
+    version: Any
+    """Part of every key, change it to invalidate existing results."""
+
+    __slots__ = ("ttl", "max_entries", "max_bytes", "path", "version", "_names")
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = 1024,
+        max_bytes: Optional[int] = 64 << 20,
+        path: Optional[str] = None,
+        version: Any = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.version = version
+        self._names: WeakKeyDictionary[Entrypoint, tuple[str, bytes]] = (
+            WeakKeyDictionary()
+        )
+
+    def _get_store(self) -> _ResultStore:
+        path = self.path or os.path.join(default_cache_dir(), "results.sqlite3")
+        if not (store := _stores.get(path)):
+            store = _stores[path] = _ResultStore(path)
+        return store
+
+    def _get_name(self, entrypoint: Entrypoint) -> tuple[str, bytes]:
+        # the qualified name identifies the entrypoint across runs, the
+        # code digest drops results computed by an older implementation
+        if not (name := self._names.get(entrypoint)):
+            fn: Any = entrypoint.entrypoint
+            code = getattr(fn, "__code__", None)
+            digest = sha256()
+            if code:
+                _hash_code(digest, code)
+            name = self._names[entrypoint] = (
+                f"{getattr(fn, '__module__', None)}."
+                f"{getattr(fn, '__qualname__', entrypoint.name)}",
+                digest.digest(),
+            )
+        return name
+
+    def _get_key(
+        self, name: str, code: bytes, args: list[Any], kwargs: dict[str, Any]
+    ) -> Optional[str]:
+        args = [_stamp_files(value) for value in args]
+        kwargs = {key: _stamp_files(value) for key, value in kwargs.items()}
+        try:
+            data = pickle.dumps(
+                (name, code, self.version, args, sorted(kwargs.items())),
+                protocol=5,
+            )
+        except Exception as e:
+            log.debug("not caching, arguments can't be pickled: %r", e)
+            return None
+        return sha256(data).hexdigest()
+
+    def call(
+        self,
+        entrypoint: Entrypoint,
+        args: list[Any],
+        kwargs: dict[str, Any],
+        mode: Optional[CacheMode] = None,
+    ) -> Any:
+        """
+        Returns the cached result of calling `entrypoint`, calling and
+        storing it on a miss. ``refresh`` skips the lookup, ``off`` skips
+        the cache entirely.
+        """
+        assert entrypoint.entrypoint
+        fn = entrypoint.entrypoint
+        if mode == "off":
+            return fn(*args, **kwargs)
+
+        name, code = self._get_name(entrypoint)
+        if not (key := self._get_key(name, code, args, kwargs)):
+            return fn(*args, **kwargs)
+
+        store = self._get_store()
+        if mode != "refresh":
+            found, result = store.get(name, key, self.ttl)
+            store.count(name, found)
+            if found:
+                log.debug("cache hit for %r", name)
+                return result
+            log.debug("cache miss for %r", name)
+
+        result = fn(*args, **kwargs)
+        try:
+            data = pickle.dumps(result, protocol=5)
+        except Exception as e:
+            log.debug("not caching, result can't be pickled: %r", e)
+            return result
+
+        store.put(name, key, data, self)
+        return result
+
+    def stats(self, entrypoint: Entrypoint) -> dict[str, int]:
+        """The hits, misses, entries and bytes stored for `entrypoint`."""
+        return self._get_store().stats(self._get_name(entrypoint)[0])
+
+    def clear(self, entrypoint: Entrypoint):
+        """Drops the results and stats stored for `entrypoint`."""
+        self._get_store().clear(self._get_name(entrypoint)[0])
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import io
+import sys
+from contextvars import ContextVar, copy_context
+from typing import IO, Any, Callable, Literal, Optional, Sequence
+
+from .const import log
+
+type Runner = Literal["thread", "asyncio"]
+
+RUNNERS: tuple[Runner, ...] = ("thread", "asyncio")
+
+type Command = tuple[str, Callable[[], Any]]
+"""A command line and the call running it."""
+
+
+class CommandRun:
+    """The outcome and collected output of one concurrently run command."""
+
+    command: str
+    """The command line, as given."""
+
+    result: Any
+    """What the entrypoint returned, None when it failed."""
+
+    exit_code: int
+    """0, the code the command exited with or 1 for an exception."""
+
+    __slots__ = ("command", "result", "exit_code", "stdout", "stderr")
+
+    def __init__(self, command: str):
+        self.command = command
+        self.result: Any = None
+        self.exit_code = 0
+        self.stdout = io.StringIO()
+        self.stderr = io.StringIO()
+
+
+_outputs: ContextVar[Optional[CommandRun]] = ContextVar("xapi_outputs", default=None)
+
+
+class _RoutedStream:
+    """
+    Stands in for stdout or stderr while commands run, text written from a
+    command's context is collected in its :class:`CommandRun`.
+    """
+
+    __slots__ = ("_stream", "_name")
+
+    def __init__(self, stream: IO[str], name: Literal["stdout", "stderr"]):
+        self._stream = stream
+        self._name = name
+
+    def _target(self) -> IO[str]:
+        if run := _outputs.get():
+            return getattr(run, self._name)
+        return self._stream
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def writelines(self, lines: Any):
+        self._target().writelines(lines)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+def _exit_code(code: Any) -> int:
+    if code is None:
+        return 0
+    return code if isinstance(code, int) else 1
+
+
+def _fail(run: CommandRun, error: BaseException):
+    if isinstance(error, SystemExit):
+        run.exit_code = _exit_code(error.code)
+        if isinstance(error.code, str):
+            print(error.code, file=run.stderr)
+        return
+
+    import traceback
+
+    run.exit_code = 1
+    traceback.print_exception(error, file=run.stderr)
+
+
+def _run_command(command: str, call: Callable[[], Any]) -> CommandRun:
+    run = CommandRun(command)
+    _outputs.set(run)
+    try:
+        result = call()
+        if hasattr(result, "__await__"):
+            import asyncio
+
+            result = asyncio.run(result)
+        run.result = result
+    except (Exception, SystemExit) as e:
+        _fail(run, e)
+    return run
+
+
+def _run_threads(commands: Sequence[Command], jobs: int) -> list[CommandRun]:
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(jobs, thread_name_prefix="xapi-command") as pool:
+        futures = [
+            pool.submit(copy_context().run, _run_command, command, call)
+            for command, call in commands
+        ]
+        return [future.result() for future in futures]
+
+
+def _run_asyncio(commands: Sequence[Command], jobs: int) -> list[CommandRun]:
+    import asyncio
+
+    async def run_command(
+        semaphore: asyncio.Semaphore, command: str, call: Callable[[], Any]
+    ) -> CommandRun:
+        # every task has its own context, calls made through to_thread
+        # inherit it along with the output routing
+        async with semaphore:
+            run = CommandRun(command)
+            _outputs.set(run)
+            try:
+                result = await asyncio.to_thread(call)
+                if hasattr(result, "__await__"):
+                    result = await result
+                run.result = result
+            except (Exception, SystemExit) as e:
+                _fail(run, e)
+            return run
+
+    async def run_all() -> list[CommandRun]:
+        semaphore = asyncio.Semaphore(jobs)
+        return await asyncio.gather(
+            *(run_command(semaphore, command, call) for command, call in commands)
+        )
+
+    return asyncio.run(run_all())
+
+
+def run_concurrently(
+    commands: Sequence[Command],
+    jobs: Optional[int] = None,
+    runner: Runner = "thread",
+) -> list[CommandRun]:
+    """
+    Runs `commands` concurrently, collecting what each writes to stdout and
+    stderr instead of interleaving it.
+
+    :param jobs: The most commands running at once, all of them when None.
+    :param runner: ``thread`` runs each command on a worker thread,
+        ``asyncio`` runs them as tasks on one event loop, awaiting ``async``
+        entrypoints there and moving the others to threads.
+    """
+    if runner not in RUNNERS:
+        raise ValueError(f"Unknown runner {runner!r}")
+    if jobs is not None and jobs < 1:
+        raise ValueError("At least one job has to run at a time")
+
+    jobs = jobs or max(len(commands), 1)
+    log.debug("running %d commands, %d at a time", len(commands), jobs)
+
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = _RoutedStream(stdout, "stdout")  # type: ignore
+    sys.stderr = _RoutedStream(stderr, "stderr")  # type: ignore
+    try:
+        if runner == "asyncio":
+            return _run_asyncio(commands, jobs)
+        return _run_threads(commands, jobs)
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+def report(runs: Sequence[CommandRun]) -> int:
+    """
+    Writes the collected output of every command in order and returns the
+    aggregated exit code, the highest one.
+    """
+    for run in runs:
+        sys.stdout.write(run.stdout.getvalue())
+        sys.stderr.write(run.stderr.getvalue())
+        if run.exit_code:
+            print(
+                f"{run.command}: failed with exit code {run.exit_code}",
+                file=sys.stderr,
+            )
+    sys.stdout.flush()
+    return max((run.exit_code for run in runs), default=0)
@@ -1,36 +1,181 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-import inspect
-from typing import Optional, Any, Callable, Sequence
+from collections.abc import Awaitable, Iterator
+from sys import intern
+from time import perf_counter
+from types import CodeType
+from typing import TYPE_CHECKING, Optional, Any, Callable, Sequence, cast
+from weakref import WeakKeyDictionary
 
 from xntricweb.xapi.utility import coalesce, is_any
 
 from .arguments import Argument
 from .const import NOT_SPECIFIED, NotSpecified
 from .const import log
+from .resources import ResourceScope
+from .tracing import span
+
+if TYPE_CHECKING:
+    import inspect
+
+    from .cache import CachePolicy
+    from .sharding import ShardPolicy
+    from .hooks import Hooks
 
 root_entrypoints: list[Entrypoint] = []
 root_effects: list[Entrypoint] = []
 
 
-@dataclass
 class Entrypoint:
     """
     An application entrypoint.
+
+    Entrypoints hash and compare by identity, arguments are held in a
+    tuple and leaf entrypoints share an empty tuple for their children.
+    Their fields are frozen once initialized, sub entrypoints can still be
+    attached and function style attributes can still be set.
+
+    Subclasses expose their public methods as sub entrypoints. Methods are
+    discovered once per class, and only when the sub entrypoints are first
+    needed.
+    """
+
+    name: Optional[str]
+    aliases: Optional[tuple[str, ...]]
+    help: Optional[str]
+    deprecated: Optional[bool]
+    description: Optional[str]
+    epilog: Optional[str]
+    usage: Optional[str]
+    entrypoint: Optional[Callable[..., Any]]
+    parent: Optional[Entrypoint]
+    arguments: tuple[Argument, ...]
+    cache: Optional[CachePolicy]
+    """Caches the entrypoint's results on disk, see :class:`CachePolicy`."""
+
+    inputs: Optional[tuple[str, ...]]
+    """Names of the arguments holding the files the entrypoint reads."""
+
+    outputs: Optional[tuple[str, ...]]
+    """
+    Names of the arguments holding the files the entrypoint writes. When
+    set, calls whose outputs are up to date with their inputs are skipped.
     """
 
-    name: Optional[str] = None
-    aliases: Optional[list[str]] = None
-    help: Optional[str] = None
-    deprecated: Optional[bool] = None
-    description: Optional[str] = None
-    epilog: Optional[str] = None
-    usage: Optional[str] = None
-    entrypoint: Optional[Callable[..., Any]] = None
-    parent: Optional[Entrypoint] = None
-    arguments: Optional[list[Argument]] = None
-    entrypoints: Optional[list[Entrypoint]] = None
+    chain_input: Optional[str]
+    """
+    The argument receiving the previous command's result when chained with
+    ``::``, defaults to the first positional argument.
+    """
+
+    shard: Optional[ShardPolicy]
+    """Splits the entrypoint's input between invocations, see :class:`ShardPolicy`."""
+
+    _entrypoints: Sequence[Entrypoint]
+    _discovered: bool
+
+    __slots__ = (
+        "name",
+        "aliases",
+        "help",
+        "deprecated",
+        "description",
+        "epilog",
+        "usage",
+        "entrypoint",
+        "parent",
+        "arguments",
+        "cache",
+        "inputs",
+        "outputs",
+        "chain_input",
+        "shard",
+        "_entrypoints",
+        "_discovered",
+        "_frozen",
+        # entrypoints stand in for the decorated function, so they keep
+        # accepting function style attributes. The dict is only allocated
+        # once one is set.
+        "__dict__",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        aliases: Optional[Sequence[str]] = None,
+        help: Optional[str] = None,
+        deprecated: Optional[bool] = None,
+        description: Optional[str] = None,
+        epilog: Optional[str] = None,
+        usage: Optional[str] = None,
+        entrypoint: Optional[Callable[..., Any]] = None,
+        parent: Optional[Entrypoint] = None,
+        arguments: Optional[Sequence[Argument]] = None,
+        entrypoints: Optional[Sequence[Entrypoint]] = None,
+        cache: Optional[CachePolicy] = None,
+        inputs: Optional[Sequence[str]] = None,
+        outputs: Optional[Sequence[str]] = None,
+        chain_input: Optional[str] = None,
+        shard: Optional[ShardPolicy] = None,
+    ):
+        self.name = intern(name) if name else name
+        self.aliases = tuple(intern(alias) for alias in aliases) if aliases else None
+        self.help = help
+        self.deprecated = deprecated
+        self.description = description
+        self.epilog = epilog
+        self.usage = usage
+        self.entrypoint = entrypoint
+        self.parent = parent
+        self.arguments = tuple(arguments) if arguments else ()
+        self.cache = cache
+        self.inputs = tuple(inputs) if inputs else None
+        self.outputs = tuple(outputs) if outputs else None
+        self.chain_input = chain_input
+        self.shard = shard
+
+        if self.arguments:
+            names = {argument.name for argument in self.arguments}
+            declared = (self.inputs or ()) + (self.outputs or ())
+            if chain_input:
+                declared += (chain_input,)
+            if shard and shard.argument:
+                declared += (shard.argument,)
+            for name in declared:
+                if name not in names:
+                    raise ValueError(f"{name!r} is not an argument of {self.name}")
+
+        if shard and not self.shard_argument:
+            raise ValueError(f"{self.name} has no *args argument to shard")
+        self._entrypoints = list(entrypoints) if entrypoints else ()
+        self._discovered = self.__class__ is Entrypoint
+
+        if self.parent:
+            self.parent.add_subentrypoint(self)
+
+        if not self._discovered:
+            self._init_subclass()
+
+        assert self.name or self.entrypoint, "name or entrypoint are required"
+        self._frozen = True
+
+    def __setattr__(self, name: str, value: Any):
+        if name in _frozen_fields and getattr(self, "_frozen", False):
+            raise AttributeError(f"{self.__class__.__name__} is immutable")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str):
+        if name in _frozen_fields:
+            raise AttributeError(f"{self.__class__.__name__} is immutable")
+        object.__delattr__(self, name)
+
+    @property
+    def entrypoints(self) -> Sequence[Entrypoint]:
+        """The sub entrypoints, class methods are discovered on first access."""
+        if not self._discovered:
+            self._discover_subentrypoints()
+        return self._entrypoints
 
     @property
     def has_required_arguments(self) -> bool:
@@ -38,6 +183,30 @@ class Entrypoint:
             return False
         return any([arg.default is NotSpecified for arg in self.arguments])
 
+    @property
+    def chain_argument(self) -> Optional[Argument]:
+        """The argument a chained command's result is passed as."""
+        for argument in self.arguments:
+            if self.chain_input:
+                if argument.name == self.chain_input:
+                    return argument
+            elif argument.index is not None and not argument.vararg:
+                return argument
+        return None
+
+    @property
+    def shard_argument(self) -> Optional[Argument]:
+        """The argument whose items are split between shards."""
+        if not self.shard:
+            return None
+        for argument in self.arguments:
+            if self.shard.argument:
+                if argument.name == self.shard.argument:
+                    return argument
+            elif argument.vararg and argument.index is not None:
+                return argument
+        return None
+
     @property
     def has_kwargs(self) -> bool:
         if not self.arguments:
@@ -51,124 +220,228 @@ class Entrypoint:
 
         return self.entrypoint(*args, **kwargs)
 
-    def __key(self):
-        return (
-            self.name,
-            self.aliases,
-            self.help,
-            self.deprecated,
-            self.description,
-            self.epilog,
-            self.usage,
-            self.entrypoint,
-            self.parent,
-            self.arguments,
-            self.entrypoints,
-        )
-
-    def __hash__(self):
-        return hash(self.__key)
-
-    def __eq__(self, other: Any):
-        if other_key := getattr(other, "__key", None):
-            return self.__key() == other_key
-        return False
-
-    def __post_init__(self):
-        if not self.entrypoints:
-            self.entrypoints = []
-
-        if not self.arguments:
-            self.arguments = []
-
-        if self.parent:
-            self.parent.add_subentrypoint(self)
-
-        if self.__class__ is not Entrypoint:
-            self._init_subclass()
-
-        assert self.name or self.entrypoint, "name or entrypoint are required"
-
     def _init_subclass(self):
         log.debug("initializing subclass %r", self.__class__.__name__)
         if not self.name:
-            self.name = self.__class__.__name__.lower()
-
-        include = getattr(self, "_include_entries_", None)
-        exclude = getattr(self, "_exclude_entries_", [])
-        exclude.extend(dir(Entrypoint))
+            self.name = intern(self.__class__.__name__.lower())
 
-        log.debug("method inclusions: %r", include)
-        log.debug("method exclusions: %r", exclude)
+    def _discover_subentrypoints(self):
+        self._discovered = True
 
-        if include:
-            for name in include:
-                if name not in exclude:
-                    self._init_subentrypoint(name)
-            return
-
-        for name in dir(self):
-            if name[0] != "_" and name not in exclude:
-                self._init_subentrypoint(name)
-            else:
-                log.debug("exclude potential entrypoint %r", name)
+        cls = self.__class__
+        if (names := _subclass_entries.get(cls)) is None:
+            log.debug("discovering sub entrypoints for %r", cls.__name__)
+            names = _subclass_entries[cls] = _get_subclass_entry_names(cls)
 
-    def _init_subentrypoint(self, name: str):
-        log.debug("initializing sub entypoint: %r", name)
-        fn = getattr(self, name)
-        subentrypoint = self.from_function(fn)
-        self.add_subentrypoint(subentrypoint)
+        discovered = [self.from_function(getattr(self, name)) for name in names]
+        # entrypoints attached before discovery keep their place after the
+        # discovered methods
+        self._entrypoints = discovered + list(self._entrypoints)
 
     def add_subentrypoint(self, entrypoint: Entrypoint):
         assert not self.has_required_arguments, (
             "Entrypoint with required params cannot be used as parents"
         )
 
-        if not self.entrypoints:
-            self.entrypoints = []
-
-        self.entrypoints.append(entrypoint)
+        if not self._entrypoints:
+            self._entrypoints = [entrypoint]
+        else:
+            cast(list[Entrypoint], self._entrypoints).append(entrypoint)
 
     def generate_call_args(
-        self, params: dict[str, Any], raw_kw: dict[str, str]
+        self,
+        params: dict[str, Any],
+        raw_kw: dict[str, str],
+        overrides: Optional[dict[str, Any]] = None,
     ) -> tuple[list[Any], dict[str, Any]]:
+        """
+        :param overrides: Values that are passed as they are, without
+            conversion, e.g. the result handed over by a chained command.
+        """
         args: list[Any] = []
         kwargs: dict[str, Any] = {}
 
+        shard = params.get("__shard__") if self.shard else None
+        sharded = self.shard_argument if shard else None
+
         if self.arguments:
             for arg in self.arguments:
-                if arg.index is None and arg.vararg:
-                    value = raw_kw
+                start = len(args)
+                if overrides and arg.name in overrides:
+                    arg.generate_call_arg(overrides[arg.name], args, kwargs, False)
                 else:
-                    value = params.get(arg.name, arg.default)
-
-                arg.generate_call_arg(value, args, kwargs)
+                    with span(f"convert {arg.name}"):
+                        arg.generate_call_arg(
+                            (
+                                raw_kw
+                                if arg.index is None and arg.vararg
+                                else params.get(arg.name, arg.default)
+                            ),
+                            args,
+                            kwargs,
+                        )
+
+                if arg is sharded:
+                    self._shard_call_arg(arg, args, kwargs, start, shard, params)
 
         return args, kwargs
 
-    def execute(self, params: dict[str, Any], raw_kwargs: dict[str, str]) -> Any:
-        if self.parent:
-            self.parent.execute(params, raw_kwargs)
+    def _shard_call_arg(
+        self,
+        arg: Argument,
+        args: list[Any],
+        kwargs: dict[str, Any],
+        start: int,
+        shard: Any,
+        params: dict[str, Any],
+    ):
+        assert self.shard
+        by = params.get("__shard_by__")
+        if arg.vararg:
+            args[start:] = self.shard.partition(args[start:], shard, by)
+        elif arg.name in kwargs:
+            kwargs[arg.name] = self.shard.partition(kwargs[arg.name], shard, by)
+        elif len(args) > start:
+            args[start] = self.shard.partition(args[start], shard, by)
+
+    def execute(
+        self,
+        params: dict[str, Any],
+        raw_kwargs: dict[str, str],
+        hooks: Optional[Hooks] = None,
+        overrides: Optional[dict[str, Any]] = None,
+    ) -> Any:
+        with span(f"execute {self.name}"):
+            if self.parent:
+                self.parent.execute(params, raw_kwargs, hooks)
+
+            if not self.entrypoint:
+                raise AttributeError("Nothing to do for entrypoint: %s" % self.name)
+
+            return self._execute_in_scope(params, raw_kwargs, hooks, overrides)
+
+    def _execute_in_scope(
+        self,
+        params: dict[str, Any],
+        raw_kwargs: dict[str, str],
+        hooks: Optional[Hooks],
+        overrides: Optional[dict[str, Any]],
+    ) -> Any:
+        # resources opened by converters are closed once the call returns,
+        # or once the iterator it returned is exhausted
+        with ResourceScope() as scope:
+            if hooks:
+                result = self._execute_with_hooks(params, raw_kwargs, hooks, overrides)
+            else:
+                arg, kwargs = self.generate_call_args(params, raw_kwargs, overrides)
+                result = self._call(params, arg, kwargs)
 
-        if not self.entrypoint:
-            raise AttributeError("Nothing to do for entrypoint: %s" % self.name)
+            if isinstance(result, Iterator):
+                return scope.defer(cast(Iterator[Any], result))
+            if isinstance(result, Awaitable):
+                return scope.defer_await(cast(Awaitable[Any], result))
+            return result
+
+    def _call(self, params: dict[str, Any], args: list[Any], kwargs: dict[str, Any]):
+        assert self.entrypoint
 
-        arg, kwargs = self.generate_call_args(params, raw_kwargs)
-        return self.entrypoint(*arg, **kwargs)
+        if self.outputs:
+            from . import incremental
+
+            stamp = incremental.check(
+                self, args, kwargs, params.get("__force__", False)
+            )
+            if not stamp:
+                return None
+
+            result = self._call_target(params, args, kwargs)
+            return incremental.save_when_done(stamp, result)
+
+        return self._call_target(params, args, kwargs)
+
+    def _call_target(
+        self, params: dict[str, Any], args: list[Any], kwargs: dict[str, Any]
+    ):
+        assert self.entrypoint
+
+        with span(f"call {self.name}"):
+            if self.cache:
+                return self.cache.call(self, args, kwargs, params.get("__cache__"))
+
+            return self.entrypoint(*args, **kwargs)
+
+    def _execute_with_hooks(
+        self,
+        params: dict[str, Any],
+        raw_kwargs: dict[str, str],
+        hooks: Hooks,
+        overrides: Optional[dict[str, Any]] = None,
+    ) -> Any:
+        assert self.entrypoint
+
+        started = perf_counter()
+        hooks.emit("before_convert", entrypoint=self, params=params)
+        args, kwargs = self.generate_call_args(params, raw_kwargs, overrides)
+
+        converted = perf_counter()
+        hooks.emit(
+            "before_execute",
+            entrypoint=self,
+            params=params,
+            args=args,
+            kwargs=kwargs,
+            elapsed=converted - started,
+        )
+        result = self._call(params, args, kwargs)
+
+        hooks.emit(
+            "after_execute",
+            entrypoint=self,
+            params=params,
+            args=args,
+            kwargs=kwargs,
+            result=result,
+            elapsed=perf_counter() - converted,
+        )
+        return result
 
     @staticmethod
     def from_function(fn: Callable[..., Any], **overrides: Any):
-        details: dict[str, Any] = _get_fn_details(fn)
-        spec = inspect.signature(fn)
+        details, arguments = _introspect(fn)
         return Entrypoint(
             entrypoint=fn,
-            arguments=[
-                Argument(**info)
-                for info in _get_inspect_arg_details(list(spec.parameters.values()))
-            ],
+            arguments=arguments,
             **(details | overrides),
         )
 
+    @staticmethod
+    def invalidate_introspection(
+        target: Optional[Callable[..., Any] | Entrypoint | type[Entrypoint]] = None,
+    ):
+        """
+        Drops cached introspection results.
+
+        :param target: A function (or the Entrypoint wrapping it) whose
+            signature should be inspected again, or an Entrypoint subclass
+            whose methods should be discovered again. Everything is dropped
+            when omitted.
+        """
+        if target is None:
+            _introspection_cache.clear()
+            _subclass_entries.clear()
+            return
+
+        if isinstance(target, type) and issubclass(target, Entrypoint):
+            _subclass_entries.pop(target, None)
+            return
+
+        if isinstance(target, Entrypoint):
+            target = target.entrypoint
+
+        target = getattr(target, "__func__", target)
+        if code := getattr(target, "__code__", None):
+            _introspection_cache.pop(code, None)
+
     def __str__(self):
         return f"entrypoint({self.name})"
 
@@ -177,13 +450,144 @@ class Entrypoint:
             ', '.join(
                 [
                     f'{k}={v}'
-                    for k, v in vars(self).items()
-                    if not (v is None or v is NOT_SPECIFIED or k[0] == ('_'))
+                    for k in self.__slots__
+                    if not (
+                        k[0] == "_"
+                        or (v := getattr(self, k)) is None
+                        or v is NOT_SPECIFIED
+                    )
                 ]
             )
         })"
 
 
+_frozen_fields = frozenset(
+    name for name in Entrypoint.__slots__ if name[0] != "_"
+) | {"entrypoints"}
+
+_subclass_entries: WeakKeyDictionary[type[Entrypoint], tuple[str, ...]] = (
+    WeakKeyDictionary()
+)
+"""Discovered method names, per Entrypoint subclass."""
+
+_introspection_cache: WeakKeyDictionary[
+    CodeType,
+    dict[bool, tuple[tuple[Any, ...], dict[str, Any], tuple[Argument, ...]]],
+] = WeakKeyDictionary()
+"""
+Function details and arguments, keyed on the function's code object and
+whether it was bound. Re-created closures, repeatedly instantiated class
+based groups and re-registered functions share a code object, entries are
+only reused while the function's fingerprint still matches.
+"""
+
+_entrypoint_attributes = frozenset(dir(Entrypoint))
+
+
+def _get_subclass_entry_names(cls: type[Entrypoint]) -> tuple[str, ...]:
+    include = getattr(cls, "_include_entries_", None)
+    exclude = _entrypoint_attributes.union(getattr(cls, "_exclude_entries_", ()))
+
+    log.debug("method inclusions: %r", include)
+    log.debug("method exclusions: %r", exclude)
+
+    if include:
+        return tuple(name for name in include if name not in exclude)
+
+    names: list[str] = []
+    for name in dir(cls):
+        if name[0] != "_" and name not in exclude and callable(getattr(cls, name)):
+            names.append(name)
+        else:
+            log.debug("exclude potential entrypoint %r", name)
+    return tuple(names)
+
+
+_plain_types = frozenset((str, bytes, int, float, complex, bool, type(None)))
+
+
+class _Same:
+    """Compares equal to another wrapper of the same object only."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __eq__(self, other: Any):
+        return isinstance(other, _Same) and other.value is self.value
+
+    def __hash__(self):
+        return id(self.value)
+
+
+def _default_key(value: Any) -> Any:
+    # plain values compare by type and value, so 1 and True differ, other
+    # objects by identity, arrays don't compare to a single bool
+    if type(value) in _plain_types:
+        return type(value), value
+    return _Same(value)
+
+
+def _get_fingerprint(fn: Any) -> tuple[Any, ...]:
+    return (
+        fn.__name__,
+        fn.__doc__,
+        tuple(_default_key(value) for value in fn.__defaults__ or ()),
+        tuple(
+            (name, _default_key(value))
+            for name, value in (fn.__kwdefaults__ or {}).items()
+        ),
+        fn.__annotations__,
+        getattr(fn, "__wrapped__", None),
+    )
+
+
+def _same_fingerprint(cached: tuple[Any, ...], fingerprint: tuple[Any, ...]) -> bool:
+    try:
+        return bool(cached == fingerprint)
+    except Exception:
+        # annotations whose metadata doesn't compare, e.g. arrays
+        return False
+
+
+def _introspect(
+    fn: Callable[..., Any],
+) -> tuple[dict[str, Any], tuple[Argument, ...]]:
+    target = getattr(fn, "__func__", fn)
+    if not (code := getattr(target, "__code__", None)):
+        return _inspect(fn)
+
+    bound = target is not fn
+    fingerprint = _get_fingerprint(target)
+    entries = _introspection_cache.get(code)
+    if (
+        entries
+        and (entry := entries.get(bound))
+        and _same_fingerprint(entry[0], fingerprint)
+    ):
+        log.debug("using cached introspection for %r", fn)
+        return entry[1], entry[2]
+
+    details, arguments = _inspect(fn)
+    if entries is None:
+        entries = _introspection_cache[code] = {}
+    entries[bound] = (fingerprint, details, arguments)
+    return details, arguments
+
+
+def _inspect(
+    fn: Callable[..., Any],
+) -> tuple[dict[str, Any], tuple[Argument, ...]]:
+    import inspect
+
+    spec = inspect.signature(fn)
+    return _get_fn_details(fn), tuple(
+        Argument(**info)
+        for info in _get_inspect_arg_details(list(spec.parameters.values()))
+    )
+
+
 def _get_inspect_arg_detail(index: int | None, param: inspect.Parameter):
     log.debug("generating details for parameter inspection: %r", param)
 
@@ -0,0 +1,1353 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from enum import Enum, IntEnum, StrEnum
+from functools import partial
+from itertools import islice
+from time import perf_counter
+from types import UnionType
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    NoReturn,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+    overload,
+)
+
+from .arguments import (
+    Argument,
+    ConversionError,
+    _Choices,
+    _get_enum_choices,
+    _get_literal_choices,
+)
+from .entrypoint import Entrypoint
+from .hooks import Hooks
+from .structures import assemble, get_flat_fields, is_structure
+from .tracing import span
+
+from .const import AnyType, log, NOT_SPECIFIED
+from .utility import get_origin_args
+from .xapi_docstring_parser import DocInfo
+
+if TYPE_CHECKING:
+    from .sharding import ShardPolicy
+    from .xapi import XAPI
+
+
+class _ParserTranslationContext:
+    __slots__ = ("argument", "parser_args", "parser_kwargs", "origin", "origin_params")
+
+    def __init__(
+        self,
+        argument: Argument,
+        parser_args: List[Any],
+        parser_kwargs: Dict[str, Any],
+        origin: Optional[AnyType] = None,
+        origin_params: Optional[Tuple[AnyType, ...]] = None,
+    ):
+        self.argument = argument
+        self.parser_args = parser_args
+        self.parser_kwargs = parser_kwargs
+        self.origin = origin
+        self.origin_params = origin_params
+
+
+type _Translator = Callable[[_ParserTranslationContext], None]
+
+
+def default_translator(_: _ParserTranslationContext):
+    pass
+
+
+_CHOICES_SHOWN = 8
+"""Choices listed in the usage before large choice sets are abbreviated."""
+
+
+def _set_choices(ctx: _ParserTranslationContext, choices: _Choices):
+    ctx.parser_kwargs["choices"] = choices
+    if len(choices) > _CHOICES_SHOWN and "metavar" not in ctx.parser_kwargs:
+        shown = list(islice(choices, _CHOICES_SHOWN))
+        ctx.parser_kwargs["metavar"] = (
+            f"{{{','.join(shown)},... {len(choices) - len(shown)} more}}"
+        )
+
+
+def literal_translator(ctx: _ParserTranslationContext):
+    if not ctx.origin_params or len(ctx.origin_params) == 0:
+        raise AttributeError(f"Cannot translate empty literal for {ctx.argument}")
+
+    _set_choices(ctx, _get_literal_choices(ctx.origin_params))
+
+
+def bool_translator(ctx: _ParserTranslationContext):
+    state = ctx.argument.default is True
+    ctx.parser_kwargs["default"] = state
+    ctx.parser_kwargs["action"] = f"store_{str(not state).lower()}"
+
+
+def list_translator(ctx: _ParserTranslationContext):
+    ctx.parser_kwargs["nargs"] = "*"
+
+
+def tuple_translator(ctx: _ParserTranslationContext):
+    if ctx.origin_params and ctx.origin_params[-1] is not ...:
+        ctx.parser_kwargs["nargs"] = len(ctx.origin_params)
+    else:
+        ctx.parser_kwargs["nargs"] = "*"
+
+
+def _metavar_translator(metavar: str) -> _Translator:
+    def translator(ctx: _ParserTranslationContext):
+        # positionals keep their name in the usage
+        if ctx.argument.default is not NOT_SPECIFIED:
+            ctx.parser_kwargs.setdefault("metavar", metavar)
+
+    return translator
+
+
+file_translator = _metavar_translator("FILE")
+path_translator = _metavar_translator("PATH")
+
+
+def enum_translator(ctx: _ParserTranslationContext):
+    _set_choices(ctx, _get_enum_choices(cast(type[Enum], ctx.origin)))
+
+
+def annotated_translator(ctx: _ParserTranslationContext):
+    if not ctx.origin_params:
+        raise TypeError(f"Cannot translate empty Annotated for {ctx.argument}")
+
+    ctx.origin, ctx.origin_params = get_origin_args(ctx.origin_params[0])
+    _translate(ctx)
+
+
+def union_translator(ctx: _ParserTranslationContext):
+    if not ctx.origin_params:
+        raise TypeError("Cannot generate union arguments for empty set")
+    for type in ctx.origin_params:
+        origin, origin_params = get_origin_args(type)
+        sub_ctx = _ParserTranslationContext(
+            argument=ctx.argument,
+            origin=origin,
+            origin_params=origin_params,
+            parser_args=[],
+            parser_kwargs={},
+        )
+
+        _translate(sub_ctx)
+
+        # TODO: check arg compatibility with existing args
+
+        ctx.parser_args.extend(sub_ctx.parser_args)
+        ctx.parser_kwargs.update(sub_ctx.parser_kwargs)
+
+
+# typing special forms like Union aren't types, so the keys are Any
+_translators: dict[Any, Callable[[_ParserTranslationContext], None]] = {
+    Union: union_translator,
+    UnionType: union_translator,
+    Literal: literal_translator,
+    Annotated: annotated_translator,
+    list: list_translator,
+    tuple: tuple_translator,
+    bool: bool_translator,
+    Enum: enum_translator,
+    IntEnum: enum_translator,
+    StrEnum: enum_translator,
+}
+
+_lazy_translators: dict[str, _Translator] = {
+    "numpy.ndarray": list_translator,
+    "array.array": list_translator,
+    "xntricweb.xapi.files.InputFile": file_translator,
+    "xntricweb.xapi.files.OutputFile": file_translator,
+    "pathlib.Path": path_translator,
+    "pathlib.PurePath": path_translator,
+}
+"""
+Translators for types from modules xapi doesn't import itself, keyed by
+qualified name, see ``arguments._lazy_type_converters``.
+"""
+
+
+@overload
+def _get_translator(origin: AnyType) -> _Translator | None:
+    pass
+
+
+@overload
+def _get_translator(origin: AnyType, default: _Translator) -> _Translator:
+    pass
+
+
+@overload
+def _get_translator(origin: AnyType, default: None) -> _Translator | None:
+    pass
+
+
+def _get_translator(
+    origin: AnyType, default: Optional[_Translator] = None
+) -> _Translator | None:
+    if translator := _translators.get(origin, None):
+        return translator
+
+    if _lazy_translators and (translator := _get_lazy_translator(origin)):
+        return translator
+
+    log.debug("searching base translators for origin: %r", origin)
+    if (_bases := getattr(origin, "__bases__", None)) is None:
+        if not (origin := getattr(origin, "__class__", None)):
+            raise TypeError(f"No translator available for origin {origin}")
+
+        return _get_translator(origin, default)
+
+    for base in reversed(_bases):
+        translator = _translators.get(base, None)
+        if not translator and _lazy_translators:
+            translator = _get_lazy_translator(base)
+        if translator:
+            log.debug("found translator for base %r for origin %r", base, origin)
+            return translator
+
+    return default
+
+
+def _get_lazy_translator(origin: AnyType) -> _Translator | None:
+    qualname = getattr(origin, "__qualname__", None)
+    if not qualname:
+        return None
+
+    translator = _lazy_translators.pop(
+        f"{getattr(origin, '__module__', None)}.{qualname}", None
+    )
+    if translator:
+        log.debug("registering lazy translator %r for %r", translator, origin)
+        _translators[origin] = translator
+    return translator
+
+
+def _translate(ctx: _ParserTranslationContext):
+    if not ctx.origin:
+        if ctx.argument.vararg:
+            if ctx.argument.index is not None:
+                ctx.origin = list
+                ctx.origin_params = (ctx.argument.annotation,)
+            else:
+                ctx.parser_kwargs["action"] = "store_const"
+                ctx.parser_kwargs["const"] = "KWARG"
+                # ctx.parser_kwargs["nargs"] = 0
+                return
+        else:
+            ctx.origin, ctx.origin_params = get_origin_args(ctx.argument.annotation)
+
+    translator: _Translator = _get_translator(ctx.origin, default_translator)
+
+    log.debug(
+        "translating %r argument using translator %r with origin: %r[%r]",
+        ctx.argument.name,
+        getattr(translator, "__name__", "[Unknown]"),
+        ctx.origin,
+        ctx.origin_params,
+    )
+
+    translator(ctx)
+    log.debug(
+        "translated %r argument to parser args: %r, %r",
+        ctx.argument.name,
+        ctx.parser_args,
+        ctx.parser_kwargs,
+    )
+
+
+CHAIN_SEPARATOR = "::"
+"""
+Separates the commands of a chain, ``load x :: filter --min 3``. Tokens
+after ``--`` are never split, ``echo -- ::`` passes a literal ``::``.
+"""
+
+MEMPROFILE = "--xapi-memprofile"
+"""Profiles the memory each phase of the invocation allocates."""
+
+CONCURRENTLY = "--concurrently"
+"""Runs the quoted command lines following it concurrently."""
+
+
+def _shard_type(value: str) -> tuple[int, int]:
+    from .sharding import parse_shard
+
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _is_chain(argv: list[str]) -> bool:
+    if CHAIN_SEPARATOR not in argv:
+        return False
+    return "--" not in argv or argv.index(CHAIN_SEPARATOR) < argv.index("--")
+
+
+def _split_chain(argv: list[str]) -> list[list[str]]:
+    segments: list[list[str]] = [[]]
+    for index, token in enumerate(argv):
+        if token == "--":
+            segments[-1].extend(argv[index:])
+            break
+        if token == CHAIN_SEPARATOR:
+            segments.append([])
+        else:
+            segments[-1].append(token)
+    return segments
+
+
+@contextmanager
+def _receiving(action: Optional[argparse.Action]) -> Iterator[None]:
+    # the value handed over by the previous command takes the place of the
+    # chained positional, it is optional and unchecked while parsing
+    if not action:
+        yield
+        return
+
+    saved = action.nargs, action.required, action.choices, action.default
+    action.nargs, action.required, action.choices, action.default = (
+        "?",
+        False,
+        None,
+        argparse.SUPPRESS,
+    )
+    try:
+        yield
+    finally:
+        action.nargs, action.required, action.choices, action.default = saved
+
+
+class _LazySubParsersAction(argparse._SubParsersAction):  # type: ignore
+    """
+    A subparsers action that finishes setting up the chosen sub parser
+    right before dispatching into it, so entrypoints that are never used
+    never have their arguments or children built.
+    """
+
+    executor: XAPIExecutor
+    """Populates the chosen sub parser, set once the action is added."""
+
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,
+        namespace: argparse.Namespace,
+        values: Any,
+        option_string: Optional[str] = None,
+    ):
+        if sub_parser := self._name_parser_map.get(values[0]):
+            self.executor.populate_parser(sub_parser)
+        super().__call__(parser, namespace, values, option_string)
+
+
+class XAPIExecutor:
+    def __init__(
+        self,
+        xapi: XAPI,
+        root_parser: argparse.ArgumentParser,
+        effect_parser: argparse.ArgumentParser,
+    ):
+        self.xapi = xapi
+        self.effect_parser = effect_parser
+        self.root_parser = root_parser
+        self.parsers: dict[Entrypoint, argparse.ArgumentParser] = {}
+        self._unpopulated: dict[
+            argparse.ArgumentParser,
+            tuple[Entrypoint, list[argparse.ArgumentParser]],
+        ] = {}
+        self._structures: dict[
+            tuple[Optional[Entrypoint], str], tuple[tuple[str, tuple[str, ...]], ...]
+        ] = {}
+        self._effect_options: list[tuple[list[str], dict[str, Any]]] = []
+        self.accept_kwargs = False
+        self.effect_kwargs = False
+        self._run_options_listed = False
+
+        self.setup_effects()
+
+        self.setup_entrypoints(
+            entrypoints=self.xapi.entrypoints,
+            parser=self.root_parser,
+        )
+
+    def get_argument_args(self, argument: Argument):
+        log.debug("retrieving argument args for argument: %r", argument)
+
+        kwargs: dict[str, Any] = {}
+
+        if argument.help:
+            kwargs["help"] = argument.help
+
+        if argument.metavar:
+            kwargs["metavar"] = argument.metavar
+
+        if (
+            argument.default is not NOT_SPECIFIED
+            or (argument.vararg and argument.index is None)
+            or argument.annotation is bool
+        ):
+            # if not argument.required or argument.annotation is bool:
+            dashed_name = self.xapi.dashed_name(argument.name)
+            if argument.name != dashed_name:
+                kwargs["dest"] = argument.name
+            if argument.default is not NOT_SPECIFIED:
+                kwargs["default"] = argument.default
+            args = [f"{'-' * 2}{dashed_name}"]
+        else:
+            args = [argument.name]
+
+        if argument.aliases:
+            args.extend(argument.aliases)
+
+        ctx = _ParserTranslationContext(argument, args, kwargs)
+
+        _translate(ctx)
+
+        return args, kwargs
+
+    def setup_argument(
+        self,
+        index: int,
+        argument: Argument,
+        parser: argparse.ArgumentParser,
+        doc_info: DocInfo,
+        entrypoint: Optional[Entrypoint] = None,
+        shared: frozenset[str] = frozenset(),
+    ):
+        if argument.vararg and argument.index is None:
+            self.accept_kwargs = True
+
+        log.debug("setting up argument for parser: %r", argument)
+        if not argument.vararg and is_structure(argument.annotation):
+            return self.setup_structure(
+                argument,
+                parser,
+                doc_info.get_argument_doc_info(index),
+                entrypoint,
+                shared,
+            )
+
+        args, kwargs = self.get_argument_args(argument)
+        kwargs |= doc_info.get_argument_doc_info(index)
+        _action = parser.add_argument(*args, **kwargs)
+        log.debug(
+            "finished setting up parser argument parameter: %r, %r",
+            args,
+            kwargs,
+        )
+
+        return _action
+
+    def setup_structure(
+        self,
+        argument: Argument,
+        parser: argparse.ArgumentParser,
+        doc_kwargs: dict[str, Any],
+        entrypoint: Optional[Entrypoint] = None,
+        shared: frozenset[str] = frozenset(),
+    ):
+        """
+        Flattens a dataclass or TypedDict parameter into an option per
+        field, nested fields use dotted names (``--region.name``). Fields
+        named like another option of the command are prefixed with the
+        parameter's name (``--src.host``). The parameter's own option, and
+        for a required parameter a positional, takes the whole structure
+        as json, the field options override it.
+        """
+        origin = cast(type, argument.annotation)
+        log.debug("flattening structure argument %r", argument)
+
+        group: Any = parser
+        if isinstance(parser, argparse.ArgumentParser):
+            group = parser.add_argument_group(f"{argument.name} options")
+
+        kwargs: dict[str, Any] = {
+            "metavar": "JSON",
+            "help": f"the {origin.__name__} as json, @file or -",
+            "default": argparse.SUPPRESS,
+        } | doc_kwargs
+        if argument.default is not NOT_SPECIFIED:
+            kwargs["default"] = argument.default
+        else:
+            # like any required parameter, it can be given positionally,
+            # the help lists it once, under its option
+            group.add_argument(
+                argument.name, nargs="?", **(kwargs | {"help": argparse.SUPPRESS})
+            )
+
+        args = [f"--{self.xapi.dashed_name(argument.name)}"]
+        if argument.aliases:
+            args.extend(argument.aliases)
+        _action = group.add_argument(*args, dest=argument.name, **kwargs)
+
+        taken = group._option_string_actions
+        leaves: list[tuple[str, tuple[str, ...]]] = []
+        for path, annotation, default in get_flat_fields(origin):
+            name = path
+            if path in shared or f"--{self.xapi.dashed_name(path)}" in taken:
+                name = f"{argument.name}.{path}"
+            leaf_args, leaf_kwargs = self.get_argument_args(
+                Argument(
+                    name,
+                    annotation=annotation,
+                    default=None if default is NOT_SPECIFIED else default,
+                )
+            )
+            leaf_kwargs["dest"] = dest = f"{argument.name}.{path}"
+            leaf_kwargs["default"] = argparse.SUPPRESS
+            if "action" not in leaf_kwargs:
+                leaf_kwargs.setdefault("metavar", path.rpartition(".")[2].upper())
+            group.add_argument(*leaf_args, **leaf_kwargs)
+            leaves.append((dest, tuple(path.split("."))))
+
+        self._structures[(entrypoint, argument.name)] = tuple(leaves)
+        return _action
+
+    def _get_shared_paths(self, arguments: Sequence[Argument]) -> frozenset[str]:
+        # field paths of structure parameters that another parameter, or
+        # another structure's field, would take the option of
+        counts: dict[str, int] = {}
+        for argument in arguments:
+            counts[argument.name] = counts.get(argument.name, 0) + 1
+            if argument.vararg or not is_structure(argument.annotation):
+                continue
+            for path, _, _ in get_flat_fields(cast(type, argument.annotation)):
+                counts[path] = counts.get(path, 0) + 1
+        return frozenset(path for path, count in counts.items() if count > 1)
+
+    def _assemble_structures(self, namespace: argparse.Namespace):
+        # gathers the flattened field options back into one value per
+        # structure parameter of the parsed command, the structure
+        # converter builds it from there
+        command = entrypoint = self._get_namespace_entrypoint(namespace)
+        owners: set[Optional[Entrypoint]] = {None, *self.xapi.effects}
+        while entrypoint:
+            owners.add(entrypoint)
+            entrypoint = entrypoint.parent
+
+        for (owner, name), leaves in self._structures.items():
+            if owner not in owners:
+                continue
+            values = {
+                path: getattr(namespace, dest)
+                for dest, path in leaves
+                if hasattr(namespace, dest)
+            }
+            if not values and hasattr(namespace, name):
+                continue
+
+            try:
+                value = assemble(getattr(namespace, name, None), values)
+            except ConversionError as e:
+                parser = self.parsers.get(command) if command else None
+                self._usage_error(parser or self.root_parser, f"argument {name}: {e}")
+            setattr(namespace, name, value)
+
+    def setup_arguments(
+        self,
+        arguments: Sequence[Argument] | None,
+        parser: argparse.ArgumentParser,
+        doc_info: DocInfo,
+        entrypoint: Optional[Entrypoint] = None,
+    ):
+        if not arguments:
+            return cast(list[argparse.Action], [])
+        log.debug("setting up %r arguments", len(arguments))
+        shared = frozenset[str]()
+        if any(is_structure(argument.annotation) for argument in arguments):
+            shared = self._get_shared_paths(arguments)
+        args = [
+            self.setup_argument(index, argument, parser, doc_info, entrypoint, shared)
+            for index, argument in enumerate(arguments)
+        ]
+        log.debug("finished setting up %r arguments", len(arguments))
+        return args
+
+    def setup_effects(self):
+        entrypoints = self.xapi.effects
+
+        log.debug("setting up %r effects", len(entrypoints))
+        if not entrypoints:
+            return
+
+        # the root parser takes effect options in front of the command, the
+        # parsers of the commands that run take them after it, see
+        # setup_effect_options. The effect parser is used where no command
+        # is parsed, e.g. around --concurrently.
+        group = self.root_parser.add_argument_group("effect options")
+
+        for entrypoint in entrypoints:
+            log.debug("setting up effect %r", entrypoint)
+
+            doc_info = DocInfo(entrypoint.entrypoint)
+            for parser in (self.effect_parser, group):
+                self.setup_arguments(
+                    entrypoint.arguments,
+                    cast(argparse.ArgumentParser, parser),
+                    doc_info,
+                    entrypoint,
+                )
+            for argument in entrypoint.arguments:
+                if argument.vararg or is_structure(argument.annotation):
+                    continue
+                args, kwargs = self.get_argument_args(argument)
+                if args[0].startswith("-"):
+                    self._effect_options.append((args, kwargs))
+            if entrypoint.has_kwargs:
+                self.effect_kwargs = True
+
+        log.debug("finished setting up %r effects", len(entrypoints))
+
+    def setup_entrypoints(
+        self,
+        entrypoints: Optional[Sequence[Entrypoint]] = None,
+        parser: Optional[argparse.ArgumentParser] = None,
+        parents: Optional[list[argparse.ArgumentParser]] = None,
+    ):
+        entrypoints = entrypoints or self.xapi.entrypoints
+        if not parser:
+            parser = self.root_parser
+
+        log.debug("setting up %r entrypoints", len(entrypoints))
+        sub_parsers = cast(
+            _LazySubParsersAction, parser.add_subparsers(action=_LazySubParsersAction)
+        )
+        sub_parsers.executor = self
+        if not parents:
+            parents = []
+
+        for entrypoint in entrypoints:
+            self.setup_entrypoint(entrypoint, sub_parsers, parents)
+
+        log.debug("finished setting up %r entrypoints", len(entrypoints))
+
+    def setup_entrypoint(
+        self,
+        entrypoint: Entrypoint,
+        parsers: Any,
+        parents: list[argparse.ArgumentParser],
+    ):
+        log.debug("setting up entrypoint: %r", entrypoint)
+
+        if not entrypoint.name:
+            raise AttributeError("Bad entrypoint name: %r" % entrypoint)
+
+        kwargs: dict[str, Any] = {
+            "help": entrypoint.help,
+            "description": entrypoint.description,
+            "epilog": entrypoint.epilog,
+            "usage": entrypoint.usage,
+        }
+
+        if entrypoint.deprecated is not None:
+            kwargs["deprecated"] = entrypoint.deprecated
+
+        if parents:
+            kwargs["conflict_handler"] = "resolve"
+            kwargs["parents"] = parents
+
+        if entrypoint.aliases:
+            kwargs["aliases"] = entrypoint.aliases
+
+        log.debug(
+            "initializing parser with %s with args: %r",
+            entrypoint.name,
+            kwargs,
+        )
+
+        parser: argparse.ArgumentParser = parsers.add_parser(entrypoint.name, **kwargs)
+        parser.set_defaults(__entrypoint__=entrypoint)
+
+        self.parsers[entrypoint] = parser
+        self._unpopulated[parser] = (entrypoint, parents)
+        log.debug("finished setting up entrypoint: %r", entrypoint)
+
+    def populate_parser(self, parser: argparse.ArgumentParser):
+        """
+        Adds the arguments and sub entrypoints of the entrypoint behind
+        `parser`, if that hasn't happened yet.
+        """
+        if not (pending := self._unpopulated.pop(parser, None)):
+            return
+
+        entrypoint, parents = pending
+        log.debug("populating parser for entrypoint: %r", entrypoint)
+
+        doc_info = DocInfo(entrypoint.entrypoint)
+        if description := doc_info.get_entrypoint_doc_info().get("description"):
+            parser.description = description
+
+        if entrypoint.arguments:
+            self.setup_arguments(entrypoint.arguments, parser, doc_info, entrypoint)
+
+        if self._effect_options:
+            self.setup_effect_options(parser)
+
+        if entrypoint.cache:
+            self.setup_cache_options(parser)
+
+        if entrypoint.shard:
+            self.setup_shard_options(parser, entrypoint.shard)
+
+        if entrypoint.outputs:
+            parser.add_argument(
+                "--force",
+                dest="__force__",
+                action="store_true",
+                help="run even when the outputs are up to date",
+            )
+
+        if entrypoint.entrypoints:
+            # parents.append(parser)
+            self.setup_entrypoints(
+                entrypoints=entrypoint.entrypoints,
+                parser=parser,
+                parents=parents,
+            )
+
+    def setup_effect_options(self, parser: argparse.ArgumentParser):
+        """
+        Lets the effect options follow the command. Options of the command
+        with the same name take precedence, the copies are hidden from the
+        command's help and never override a value given before the command.
+        """
+        taken = parser._option_string_actions
+        for args, kwargs in self._effect_options:
+            if any(arg in taken for arg in args):
+                continue
+            parser.add_argument(
+                *args,
+                **(kwargs | {"help": argparse.SUPPRESS, "default": argparse.SUPPRESS}),
+            )
+
+    def setup_cache_options(self, parser: argparse.ArgumentParser):
+        group = parser.add_argument_group("cache options")
+        group.add_argument(
+            "--no-cache",
+            dest="__cache__",
+            action="store_const",
+            const="off",
+            help="run without reading or storing cached results",
+        )
+        group.add_argument(
+            "--refresh",
+            dest="__cache__",
+            action="store_const",
+            const="refresh",
+            help="run and replace the cached result",
+        )
+        group.add_argument(
+            "--cache-stats",
+            dest="__cache_stats__",
+            action="store_true",
+            help="print the result cache statistics after running",
+        )
+
+    def setup_shard_options(
+        self, parser: argparse.ArgumentParser, policy: ShardPolicy
+    ):
+        from .sharding import SHARD_MODES
+
+        group = parser.add_argument_group("sharding options")
+        group.add_argument(
+            "--shard",
+            dest="__shard__",
+            type=_shard_type,
+            metavar="INDEX/COUNT",
+            help="only process shard INDEX of COUNT (1/4 to 4/4) of the input",
+        )
+        group.add_argument(
+            "--shard-by",
+            dest="__shard_by__",
+            choices=SHARD_MODES,
+            default=policy.by,
+            help="split the input by stable hash or contiguous ranges "
+            "(default: %(default)s)",
+        )
+
+    def setup_concurrency_options(self, parser: argparse.ArgumentParser):
+        from .concurrency import RUNNERS
+
+        group = parser.add_argument_group("concurrency options")
+        group.add_argument(
+            CONCURRENTLY,
+            dest="commands",
+            nargs="+",
+            metavar="COMMAND",
+            help="run each quoted command line concurrently in this process",
+        )
+        group.add_argument(
+            "--jobs",
+            type=_positive_int,
+            help="the most commands running at once (default: all)",
+        )
+        group.add_argument(
+            "--runner",
+            choices=RUNNERS,
+            default="thread",
+            help="run commands on threads or an asyncio loop (default: thread)",
+        )
+
+    def setup_run_options(self):
+        """
+        Lists the options taken out of the command line before it is
+        parsed, e.g. ``--concurrently``, in the root parser's help. Only
+        done once help is asked for, their modules aren't needed otherwise.
+        """
+        if self._run_options_listed:
+            return
+        self._run_options_listed = True
+
+        options = argparse.ArgumentParser(add_help=False)
+        self.setup_concurrency_options(options)
+        self.setup_pipeline_options(options)
+        self.setup_memprofile_options(options)
+
+        taken = self.root_parser._option_string_actions
+        # the first two groups are argparse's own positionals and options
+        for source in options._action_groups[2:]:
+            group = self.root_parser.add_argument_group(source.title)
+            for action in source._group_actions:
+                if not any(option in taken for option in action.option_strings):
+                    action.default = argparse.SUPPRESS
+                    group._add_action(action)
+
+    def setup_memprofile_options(self, parser: argparse.ArgumentParser):
+        group = parser.add_argument_group("memory profiling options")
+        group.add_argument(
+            MEMPROFILE,
+            dest="memprofile",
+            action="store_true",
+            help="trace allocations of the conversion and execution phases",
+        )
+        group.add_argument(
+            f"{MEMPROFILE}-top",
+            dest="memprofile_top",
+            type=int,
+            default=10,
+            metavar="N",
+            help="allocation sites reported per phase (default: 10)",
+        )
+        group.add_argument(
+            f"{MEMPROFILE}-dump",
+            dest="memprofile_dump",
+            metavar="DIRECTORY",
+            help="dump a tracemalloc snapshot per phase into DIRECTORY",
+        )
+
+    def setup_pipeline_options(self, parser: argparse.ArgumentParser):
+        from .pipeline import QUEUE_SIZE, STAGE_MODES
+
+        group = parser.add_argument_group("pipeline options")
+        group.add_argument(
+            "--xapi-stages",
+            dest="stages",
+            choices=STAGE_MODES,
+            default="inline",
+            help="where chained commands that yield run (default: inline)",
+        )
+        group.add_argument(
+            "--xapi-queue-size",
+            dest="queue_size",
+            type=_positive_int,
+            default=QUEUE_SIZE,
+            help=(
+                "items buffered between threaded or process stages"
+                f" (default: {QUEUE_SIZE})"
+            ),
+        )
+        group.add_argument(
+            "--xapi-pipeline-stats",
+            dest="pipeline_stats",
+            action="store_true",
+            help="print the throughput and queue depth of every stage",
+        )
+
+    def _collect_kwargs(
+        self, raw_kwargs: list[str], default: Any = ""
+    ) -> dict[str, Any]:
+        kwargs: dict[str, Any | List[Any]] = {}
+        positional: list[Any] = []
+        key = None
+        for arg in raw_kwargs:
+            if arg.startswith("--"):
+                if key and kwargs.get(key, None) is None:
+                    kwargs[key] = default
+
+                key = arg.lstrip("-")
+                # result[key] = default
+                continue
+
+            if not key:
+                positional.append(arg)
+                continue
+
+            cv: Any | None = kwargs.get(key, None)
+            if not cv:
+                kwargs[key] = arg
+            elif appender := getattr(cv, "append"):
+                appender(arg)
+            else:
+                kwargs[key] = [cv, arg]
+
+        if positional:
+            raise UserWarning("Found unexpected positional args %r", positional)
+        return kwargs
+
+    def run(
+        self,
+        argv: list[str] | None = None,
+        namespace: argparse.Namespace | None = None,
+    ):
+        log.debug("Running xapi executor on args: %r", argv)
+        if argv and any(token.startswith(MEMPROFILE) for token in argv):
+            return self._run_memprofiled(argv, namespace)
+
+        return self._run_traced(argv, namespace)
+
+    def _run_memprofiled(
+        self,
+        argv: list[str],
+        namespace: argparse.Namespace | None,
+    ):
+        from .memprofile import MemoryProfiler
+
+        memprofile_parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+        self.setup_memprofile_options(memprofile_parser)
+        options, argv = memprofile_parser.parse_known_args(argv)
+        if not options.memprofile:
+            return self._run_traced(argv, namespace)
+
+        profiler = MemoryProfiler(options.memprofile_top, options.memprofile_dump)
+        profiler.attach(self.xapi.hooks)
+        profiler.start()
+        try:
+            return self._run_traced(argv, namespace)
+        finally:
+            profiler.stop()
+            profiler.detach(self.xapi.hooks)
+            profiler.report()
+
+    def _run_traced(
+        self,
+        argv: list[str] | None,
+        namespace: argparse.Namespace | None,
+    ):
+        if tracer := self.xapi.tracer:
+            from .tracing import trace
+
+            with trace(tracer, "xapi", argv=list(argv or ())):
+                return self._run(argv, namespace)
+
+        return self._run(argv, namespace)
+
+    def _run(
+        self,
+        argv: list[str] | None,
+        namespace: argparse.Namespace | None,
+    ):
+        hooks = self.xapi.hooks or None
+
+        if argv and CONCURRENTLY in argv:
+            return self._run_concurrently(argv, namespace, hooks)
+
+        if argv and _is_chain(argv):
+            return self._run_chain(argv, namespace, hooks)
+
+        namespace, kwargs = self._parse_with_hooks(argv, namespace, hooks)
+        entrypoint = self._get_namespace_entrypoint(namespace)
+
+        self._run_effects(namespace, kwargs, hooks)
+
+        if not entrypoint:
+            self._print_and_exit(
+                self.root_parser,
+                5,
+                "Entrypoint not found in command %s" % namespace,
+            )
+
+        return self._run_command(entrypoint, namespace, kwargs, hooks)
+
+    def _run_chain(
+        self,
+        argv: list[str],
+        namespace: argparse.Namespace | None,
+        hooks: Optional[Hooks],
+    ):
+        """
+        Runs ``a :: b :: c`` in one process, each command's return value is
+        passed as is to the :attr:`~Entrypoint.chain_argument` of the next.
+        Every segment is parsed before anything runs, iterators are handed
+        over through a :class:`~xntricweb.xapi.pipeline.Pipeline`. Effects
+        run once, with the effect options of the first command, later
+        commands reject them. The
+        pipeline options are namespaced so commands keep their own
+        ``--stages`` or ``--queue-size``.
+        """
+        from .pipeline import Pipeline
+
+        pipeline_parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+        self.setup_pipeline_options(pipeline_parser)
+        options, argv = pipeline_parser.parse_known_args(argv)
+        pipeline = Pipeline(options.stages, options.queue_size)
+
+        params = vars(namespace) if namespace else {}
+
+        commands: list[tuple[Entrypoint, argparse.Namespace, dict[str, Any]]] = []
+        for index, segment in enumerate(_split_chain(argv)):
+            if not segment:
+                self._usage_error(
+                    self.root_parser, f"chain segment {index + 1} is empty"
+                )
+            chained, effects = None, {}
+            if index:
+                path = self._get_segment_path(segment)
+                chained = self._get_chained_action(path)
+                effects = self._get_effect_dests(path, params)
+            with _receiving(chained):
+                segment_namespace, kwargs = self._parse_with_hooks(
+                    segment,
+                    argparse.Namespace(
+                        **params, **dict.fromkeys(effects, NOT_SPECIFIED)
+                    ),
+                    hooks,
+                )
+            # effects already ran with the options of the first command
+            if given := [
+                option
+                for dest, option in effects.items()
+                if getattr(segment_namespace, dest) is not NOT_SPECIFIED
+            ]:
+                self._usage_error(
+                    self.root_parser,
+                    f"effect options must precede the first {CHAIN_SEPARATOR}: "
+                    + ", ".join(given),
+                )
+            for dest in effects:
+                delattr(segment_namespace, dest)
+            entrypoint = self._get_namespace_entrypoint(segment_namespace)
+            commands.append((cast(Entrypoint, entrypoint), segment_namespace, kwargs))
+
+        self._run_effects(commands[0][1], commands[0][2], hooks)
+
+        result = None
+        for index, (entrypoint, segment_namespace, kwargs) in enumerate(commands):
+            overrides = None
+            if index:
+                if isinstance(result, Iterator):
+                    # setup_entrypoint rejects entrypoints without a name
+                    name = cast(str, commands[index - 1][0].name)
+                    result = pipeline.connect(name, result)
+                argument = cast(Argument, entrypoint.chain_argument)
+                overrides = {argument.name: result}
+            result = self._run_command(
+                entrypoint, segment_namespace, kwargs, hooks, overrides
+            )
+
+        if options.pipeline_stats:
+            if isinstance(result, Iterator):
+                return pipeline.report_after(result)
+            pipeline.report()
+        return result
+
+    def _run_concurrently(
+        self,
+        argv: list[str],
+        namespace: argparse.Namespace | None,
+        hooks: Optional[Hooks],
+    ) -> list[Any]:
+        """
+        Runs every command given to ``--concurrently``, effects run once
+        and every command is parsed before any of them runs. Their output
+        is written in order once all of them finished.
+
+        :returns: The results of the commands, in order.
+        :raises SystemExit: With the highest exit code when a command failed.
+        """
+        import shlex
+
+        from .concurrency import report, run_concurrently
+
+        concurrency_parser = argparse.ArgumentParser(
+            add_help=False, allow_abbrev=False
+        )
+        self.setup_concurrency_options(concurrency_parser)
+        options, argv = concurrency_parser.parse_known_args(argv)
+
+        if self.xapi.effects:
+            namespace, argv = self.effect_parser.parse_known_args(argv, namespace)
+        if argv:
+            self.root_parser.error(f"unrecognized arguments: {' '.join(argv)}")
+        effect_params = vars(namespace) if namespace else {}
+
+        parsed: list[tuple[Entrypoint, argparse.Namespace, dict[str, Any]]] = []
+        for command in options.commands:
+            command_namespace, kwargs = self._parse_with_hooks(
+                shlex.split(command),
+                argparse.Namespace(**effect_params),
+                hooks,
+            )
+            entrypoint = self._get_namespace_entrypoint(command_namespace)
+            if not entrypoint:
+                self._print_and_exit(
+                    self.root_parser, 5, f"Entrypoint not found in command {command}"
+                )
+            parsed.append((cast(Entrypoint, entrypoint), command_namespace, kwargs))
+
+        if parsed:
+            self._run_effects(parsed[0][1], parsed[0][2], hooks)
+
+        runs = run_concurrently(
+            [
+                (command, partial(self._run_command, *call, hooks))
+                for command, call in zip(options.commands, parsed)
+            ],
+            options.jobs,
+            options.runner,
+        )
+        if code := report(runs):
+            raise SystemExit(code)
+        return [run.result for run in runs]
+
+    def _get_segment_path(self, segment: list[str]) -> list[Entrypoint]:
+        # resolves the command path of the segment, the parsers along it
+        # are populated on the way since they only know their children then
+        entrypoints: Sequence[Entrypoint] = self.xapi.entrypoints
+        path: list[Entrypoint] = []
+        for token in segment:
+            if not entrypoints:
+                break
+            match = next(
+                (
+                    candidate
+                    for candidate in entrypoints
+                    if candidate.name == token
+                    or (candidate.aliases and token in candidate.aliases)
+                ),
+                None,
+            )
+            if not match:
+                break
+            self.populate_parser(self.parsers[match])
+            path.append(match)
+            entrypoints = match.entrypoints
+        return path
+
+    def _get_chained_action(self, path: list[Entrypoint]) -> Optional[argparse.Action]:
+        # when the chain argument of the command is a positional the action
+        # is returned, so that it can be made optional while parsing
+        if not path:
+            return None
+
+        entrypoint = path[-1]
+        parser = self.parsers[entrypoint]
+        if not (argument := entrypoint.chain_argument):
+            self._usage_error(parser, f"{entrypoint.name} cannot receive chained input")
+        assert argument
+
+        for action in parser._actions:
+            if not action.option_strings and action.dest == argument.name:
+                return action
+        return None
+
+    def _run_effects(
+        self,
+        namespace: argparse.Namespace,
+        kwargs: Dict[str, Any],
+        hooks: Optional[Hooks],
+    ):
+        for effect in self.xapi.effects:
+            if hooks:
+                hooks.emit("before_effect", entrypoint=effect, params=vars(namespace))
+            with span(f"effect {effect.name}"):
+                self._call_entrypoint(effect, namespace, kwargs, hooks)
+
+    def _run_command(
+        self,
+        entrypoint: Entrypoint,
+        namespace: argparse.Namespace,
+        kwargs: Dict[str, Any],
+        hooks: Optional[Hooks],
+        overrides: Optional[dict[str, Any]] = None,
+    ):
+        result = self._call_entrypoint(entrypoint, namespace, kwargs, hooks, overrides)
+
+        if getattr(namespace, "__cache_stats__", False) and entrypoint.cache:
+            print(
+                " ".join(
+                    f"{name}={value}"
+                    for name, value in entrypoint.cache.stats(entrypoint).items()
+                ),
+                file=sys.stderr,
+            )
+
+        return result
+
+    def _parse_with_hooks(
+        self,
+        argv: list[str] | None,
+        namespace: argparse.Namespace | None,
+        hooks: Optional[Hooks],
+    ) -> tuple[argparse.Namespace, dict[str, Any]]:
+        with span("parse", argv=list(argv or ())):
+            return self._parse_and_emit(argv, namespace, hooks)
+
+    def _parse_and_emit(
+        self,
+        argv: list[str] | None,
+        namespace: argparse.Namespace | None,
+        hooks: Optional[Hooks],
+    ) -> tuple[argparse.Namespace, dict[str, Any]]:
+        if not hooks:
+            return self._parse(argv, namespace)
+
+        hooks.emit("before_parse", argv=argv)
+        started = perf_counter()
+        try:
+            namespace, kwargs = self._parse(argv, namespace)
+        except BaseException as e:
+            hooks.emit("on_error", argv=argv, error=e)
+            raise
+        hooks.emit(
+            "after_parse",
+            entrypoint=self._get_namespace_entrypoint(namespace),
+            argv=argv,
+            params=vars(namespace),
+            elapsed=perf_counter() - started,
+        )
+        return namespace, kwargs
+
+    def _parse(
+        self,
+        argv: list[str] | None,
+        namespace: argparse.Namespace | None,
+    ) -> tuple[argparse.Namespace, dict[str, Any]]:
+        tokens = sys.argv[1:] if argv is None else argv
+        if "-h" in tokens or "--help" in tokens:
+            self.setup_run_options()
+
+        # sub parsers are populated while parsing, so whether any of them
+        # takes **kwargs isn't known up front, unknown arguments are
+        # checked below instead of by parse_args.
+        namespace, raw_kwargs = self.root_parser.parse_known_args(argv, namespace)
+
+        log.debug("processing namespace: %r, unused: %r", namespace, raw_kwargs)
+
+        if not namespace:
+            raise ValueError("Namespace is None")
+
+        if not (entrypoint := self._get_namespace_entrypoint(namespace)):
+            raise ValueError("Failed to determine entrypooint for namespace")
+
+        if raw_kwargs and not self.effect_kwargs and not entrypoint.has_kwargs:
+            self._usage_error(
+                self.root_parser, f"unrecognized arguments: {' '.join(raw_kwargs)}"
+            )
+
+        kwargs = self._collect_kwargs(raw_kwargs)
+        log.debug("collected extra kwargs: %r", kwargs)
+
+        if self._structures:
+            self._assemble_structures(namespace)
+
+        return namespace, kwargs
+
+    def _get_namespace_entrypoint(
+        self, namespace: argparse.Namespace
+    ) -> Entrypoint | None:
+        return getattr(namespace, "__entrypoint__", None)
+
+    def _call_entrypoint(
+        self,
+        entrypoint: Entrypoint,
+        namespace: argparse.Namespace,
+        kwargs: Dict[str, str],
+        hooks: Optional[Hooks] = None,
+        overrides: Optional[dict[str, Any]] = None,
+    ) -> Any:
+        log.debug("executing entrypoint: %r", entrypoint)
+
+        if not hooks:
+            return self._execute(entrypoint, namespace, kwargs, None, overrides)
+
+        try:
+            return self._execute(entrypoint, namespace, kwargs, hooks, overrides)
+        except BaseException as e:
+            hooks.emit(
+                "on_error",
+                entrypoint=entrypoint,
+                params=vars(namespace),
+                error=e,
+            )
+            raise
+
+    def _execute(
+        self,
+        entrypoint: Entrypoint,
+        namespace: argparse.Namespace,
+        kwargs: Dict[str, str],
+        hooks: Optional[Hooks] = None,
+        overrides: Optional[dict[str, Any]] = None,
+    ) -> Any:
+        try:
+            return entrypoint.execute(vars(namespace), kwargs, hooks, overrides)
+        except AttributeError as e:
+            self._print_and_exit(self.parsers.get(entrypoint, None), 20, str(e))
+        except ConversionError as e:
+            self._print_and_exit(self.parsers.get(entrypoint, None), 10, str(e))
+
+    def _get_effect_dests(
+        self, path: list[Entrypoint], params: dict[str, Any]
+    ) -> dict[str, str]:
+        # the effect options a chained command could be given, by dest,
+        # without the ones it or its groups take as their own arguments
+        own = {
+            argument.name for entrypoint in path for argument in entrypoint.arguments
+        }
+        effects: dict[str, str] = {}
+        for args, kwargs in self._effect_options:
+            dest = kwargs.get("dest", args[0][2:])
+            if dest not in own and dest not in params:
+                effects[dest] = args[0]
+        return effects
+
+    def _usage_error(self, parser: argparse.ArgumentParser, message: str):
+        """Exits with status 2 like argparse, or raises without exit_on_error."""
+        if self.root_parser.exit_on_error:
+            parser.error(message)
+        raise argparse.ArgumentError(None, message)
+
+    def _print_and_exit(
+        self, parser: argparse.ArgumentParser | None, code: int, message: str
+    ) -> NoReturn:
+        if not parser:
+            parser = self.root_parser
+
+        parser.print_usage()
+        parser.exit(code, message)
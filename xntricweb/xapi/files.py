@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import io
+import mmap
+import os
+import sys
+from importlib import import_module
+from typing import IO, Any, Callable, Iterator, Optional
+
+
+class MappedFile(mmap.mmap):
+    """
+    A read-only memory map of a file.
+
+    Annotating a parameter with ``MappedFile`` (or ``mmap.mmap``) passes the
+    function the mapped file instead of its path, the map is closed once
+    the entrypoint returns.
+    """
+
+
+_compressors: dict[str, tuple[str, ...]] = {
+    ".gz": ("gzip",),
+    ".bz2": ("bz2",),
+    ".xz": ("lzma",),
+    ".zst": ("compression.zstd", "zstandard"),
+}
+"""
+Modules providing an ``open(path, mode)`` for a compressed file suffix,
+the first one that can be imported is used.
+"""
+
+
+def _get_compressor(suffix: str) -> Any:
+    modules = _compressors[suffix]
+    for name in modules:
+        try:
+            return import_module(name)
+        except ImportError:
+            continue
+
+    raise ValueError(
+        f"Cannot open {suffix} files, install one of: {', '.join(modules)}"
+    )
+
+
+def open_stream(path: str, mode: str, buffer_size: int = -1) -> IO[bytes]:
+    """
+    Opens `path` as a binary stream, ``-`` is stdin or stdout and
+    compressed files are (de)compressed while streaming.
+
+    :param mode: ``"rb"`` or ``"wb"``.
+    :param buffer_size: The buffer size, -1 uses python's default.
+    """
+    reading = "r" in mode
+    if path == "-":
+        return (sys.stdin if reading else sys.stdout).buffer
+
+    suffix = os.path.splitext(path)[1]
+    if suffix not in _compressors:
+        return open(path, mode, buffering=buffer_size)
+
+    stream = _get_compressor(suffix).open(path, mode)
+    if buffer_size < 0:
+        return stream
+    return (io.BufferedReader if reading else io.BufferedWriter)(stream, buffer_size)
+
+
+_json_loads: Optional[Callable[[str | bytes], Any]] = None
+
+
+def _get_json_loads() -> Callable[[str | bytes], Any]:
+    global _json_loads
+
+    if _json_loads is None:
+        # orjson is several times faster when it is installed
+        try:
+            from orjson import loads  # type: ignore[import-not-found]
+        except ImportError:
+            from json import loads
+
+        _json_loads = loads
+    return _json_loads
+
+
+def get_source(value: str) -> Optional[str]:
+    """
+    Returns the path named by an ``@path`` or ``-`` (stdin) argument, None
+    when `value` is the data itself.
+    """
+    if value == "-":
+        return value
+    if value.startswith("@"):
+        return value[1:]
+    return None
+
+
+def _stdin_is_ndjson() -> bool:
+    # a json array is a single document, anything else is read as records
+    stream = sys.stdin.buffer
+    if not (peek := getattr(stream, "peek", None)):
+        return True
+
+    while data := peek(1):
+        if stripped := data.lstrip():
+            return stripped[:1] != b"["
+        # leading whitespace doesn't matter to either format
+        stream.read(len(data))
+    return True
+
+
+def is_ndjson(path: str) -> bool:
+    """
+    Whether `path` holds newline delimited json, judged by its suffix.
+    Stdin is ndjson unless its first non-whitespace byte opens an array.
+    """
+    if path == "-":
+        return _stdin_is_ndjson()
+
+    root, suffix = os.path.splitext(path)
+    if suffix in _compressors:
+        suffix = os.path.splitext(root)[1]
+    return suffix in (".ndjson", ".jsonl")
+
+
+def load_json(value: str | bytes) -> Any:
+    """
+    Parses `value` as json, ``@path`` and ``-`` read the document from a
+    (possibly compressed) file or stdin in a single buffered pass.
+    """
+    loads = _get_json_loads()
+    if isinstance(value, bytes) or not (path := get_source(value)):
+        return loads(value)
+
+    stream = open_stream(path, "rb")
+    try:
+        return loads(stream.read())
+    finally:
+        if path != "-":
+            stream.close()
+
+
+def iter_ndjson(path: str) -> Iterator[Any]:
+    """Parses newline delimited json from `path` one record at a time."""
+    loads = _get_json_loads()
+    stream = open_stream(path, "rb")
+    try:
+        for line in stream:
+            if line.strip():
+                yield loads(line)
+    finally:
+        if path != "-":
+            stream.close()
+
+
+BUFFER_SIZE = 1 << 20
+"""The buffer size lazy files are opened with by default."""
+
+_io_methods = frozenset(
+    (
+        "read",
+        "read1",
+        "readinto",
+        "readinto1",
+        "readline",
+        "readlines",
+        "peek",
+        "write",
+        "writelines",
+        "flush",
+        "seek",
+        "tell",
+        "truncate",
+        "fileno",
+        "isatty",
+        "readable",
+        "writable",
+        "seekable",
+    )
+)
+"""Stream methods that open a lazy file, any other attribute doesn't."""
+
+
+class _LazyFile:
+    _mode = "rb"
+
+    path: str
+    buffer_size: int
+    """
+    The buffer size the file is opened with, raise it for high-throughput
+    pipelines.
+    """
+
+    __slots__ = ("path", "buffer_size", "_stream", "_closed")
+
+    def __init__(self, path: str | os.PathLike[str], buffer_size: int = BUFFER_SIZE):
+        self.path = os.fspath(path)
+        self.buffer_size = buffer_size
+        self._stream: Optional[IO[bytes]] = None
+        self._closed = False
+
+    @property
+    def mode(self) -> str:
+        """The mode the file is opened in."""
+        return self._mode
+
+    @property
+    def name(self) -> str:
+        return self.path
+
+    @property
+    def stream(self) -> IO[bytes]:
+        """The underlying stream, opened on first use."""
+        if self._stream is None:
+            if self._closed:
+                raise ValueError(f"I/O operation on closed file {self.path!r}")
+            self._stream = open_stream(self.path, self._mode, self.buffer_size)
+        return self._stream
+
+    @property
+    def opened(self) -> bool:
+        return self._stream is not None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._closed = True
+        if self._stream is None:
+            return
+
+        if self.path == "-":
+            # stdin and stdout outlive the entrypoint
+            if not self._stream.closed and self._stream.writable():
+                self._stream.flush()
+            return
+
+        self._stream.close()
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in _io_methods:
+            raise AttributeError(
+                f"{self.__class__.__name__!r} object has no attribute {name!r}"
+            )
+        return getattr(self.stream, name)
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_: Any):
+        self.close()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.path!r})"
+
+
+class InputFile(_LazyFile):
+    """
+    A binary file that is opened the first time it is read from.
+
+    ``-`` reads stdin and ``.gz``, ``.bz2``, ``.xz`` and ``.zst`` files are
+    decompressed as they are read. The file is closed once the entrypoint
+    returns.
+    """
+
+    __slots__ = ()
+
+
+class OutputFile(_LazyFile):
+    """
+    A binary file that is created the first time it is written to.
+
+    ``-`` writes to stdout and ``.gz``, ``.bz2``, ``.xz`` and ``.zst`` files
+    are compressed as they are written. The file is closed once the
+    entrypoint returns.
+    """
+
+    _mode = "wb"
+
+    __slots__ = ()
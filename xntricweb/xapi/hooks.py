@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Literal, Optional
+
+from .const import log
+
+if TYPE_CHECKING:
+    from .entrypoint import Entrypoint
+
+
+type HookName = Literal[
+    "on_registered",
+    "before_parse",
+    "after_parse",
+    "before_convert",
+    "before_effect",
+    "before_execute",
+    "after_execute",
+    "on_error",
+]
+
+HOOK_NAMES: tuple[str, ...] = (
+    "on_registered",
+    "before_parse",
+    "after_parse",
+    "before_convert",
+    "before_effect",
+    "before_execute",
+    "after_execute",
+    "on_error",
+)
+
+
+class HookEvent:
+    """Describes a lifecycle event, passed to every hook callback."""
+
+    name: str
+    """The hook name the event was emitted for."""
+
+    entrypoint: Optional[Entrypoint]
+    """The entrypoint the event concerns, if one is known yet."""
+
+    argv: Optional[list[str]]
+    """The command line being processed."""
+
+    params: Optional[dict[str, Any]]
+    """The parsed (unconverted) parameters."""
+
+    args: Optional[list[Any]]
+    """The converted positional call arguments."""
+
+    kwargs: Optional[dict[str, Any]]
+    """The converted keyword call arguments."""
+
+    result: Any
+    """The entrypoint's return value (after_execute)."""
+
+    error: Optional[BaseException]
+    """The exception being raised (on_error)."""
+
+    elapsed: Optional[float]
+    """
+    Seconds spent in the phase that just finished: parsing for
+    after_parse, conversion for before_execute and the call itself for
+    after_execute.
+    """
+
+    __slots__ = (
+        "name",
+        "entrypoint",
+        "argv",
+        "params",
+        "args",
+        "kwargs",
+        "result",
+        "error",
+        "elapsed",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        entrypoint: Optional[Entrypoint] = None,
+        argv: Optional[list[str]] = None,
+        params: Optional[dict[str, Any]] = None,
+        args: Optional[list[Any]] = None,
+        kwargs: Optional[dict[str, Any]] = None,
+        result: Any = None,
+        error: Optional[BaseException] = None,
+        elapsed: Optional[float] = None,
+    ):
+        self.name = name
+        self.entrypoint = entrypoint
+        self.argv = argv
+        self.params = params
+        self.args = args
+        self.kwargs = kwargs
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({
+            ', '.join(
+                f'{k}={getattr(self, k)!r}'
+                for k in self.__slots__
+                if getattr(self, k) is not None
+            )
+        })"
+
+
+type Hook = Callable[[HookEvent], None]
+
+
+class Hooks:
+    """A registry of lifecycle callbacks, keyed by hook name."""
+
+    def __init__(self):
+        self._hooks: dict[str, list[Hook]] = {}
+
+    def __bool__(self):
+        return bool(self._hooks)
+
+    def __contains__(self, name: str):
+        return name in self._hooks
+
+    def add(self, name: HookName, hook: Hook):
+        if name not in HOOK_NAMES:
+            raise ValueError(f"Unknown hook {name!r}, expected one of {HOOK_NAMES}")
+
+        log.debug("adding %r hook %r", name, hook)
+        self._hooks.setdefault(name, []).append(hook)
+        return hook
+
+    def remove(self, name: HookName, hook: Hook):
+        hooks = self._hooks.get(name)
+        if not hooks or hook not in hooks:
+            raise KeyError(f"{hook!r} is not registered for {name!r}")
+
+        hooks.remove(hook)
+        if not hooks:
+            del self._hooks[name]
+
+    def emit(self, name: HookName, **details: Any) -> HookEvent | None:
+        hooks = self._hooks.get(name)
+        if not hooks:
+            return None
+
+        event = HookEvent(name, **details)
+        for hook in tuple(hooks):
+            hook(event)
+        return event
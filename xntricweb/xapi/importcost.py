@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import os
+import sys
+from typing import IO, Iterable, Iterator, Optional
+
+# imports the target in a fresh interpreter and prints the module each
+# registered entrypoint (and effect) is defined in. json is imported after
+# the target, so its cost is attributed to the target when it uses it.
+_PROBE = """\
+import sys
+
+module, _, attribute = sys.argv[1].partition(":")
+# importlib.import_module bypasses the import timing, __import__ doesn't
+__import__(module)
+xapi = getattr(sys.modules[module], attribute or "xapi")
+
+import json
+
+
+def walk(entrypoints, path):
+    for entrypoint in entrypoints:
+        name = " ".join([*path, entrypoint.name or "?"])
+        fn = getattr(entrypoint, "entrypoint", None)
+        owner = getattr(fn, "__module__", None) or type(entrypoint).__module__
+        yield owner, name
+        yield from walk(entrypoint.entrypoints, [*path, entrypoint.name or "?"])
+
+
+commands = {}
+for owner, name in walk([*xapi.effects, *xapi.entrypoints], []):
+    commands.setdefault(owner, []).append(name)
+print(json.dumps({"target": module, "commands": commands}))
+"""
+
+
+class ImportRecord:
+    """One module import as reported by ``python -X importtime``."""
+
+    name: str
+    self_us: int
+    """Microseconds spent executing the module itself."""
+
+    cumulative_us: int
+    """Microseconds including the modules it imported first."""
+
+    children: list[ImportRecord]
+    """The modules imported while importing this one."""
+
+    __slots__ = ("name", "self_us", "cumulative_us", "children")
+
+    def __init__(self, name: str, self_us: int, cumulative_us: int):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.children: list[ImportRecord] = []
+
+    def walk(self) -> Iterator[ImportRecord]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name!r}, {self.cumulative_us}us)"
+
+
+def parse_importtime(lines: Iterable[str]) -> list[ImportRecord]:
+    """
+    Builds the import tree from ``-X importtime`` output. Modules are
+    reported after the ones they import, nested two spaces deeper.
+    """
+    pending: dict[int, list[ImportRecord]] = {}
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        if not self_us.strip().isdigit():
+            # the header line
+            continue
+
+        stripped = name.lstrip()
+        level = (len(name) - len(stripped) - 1) // 2
+        record = ImportRecord(stripped.rstrip(), int(self_us), int(cumulative_us))
+        record.children = pending.pop(level + 1, [])
+        pending.setdefault(level, []).append(record)
+    return pending.get(0, [])
+
+
+class CommandCost:
+    """The import cost of a module defining registered commands."""
+
+    module: str
+    commands: list[str]
+    record: Optional[ImportRecord]
+    """The module's import, None when something imported it earlier."""
+
+    __slots__ = ("module", "commands", "record")
+
+    def __init__(
+        self, module: str, commands: list[str], record: Optional[ImportRecord]
+    ):
+        self.module = module
+        self.commands = commands
+        self.record = record
+
+    @property
+    def cumulative_us(self) -> int:
+        return self.record.cumulative_us if self.record else 0
+
+    def heaviest(self, count: int) -> list[ImportRecord]:
+        """The modules this one pulled in that took longest to import."""
+        if not self.record:
+            return []
+        return sorted(
+            self.record.children, key=lambda record: record.cumulative_us, reverse=True
+        )[:count]
+
+
+def attribute(
+    commands: dict[str, list[str]], records: list[ImportRecord]
+) -> list[CommandCost]:
+    """
+    Matches the modules defining commands to their first import, ranked by
+    cumulative import time.
+    """
+    first: dict[str, ImportRecord] = {}
+    for root in records:
+        for record in root.walk():
+            first.setdefault(record.name, record)
+
+    costs = [
+        CommandCost(module, names, first.get(module))
+        for module, names in commands.items()
+    ]
+    costs.sort(key=lambda cost: cost.cumulative_us, reverse=True)
+    return costs
+
+
+def measure(
+    target: str, python: Optional[str] = None
+) -> tuple[str, list[CommandCost], list[ImportRecord]]:
+    """
+    Imports `target`, ``module:attribute`` naming an XAPI instance, in a
+    fresh interpreter with ``-X importtime``.
+
+    :returns: The target module, the cost per command module and the full
+        import tree.
+    """
+    import json
+    import subprocess
+
+    process = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", _PROBE, target],
+        capture_output=True,
+        text=True,
+        env=os.environ | {"PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if process.returncode:
+        raise RuntimeError(
+            f"Importing {target} failed:\n"
+            + "\n".join(
+                line
+                for line in process.stderr.splitlines()
+                if not line.startswith("import time:")
+            )
+        )
+
+    probe = json.loads(process.stdout.strip().splitlines()[-1])
+    records = parse_importtime(process.stderr.splitlines())
+    return probe["target"], attribute(probe["commands"], records), records
+
+
+def _ms(us: int) -> str:
+    return f"{us / 1000:8.1f} ms"
+
+
+def report(
+    target: str,
+    costs: list[CommandCost],
+    records: list[ImportRecord],
+    top: int = 5,
+    file: Optional[IO[str]] = None,
+):
+    """
+    Prints the command modules, most expensive first, each with the
+    heaviest modules it imported.
+    """
+    out = file or sys.stdout
+    total = next(
+        (
+            record
+            for root in records
+            for record in root.walk()
+            if record.name == target
+        ),
+        None,
+    )
+    if total:
+        print(f"{_ms(total.cumulative_us)}  {target} (total)", file=out)
+
+    for cost in costs:
+        if not cost.record:
+            print(
+                f"{_ms(0)}  {cost.module}: {', '.join(cost.commands)}"
+                " (already imported, no cost attributed)",
+                file=out,
+            )
+            continue
+
+        print(
+            f"{_ms(cost.cumulative_us)}  {cost.module}: {', '.join(cost.commands)}",
+            file=out,
+        )
+        for record in cost.heaviest(top):
+            print(f"  {_ms(record.cumulative_us)}  {record.name}", file=out)
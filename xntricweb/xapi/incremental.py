@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import os
+import sys
+from hashlib import sha256
+from typing import TYPE_CHECKING, Any, Awaitable, Iterable, Iterator, Optional
+
+from .const import NOT_SPECIFIED, log
+
+if TYPE_CHECKING:
+    from .entrypoint import Entrypoint
+
+
+def _get_values(
+    entrypoint: Entrypoint, args: list[Any], kwargs: dict[str, Any]
+) -> dict[str, Any]:
+    # maps argument names back to the call values generate_call_args
+    # produced, positionals are appended in argument order
+    values: dict[str, Any] = {}
+    position = 0
+    for argument in entrypoint.arguments:
+        if argument.name in kwargs:
+            values[argument.name] = kwargs[argument.name]
+        elif argument.index is not None and argument.vararg:
+            values[argument.name] = args[position:]
+        elif argument.index is not None and argument.default is NOT_SPECIFIED:
+            values[argument.name] = args[position] if position < len(args) else None
+            position += 1
+        elif argument.default is not NOT_SPECIFIED:
+            values[argument.name] = argument.default
+    return values
+
+
+def _iter_paths(value: Any) -> Iterator[str]:
+    if value is None:
+        return
+    if isinstance(value, (list, tuple)):
+        for item in value:  # type: ignore
+            yield from _iter_paths(item)
+        return
+    if isinstance(value, (str, os.PathLike)):
+        yield os.fspath(value)  # type: ignore
+        return
+    if isinstance(path := getattr(value, "path", None), str):
+        yield path
+        return
+    raise TypeError(f"Cannot determine a file path from {value!r}")
+
+
+def _get_paths(values: dict[str, Any], names: Iterable[str]) -> list[str]:
+    return [path for name in names for path in _iter_paths(values.get(name))]
+
+
+def _hash_files(paths: Iterable[str]) -> str:
+    digest = sha256()
+    for path in paths:
+        digest.update(path.encode())
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_settings(values: dict[str, Any], files: Iterable[str]) -> str:
+    # every bound value that is not a declared file, a changed scalar
+    # flag has to rerun the call just like a changed input does
+    files = set(files)
+    settings = [(name, value) for name, value in values.items() if name not in files]
+    return sha256(repr(settings).encode()).hexdigest()
+
+
+class Stamp:
+    """
+    The argument and input content digests stored for an entrypoint's
+    outputs, calls without a stamp path are never stamped.
+    """
+
+    __slots__ = ("path", "inputs", "settings", "_digest")
+
+    def __init__(self, path: Optional[str], inputs: list[str], settings: str = ""):
+        self.path = path
+        self.inputs = inputs
+        self.settings = settings
+        """Digest of the non file argument values of the call."""
+        self._digest: Optional[str] = None
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = _hash_files(self.inputs)
+        return self._digest
+
+    def _read(self) -> list[str]:
+        if not self.path:
+            return []
+        try:
+            with open(self.path) as f:
+                return f.read().split("\n")
+        except FileNotFoundError:
+            return []
+
+    def matches_settings(self) -> bool:
+        return self._read()[:1] == [self.settings]
+
+    def matches(self) -> bool:
+        return self._read() == [self.settings, self.digest]
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as f:
+            f.write(f"{self.settings}\n{self.digest}")
+
+
+def _save_after(stamp: Stamp, items: Iterator[Any]) -> Iterator[Any]:
+    # a stream that fails or is abandoned part way must not be stamped
+    yield from items
+    stamp.save()
+
+
+async def _save_after_await(stamp: Stamp, awaitable: Awaitable[Any]) -> Any:
+    result = await awaitable
+    stamp.save()
+    return result
+
+
+def save_when_done(stamp: Stamp, result: Any) -> Any:
+    """
+    Saves `stamp` once `result` is fully produced, iterators are stamped
+    after they are exhausted and awaitables after they completed.
+    """
+    if isinstance(result, Iterator):
+        return _save_after(stamp, result)  # type: ignore
+    if isinstance(result, Awaitable):
+        return _save_after_await(stamp, result)  # type: ignore
+    stamp.save()
+    return result
+
+
+def _get_stamp(
+    entrypoint: Entrypoint, inputs: list[str], outputs: list[str], settings: str
+):
+    from .cache import default_cache_dir
+
+    fn = entrypoint.entrypoint
+    key = sha256(
+        "\0".join(
+            [
+                f"{getattr(fn, '__module__', None)}."
+                f"{getattr(fn, '__qualname__', entrypoint.name)}",
+                *sorted(os.path.abspath(path) for path in outputs),
+            ]
+        ).encode()
+    ).hexdigest()
+    return Stamp(os.path.join(default_cache_dir(), "stamps", key), inputs, settings)
+
+
+def check(
+    entrypoint: Entrypoint,
+    args: list[Any],
+    kwargs: dict[str, Any],
+    force: bool = False,
+) -> Optional[Stamp]:
+    """
+    Decides whether `entrypoint` has to run for the given call values.
+
+    The call is up to date when the other argument values match the stamp
+    stored by the last run and every declared output exists and is newer
+    than every declared input, or the inputs' contents match the stamp.
+
+    :returns: None when the call can be skipped, otherwise the stamp to
+        save once it succeeded.
+    """
+    values = _get_values(entrypoint, args, kwargs)
+    inputs = _get_paths(values, entrypoint.inputs or ())
+    outputs = _get_paths(values, entrypoint.outputs or ())
+
+    if "-" in inputs or "-" in outputs:
+        log.debug("%s reads or writes stdio, always running", entrypoint.name)
+        return Stamp(None, inputs)
+
+    settings = _hash_settings(
+        values, [*(entrypoint.inputs or ()), *(entrypoint.outputs or ())]
+    )
+    stamp = _get_stamp(entrypoint, inputs, outputs, settings)
+    if force:
+        return stamp
+
+    try:
+        newest_input = max((os.stat(path).st_mtime_ns for path in inputs), default=0)
+        oldest_output = min(os.stat(path).st_mtime_ns for path in outputs)
+    except (FileNotFoundError, ValueError):
+        return stamp
+
+    newer = oldest_output >= newest_input and stamp.matches_settings()
+    if newer or stamp.matches():
+        log.debug("%s is up to date", entrypoint.name)
+        print(f"{entrypoint.name}: skipped (up to date)", file=sys.stderr)
+        return None
+
+    return stamp
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import os
+import sys
+import tracemalloc
+from typing import IO, TYPE_CHECKING, Literal, Optional
+
+from .const import log
+
+if TYPE_CHECKING:
+    from .hooks import HookEvent, Hooks
+
+type Phase = Literal["convert", "execute"]
+
+
+def _size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KiB", "MiB"):
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+class PhaseProfile:
+    """The memory one phase of an entrypoint invocation allocated."""
+
+    entrypoint: str
+    phase: Phase
+
+    peak: int
+    """The highest traced memory above the phase's start, in bytes."""
+
+    growth: int
+    """Traced memory still allocated at the end of the phase, in bytes."""
+
+    top: list[tracemalloc.StatisticDiff]
+    """The allocation sites that grew the most, largest first."""
+
+    __slots__ = ("entrypoint", "phase", "peak", "growth", "top")
+
+    def __init__(
+        self,
+        entrypoint: str,
+        phase: Phase,
+        peak: int,
+        growth: int,
+        top: list[tracemalloc.StatisticDiff],
+    ):
+        self.entrypoint = entrypoint
+        self.phase = phase
+        self.peak = peak
+        self.growth = growth
+        self.top = top
+
+    def __str__(self):
+        lines = [
+            f"{self.entrypoint} {self.phase}: peak +{_size(self.peak)},"
+            f" retained {_size(self.growth)}"
+        ]
+        for stat in self.top:
+            frame = stat.traceback[0]
+            lines.append(
+                f"  {_size(stat.size_diff):>12}  {stat.count_diff:+} blocks"
+                f"  {frame.filename}:{frame.lineno}"
+            )
+        return "\n".join(lines)
+
+
+_ignored = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryProfiler:
+    """
+    Traces allocations with :mod:`tracemalloc` separately for the argument
+    conversion and the execution of every entrypoint an invocation runs,
+    driven by the ``before_convert``, ``before_execute`` and
+    ``after_execute`` hooks.
+
+    Enabled with ``--xapi-memprofile`` on the command line.
+    """
+
+    top: int
+    """Allocation sites reported per phase."""
+
+    dump: Optional[str]
+    """The directory each phase's end snapshot is dumped to, if any."""
+
+    profiles: list[PhaseProfile]
+    """The profiled phases, in the order they ended."""
+
+    __slots__ = (
+        "top",
+        "dump",
+        "profiles",
+        "_started",
+        "_phase",
+        "_baseline",
+        "_snapshot",
+    )
+
+    def __init__(self, top: int = 10, dump: Optional[str] = None):
+        self.top = top
+        self.dump = dump
+        self.profiles = []
+        self._started = False
+        self._phase: Optional[Phase] = None
+        self._baseline = 0
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    def stop(self):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_ignored)
+
+    def _begin(self, phase: Phase):
+        self._phase = phase
+        self._snapshot = self._take_snapshot()
+        # the snapshot itself allocates, the phase starts after it
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.get_traced_memory()[0]
+
+    def _end(self, entrypoint: str):
+        if not self._phase or not self._snapshot:
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self._take_snapshot()
+        top = [
+            stat
+            for stat in snapshot.compare_to(self._snapshot, "lineno")[: self.top]
+            if stat.size_diff > 0
+        ]
+        profile = PhaseProfile(
+            entrypoint,
+            self._phase,
+            peak - self._baseline,
+            current - self._baseline,
+            top,
+        )
+        self.profiles.append(profile)
+
+        if self.dump:
+            os.makedirs(self.dump, exist_ok=True)
+            path = os.path.join(
+                self.dump, f"{len(self.profiles)}-{entrypoint}-{self._phase}.snapshot"
+            )
+            log.debug("dumping tracemalloc snapshot to %s", path)
+            snapshot.dump(path)
+
+        self._phase = None
+        self._snapshot = None
+
+    def _before_convert(self, event: HookEvent):
+        self._begin("convert")
+
+    def _before_execute(self, event: HookEvent):
+        name = event.entrypoint.name if event.entrypoint else "?"
+        self._end(str(name))
+        self._begin("execute")
+
+    def _after_execute(self, event: HookEvent):
+        name = event.entrypoint.name if event.entrypoint else "?"
+        self._end(str(name))
+
+    def attach(self, hooks: Hooks):
+        hooks.add("before_convert", self._before_convert)
+        hooks.add("before_execute", self._before_execute)
+        hooks.add("after_execute", self._after_execute)
+        hooks.add("on_error", self._after_execute)
+
+    def detach(self, hooks: Hooks):
+        hooks.remove("before_convert", self._before_convert)
+        hooks.remove("before_execute", self._before_execute)
+        hooks.remove("after_execute", self._after_execute)
+        hooks.remove("on_error", self._after_execute)
+
+    def report(self, file: Optional[IO[str]] = None):
+        """Prints every profiled phase, to stderr by default."""
+        for profile in self.profiles:
+            print(profile, file=file or sys.stderr)
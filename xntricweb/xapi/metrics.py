@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import os
+import re
+import sys
+from typing import TYPE_CHECKING, Optional
+
+from .const import log
+
+if TYPE_CHECKING:
+    from .entrypoint import Entrypoint
+    from .hooks import HookEvent
+    from .xapi import XAPI
+
+type Phase = str
+"""parse, convert, effects or execute."""
+
+_ROOT = "xapi"
+"""The entrypoint name recorded when parsing didn't get as far as one."""
+
+
+def _entrypoint_name(entrypoint: Optional[Entrypoint]) -> str:
+    names: list[str] = []
+    while entrypoint:
+        if entrypoint.name:
+            names.append(entrypoint.name)
+        entrypoint = entrypoint.parent
+    return ".".join(reversed(names)) or _ROOT
+
+
+def _exit_code(error: BaseException) -> int:
+    if isinstance(error, SystemExit):
+        code = error.code
+        if code is None:
+            return 0
+        return code if isinstance(code, int) else 1
+    return 1
+
+
+def peak_rss() -> Optional[int]:
+    """The peak resident set size of the process in bytes, if known."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes everywhere but macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class MetricsSink:
+    """
+    Buffers per entrypoint invocation counts, phase durations, exit codes
+    and peak RSS in memory, written out once when the process exits so
+    commands never wait on the export.
+
+    Attach it with :meth:`XAPI.export_metrics
+    <xntricweb.xapi.xapi.XAPI.export_metrics>`, subclasses implement
+    :meth:`write`.
+    """
+
+    prefix: str
+    """Prepended to every metric name."""
+
+    invocations: dict[tuple[str, int], int]
+    """Invocations per entrypoint and exit code."""
+
+    timings: dict[tuple[str, Phase], list[float]]
+    """Durations in seconds per entrypoint and phase."""
+
+    peak_rss: dict[str, int]
+    """The highest peak RSS in bytes seen after each entrypoint ran."""
+
+    __slots__ = ("prefix", "invocations", "timings", "peak_rss", "_attached")
+
+    def __init__(self, prefix: str = "xapi"):
+        self.prefix = prefix
+        self.invocations = {}
+        self.timings = {}
+        self.peak_rss = {}
+        self._attached = False
+
+    def count(self, entrypoint: str, exit_code: int):
+        key = (entrypoint, exit_code)
+        self.invocations[key] = self.invocations.get(key, 0) + 1
+
+    def time(self, entrypoint: str, phase: Phase, seconds: float):
+        self.timings.setdefault((entrypoint, phase), []).append(seconds)
+
+    def sample_rss(self, entrypoint: str):
+        if (rss := peak_rss()) is not None:
+            self.peak_rss[entrypoint] = max(self.peak_rss.get(entrypoint, 0), rss)
+
+    def attach(self, xapi: XAPI):
+        """Records the events of `xapi`, flushing when the process exits."""
+        effects = xapi.effects
+
+        def invoked(event: HookEvent) -> Optional[Entrypoint]:
+            # the command that was run, effects and the parents of a nested
+            # command run on its behalf
+            params = event.params or {}
+            return params.get("__entrypoint__") or event.entrypoint
+
+        def after_parse(event: HookEvent):
+            name = _entrypoint_name(event.entrypoint)
+            self.time(name, "parse", event.elapsed or 0.0)
+
+        def before_execute(event: HookEvent):
+            if event.entrypoint is not invoked(event):
+                return
+            name = _entrypoint_name(event.entrypoint)
+            self.time(name, "convert", event.elapsed or 0.0)
+
+        def after_execute(event: HookEvent):
+            name = _entrypoint_name(invoked(event))
+            if event.entrypoint in effects:
+                self.time(name, "effects", event.elapsed or 0.0)
+                return
+            if event.entrypoint is not invoked(event):
+                return
+            self.time(name, "execute", event.elapsed or 0.0)
+            self.count(name, 0)
+            self.sample_rss(name)
+
+        def on_error(event: HookEvent):
+            assert event.error
+            name = _entrypoint_name(invoked(event))
+            self.count(name, _exit_code(event.error))
+            self.sample_rss(name)
+
+        xapi.hooks.add("after_parse", after_parse)
+        xapi.hooks.add("before_execute", before_execute)
+        xapi.hooks.add("after_execute", after_execute)
+        xapi.hooks.add("on_error", on_error)
+
+        if not self._attached:
+            import atexit
+
+            atexit.register(self.flush)
+            self._attached = True
+
+    def flush(self):
+        """Writes and drops the buffered metrics, export errors are logged."""
+        if not (self.invocations or self.timings):
+            return
+
+        try:
+            self.write()
+        except Exception as e:
+            log.debug("exporting metrics failed: %r", e)
+        finally:
+            self.invocations.clear()
+            self.timings.clear()
+            self.peak_rss.clear()
+
+    def write(self):
+        raise NotImplementedError
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_sample = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$")
+
+
+class PrometheusTextfile(MetricsSink):
+    """
+    Writes the metrics in the Prometheus text format for node_exporter's
+    textfile collector. Counts and durations are added to the ones already
+    in the file, so it accumulates across invocations.
+    """
+
+    path: str
+    """The ``.prom`` file, replaced atomically."""
+
+    __slots__ = ("path",)
+
+    def __init__(self, path: str | os.PathLike[str], prefix: str = "xapi"):
+        super().__init__(prefix)
+        self.path = os.fspath(path)
+
+    def _samples(self) -> dict[tuple[str, str], float]:
+        prefix = self.prefix
+        samples: dict[tuple[str, str], float] = {}
+        for (name, code), count in self.invocations.items():
+            labels = f'{{entrypoint="{_escape(name)}",exit_code="{code}"}}'
+            samples[(f"{prefix}_invocations_total", labels)] = count
+        for (name, phase), durations in self.timings.items():
+            labels = f'{{entrypoint="{_escape(name)}",phase="{phase}"}}'
+            samples[(f"{prefix}_phase_seconds_sum", labels)] = sum(durations)
+            samples[(f"{prefix}_phase_seconds_count", labels)] = len(durations)
+        for name, rss in self.peak_rss.items():
+            labels = f'{{entrypoint="{_escape(name)}"}}'
+            samples[(f"{prefix}_peak_rss_bytes", labels)] = rss
+        return samples
+
+    def _read(self) -> dict[tuple[str, str], float]:
+        samples: dict[tuple[str, str], float] = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    if match := _sample.match(line.strip()):
+                        name, labels, value = match.groups()
+                        samples[(name, labels or "")] = float(value)
+        except FileNotFoundError:
+            pass
+        return samples
+
+    def _render(self, samples: dict[tuple[str, str], float]) -> str:
+        prefix = self.prefix
+        described = {
+            f"{prefix}_invocations_total": ("counter", "Entrypoint invocations."),
+            f"{prefix}_phase_seconds": ("summary", "Seconds spent per phase."),
+            f"{prefix}_peak_rss_bytes": ("gauge", "Peak resident set size."),
+        }
+        lines: list[str] = []
+        family = None
+        for name, labels in sorted(samples):
+            base = name.removesuffix("_sum").removesuffix("_count")
+            if base != family and base in described:
+                family = base
+                kind, help = described[base]
+                lines.append(f"# HELP {base} {help}")
+                lines.append(f"# TYPE {base} {kind}")
+            value = samples[(name, labels)]
+            lines.append(f"{name}{labels} {value:.9g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        lock = None
+        try:
+            import fcntl
+
+            # concurrent invocations take turns merging into the file
+            lock = open(f"{self.path}.lock", "w")
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+
+        try:
+            samples = self._read()
+            for key, value in self._samples().items():
+                if key[0].endswith("_bytes"):
+                    samples[key] = max(samples.get(key, 0), value)
+                else:
+                    samples[key] = samples.get(key, 0) + value
+
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary, "w") as f:
+                f.write(self._render(samples))
+            os.replace(temporary, self.path)
+        finally:
+            if lock:
+                lock.close()
+
+
+class StatsD(MetricsSink):
+    """
+    Sends the metrics as StatsD datagrams over UDP, to the local agent by
+    default. Delivery isn't confirmed, lost datagrams are not retried.
+    """
+
+    host: str
+    port: int
+
+    __slots__ = ("host", "port")
+
+    MAX_DATAGRAM = 1432
+    """Bytes per datagram, stays below a common MTU."""
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 8125, prefix: str = "xapi"
+    ):
+        super().__init__(prefix)
+        self.host = host
+        self.port = port
+
+    def _lines(self) -> list[str]:
+        prefix = self.prefix
+        lines: list[str] = []
+        for (name, code), count in self.invocations.items():
+            lines.append(f"{prefix}.{name}.invocations:{count}|c")
+            lines.append(f"{prefix}.{name}.exit_code.{code}:{count}|c")
+        for (name, phase), durations in self.timings.items():
+            lines.extend(
+                f"{prefix}.{name}.{phase}:{seconds * 1000:.3f}|ms"
+                for seconds in durations
+            )
+        for name, rss in self.peak_rss.items():
+            lines.append(f"{prefix}.{name}.peak_rss:{rss}|g")
+        return lines
+
+    def _datagrams(self) -> list[bytes]:
+        datagrams: list[bytes] = []
+        current = b""
+        for line in self._lines():
+            data = line.encode()
+            if current and len(current) + len(data) + 1 > self.MAX_DATAGRAM:
+                datagrams.append(current)
+                current = b""
+            current = current + b"\n" + data if current else data
+        if current:
+            datagrams.append(current)
+        return datagrams
+
+    def write(self):
+        import socket
+
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for datagram in self._datagrams():
+                try:
+                    sock.sendto(datagram, (self.host, self.port))
+                except OSError as e:
+                    log.debug("dropping metrics datagram: %r", e)
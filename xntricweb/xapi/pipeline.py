@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import os
+import pickle
+import sys
+from contextvars import copy_context
+from functools import partial
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from time import perf_counter
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    Optional,
+)
+
+from .const import log
+from .tracing import flush, span
+
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+
+type StageMode = Literal["inline", "thread", "process"]
+
+STAGE_MODES: tuple[StageMode, ...] = ("inline", "thread", "process")
+
+QUEUE_SIZE = 64
+"""Batches buffered between two stages before the producing stage blocks."""
+
+BATCH_SIZE = 256
+"""Items sent per message to and from process stages."""
+
+_POLL_INTERVAL = 0.1
+
+
+class _Failure:
+    """An exception raised by a producing stage, re-raised by its consumer."""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _picklable(error: BaseException) -> BaseException:
+    try:
+        pickle.dumps(error)
+    except Exception:
+        return RuntimeError(f"{error.__class__.__name__}: {error}")
+    return error
+
+
+class StageStats:
+    """The throughput of one stage and the depth of the queue it fills."""
+
+    name: str
+    """The entrypoint producing the items."""
+
+    capacity: int
+    """The size of the queue the stage fills, 0 for inline stages."""
+
+    items: int
+    """Items the next stage received."""
+
+    __slots__ = (
+        "name",
+        "capacity",
+        "items",
+        "max_depth",
+        "started",
+        "finished",
+        "_depths",
+        "_samples",
+    )
+
+    def __init__(self, name: str, capacity: int = 0):
+        self.name = name
+        self.capacity = capacity
+        self.items = 0
+        self.max_depth = 0
+        self.started = perf_counter()
+        self.finished: Optional[float] = None
+        self._depths = 0
+        self._samples = 0
+
+    def sample(self, depth: int):
+        self.max_depth = max(self.max_depth, depth)
+        self._depths += depth
+        self._samples += 1
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or perf_counter()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Items per second."""
+        elapsed = self.elapsed
+        return self.items / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def mean_depth(self) -> float:
+        return self._depths / self._samples if self._samples else 0.0
+
+    def __str__(self):
+        text = (
+            f"{self.name}: {self.items} items in {self.elapsed:.3f}s"
+            f" ({self.throughput:.0f}/s)"
+        )
+        if self.capacity:
+            text += (
+                f", queue depth max {self.max_depth}/{self.capacity}"
+                f" mean {self.mean_depth:.1f}"
+            )
+        return text
+
+
+def _qsize(queue: Any) -> int:
+    try:
+        return queue.qsize()
+    except NotImplementedError:
+        # multiprocessing queues can't tell on macOS
+        return 0
+
+
+def _produce(
+    source: Iterable[Any],
+    put: Callable[[Any], bool],
+    batch_size: int,
+):
+    # sends lists of items, then None, a failure ends the stream instead
+    try:
+        batch: list[Any] = []
+        for item in source:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                if not put(batch):
+                    return
+                batch = []
+        if batch and not put(batch):
+            return
+        put(None)
+    except BaseException as e:
+        put(_Failure(_picklable(e)))
+    finally:
+        if close := getattr(source, "close", None):
+            close()
+
+
+def _run_stage(
+    name: str,
+    source: Iterable[Any],
+    put: Callable[[Any], bool],
+    batch_size: int,
+):
+    with span(f"stage {name}"):
+        _produce(source, put, batch_size)
+    # the stage can outlive the invocation's span, or run in a fork
+    flush()
+
+
+def _consume(
+    get: Callable[[], Any],
+    depth: Callable[[], int],
+    stats: StageStats,
+    stop: Callable[[], None],
+) -> Iterator[Any]:
+    try:
+        while True:
+            stats.sample(depth())
+            message = get()
+            if message is None:
+                return
+            if isinstance(message, _Failure):
+                raise message.error
+            stats.items += len(message)
+            yield from message
+    finally:
+        stats.finished = perf_counter()
+        stop()
+
+
+def _count(source: Iterator[Any], stats: StageStats) -> Iterator[Any]:
+    try:
+        for item in source:
+            stats.items += 1
+            yield item
+    finally:
+        stats.finished = perf_counter()
+
+
+def _put_until(queue: Queue[Any], stopped: Event, message: Any) -> bool:
+    while not stopped.is_set():
+        try:
+            queue.put(message, timeout=_POLL_INTERVAL)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _thread_stage(
+    source: Iterator[Any], stats: StageStats, queue_size: int, batch_size: int
+) -> Iterator[Any]:
+    queue: Queue[Any] = Queue(queue_size)
+    stopped = Event()
+    # the stage inherits the trace context of the command it feeds
+    thread = Thread(
+        target=copy_context().run,
+        args=(
+            _run_stage,
+            stats.name,
+            source,
+            partial(_put_until, queue, stopped),
+            batch_size,
+        ),
+        name=f"xapi-stage-{stats.name}",
+        daemon=True,
+    )
+    thread.start()
+    return _consume(
+        queue.get, queue.qsize, stats, partial(_stop_thread, thread, stopped)
+    )
+
+
+def _stop_thread(thread: Thread, stopped: Event):
+    stopped.set()
+    thread.join()
+
+
+def _put_blocking(queue: Any, message: Any) -> bool:
+    queue.put(message)
+    return True
+
+
+def _exited(process: BaseProcess, owner: int) -> bool:
+    # a stage consumed in another stage's process can only be waited on by
+    # the process that started it
+    return os.getpid() == owner and not process.is_alive()
+
+
+def _get_from_process(queue: Any, process: BaseProcess, owner: int, name: str) -> Any:
+    while True:
+        try:
+            return queue.get(timeout=_POLL_INTERVAL)
+        except Empty:
+            if _exited(process, owner) and queue.empty():
+                raise RuntimeError(
+                    f"{name} stage exited with code {process.exitcode}"
+                ) from None
+
+
+def _stop_process(process: BaseProcess, owner: int):
+    if os.getpid() != owner:
+        return
+    if process.is_alive():
+        process.terminate()
+    process.join()
+
+
+def _process_stage(
+    source: Iterator[Any], stats: StageStats, queue_size: int, batch_size: int
+) -> Iterator[Any]:
+    import multiprocessing
+
+    # the generator object is handed to the child as is, which only a
+    # forked child can receive
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        raise ValueError(
+            "Process stages need the fork start method, use thread stages"
+        ) from None
+
+    queue = context.Queue(queue_size)
+    process = context.Process(
+        target=_run_stage,
+        args=(stats.name, source, partial(_put_blocking, queue), batch_size),
+        name=f"xapi-stage-{stats.name}",
+        daemon=True,
+    )
+    process.start()
+    owner = os.getpid()
+    return _consume(
+        partial(_get_from_process, queue, process, owner, stats.name),
+        partial(_qsize, queue),
+        stats,
+        partial(_stop_process, process, owner),
+    )
+
+
+class Pipeline:
+    """
+    Connects chained entrypoints that yield to the ones consuming their
+    items, e.g. ``read big.log :: filter --level error :: count``.
+
+    Inline stages pull items lazily on the consumer's thread. Thread and
+    process stages run the producing entrypoint ahead of the consumer,
+    connected by a bounded queue so memory stays bounded when the
+    consumer is slower.
+    """
+
+    mode: StageMode
+    """Where producing stages run: inline, in a thread or in a process."""
+
+    queue_size: int
+    """Messages buffered per connection before the producer blocks."""
+
+    batch_size: int
+    """Items per message, batching amortizes the cost of each hand-off."""
+
+    stages: list[StageStats]
+    """The stats of every connected stage, in chain order."""
+
+    __slots__ = ("mode", "queue_size", "batch_size", "stages")
+
+    def __init__(
+        self,
+        mode: StageMode = "inline",
+        queue_size: int = QUEUE_SIZE,
+        batch_size: Optional[int] = None,
+    ):
+        if mode not in STAGE_MODES:
+            raise ValueError(f"Unknown stage mode {mode!r}")
+        if queue_size < 1:
+            raise ValueError("The queue size must be positive")
+
+        self.mode = mode
+        self.queue_size = queue_size
+        self.batch_size = batch_size or (BATCH_SIZE if mode == "process" else 1)
+        self.stages = []
+
+    def connect(self, name: str, source: Iterator[Any]) -> Iterator[Any]:
+        """
+        Returns the iterator the next stage consumes the items `source`
+        yields through.
+
+        :param name: The producing entrypoint, for the stats.
+        """
+        log.debug("connecting %s stage %r", self.mode, name)
+        if self.mode == "inline":
+            stats = StageStats(name)
+            self.stages.append(stats)
+            return _count(source, stats)
+
+        stats = StageStats(name, self.queue_size)
+        self.stages.append(stats)
+        stage = _thread_stage if self.mode == "thread" else _process_stage
+        return stage(source, stats, self.queue_size, self.batch_size)
+
+    def report(self, file: Optional[IO[str]] = None):
+        """Prints the stats of every stage, to stderr by default."""
+        for stats in self.stages:
+            print(stats, file=file or sys.stderr)
+
+    def report_after(
+        self, items: Iterator[Any], file: Optional[IO[str]] = None
+    ) -> Iterator[Any]:
+        """
+        Yields the items of the final stage and prints the stats once they
+        are exhausted, or the consumer stopped early.
+        """
+        try:
+            yield from items
+        finally:
+            self.report(file)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from contextvars import ContextVar, Token
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from .const import log
+
+type Teardown = Callable[[], Any]
+
+_teardowns: ContextVar[Optional[list[Teardown]]] = ContextVar(
+    "xapi_teardowns", default=None
+)
+
+
+def register_teardown(teardown: Teardown) -> bool:
+    """
+    Registers `teardown` to run when the active :class:`ResourceScope`
+    exits. Converters that open files, maps or streams use this to have
+    them closed once the entrypoint returns.
+
+    :returns: False when no scope is active, the caller then owns the
+        resource.
+    """
+    teardowns = _teardowns.get()
+    if teardowns is None:
+        log.debug("no resource scope active for teardown %r", teardown)
+        return False
+
+    teardowns.append(teardown)
+    return True
+
+
+def _run_teardowns(teardowns: list[Teardown], error: Optional[BaseException]):
+    failure: Optional[BaseException] = None
+    for teardown in reversed(teardowns):
+        log.debug("running teardown %r", teardown)
+        try:
+            teardown()
+        except BaseException as e:
+            log.debug("teardown %r failed: %r", teardown, e)
+            failure = failure or e
+
+    # an exception from the entrypoint takes precedence
+    if failure and not error:
+        raise failure
+
+
+def _deferred[T](iterator: Iterator[T], teardowns: list[Teardown]) -> Iterator[T]:
+    error: Optional[BaseException] = None
+    try:
+        yield from iterator
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _run_teardowns(teardowns, error)
+
+
+async def _deferred_await[T](awaitable: Awaitable[T], teardowns: list[Teardown]) -> T:
+    error: Optional[BaseException] = None
+    try:
+        return await awaitable
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _run_teardowns(teardowns, error)
+
+
+class ResourceScope:
+    """
+    Collects the teardowns registered while it is active and runs them,
+    most recent first, when it exits.
+    """
+
+    __slots__ = ("_token",)
+
+    def __init__(self):
+        self._token: Optional[Token[Optional[list[Teardown]]]] = None
+
+    def __enter__(self):
+        self._token = _teardowns.set([])
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        assert self._token
+        teardowns = _teardowns.get()
+        _teardowns.reset(self._token)
+        self._token = None
+
+        if teardowns:
+            _run_teardowns(teardowns, exc_info[1])
+
+    def defer[T](self, iterator: Iterator[T]) -> Iterator[T]:
+        """
+        Hands the teardowns registered so far to `iterator`, they run once
+        it is exhausted or closed instead of when the scope exits. Used for
+        entrypoints that yield from the files they were given.
+        """
+        teardowns = _teardowns.get()
+        if not teardowns:
+            return iterator
+
+        _teardowns.set([])
+        return _deferred(iterator, teardowns)
+
+    def defer_await[T](self, awaitable: Awaitable[T]) -> Awaitable[T]:
+        """
+        Like :meth:`defer`, the teardowns run once `awaitable`, returned by
+        an ``async`` entrypoint, completes.
+        """
+        teardowns = _teardowns.get()
+        if not teardowns:
+            return awaitable
+
+        _teardowns.set([])
+        return _deferred_await(awaitable, teardowns)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import os
+from hashlib import blake2b
+from typing import Any, Callable, Iterable, Iterator, Literal, Optional
+
+from .const import log
+
+type ShardMode = Literal["hash", "range"]
+
+SHARD_MODES: tuple[ShardMode, ...] = ("hash", "range")
+
+type Shard = tuple[int, int]
+"""A zero based shard index and the shard count."""
+
+
+def parse_shard(value: str) -> Shard:
+    """
+    Parses ``INDEX/COUNT``, INDEX counts from 1 so ``1/4`` to ``4/4`` cover
+    every item.
+    """
+    index, separator, count = value.partition("/")
+    try:
+        shard = int(index) - 1, int(count)
+    except ValueError:
+        shard = None
+
+    if not separator or not shard or not 0 <= shard[0] < shard[1]:
+        raise ValueError(f"Invalid shard {value!r}, expected INDEX/COUNT like 1/4")
+    return shard
+
+
+def _key_bytes(item: Any) -> bytes:
+    if isinstance(item, bytes):
+        return item
+    if isinstance(item, (str, os.PathLike)):
+        return os.fsencode(item)  # type: ignore
+    if path := getattr(item, "path", None):
+        # files given as arguments shard by their path, not their state
+        return os.fsencode(path)
+    return repr(item).encode()
+
+
+def stable_hash(item: Any) -> int:
+    """
+    A hash of `item` that is the same in every process and on every
+    machine, unlike ``hash()`` of str and bytes.
+    """
+    return int.from_bytes(blake2b(_key_bytes(item), digest_size=8).digest())
+
+
+class ShardPolicy:
+    """
+    Splits an entrypoint's variadic (or streamed) input between the
+    invocations of one command line, each processing a deterministic part.
+
+    Pass it as ``@xapi.entrypoint(shard=ShardPolicy(...))``, the command
+    then accepts ``--shard INDEX/COUNT`` and ``--shard-by``.
+    """
+
+    argument: Optional[str]
+    """The argument holding the items, defaults to the ``*args`` argument."""
+
+    by: ShardMode
+    """
+    ``hash`` assigns items by a stable hash, so an item stays in its shard
+    as others are added. ``range`` assigns contiguous, equally sized runs
+    and needs the whole input, streamed input is collected first.
+    """
+
+    key: Optional[Callable[[Any], Any]]
+    """Returns what an item is hashed by, the item itself by default."""
+
+    __slots__ = ("argument", "by", "key")
+
+    def __init__(
+        self,
+        argument: Optional[str] = None,
+        by: ShardMode = "hash",
+        key: Optional[Callable[[Any], Any]] = None,
+    ):
+        if by not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode {by!r}")
+
+        self.argument = argument
+        self.by = by
+        self.key = key
+
+    def partition(
+        self, values: Iterable[Any], shard: Shard, by: Optional[ShardMode] = None
+    ) -> Iterable[Any]:
+        """
+        Returns the items of `values` belonging to `shard`. Lists and
+        tuples keep their type, other iterables are filtered lazily when
+        hashing.
+        """
+        index, count = shard
+        by = by or self.by
+        log.debug("taking shard %d/%d of %r by %s", index + 1, count, values, by)
+
+        if by == "range":
+            items = values if isinstance(values, (list, tuple)) else list(values)
+            size = len(items)
+            part = items[size * index // count : size * (index + 1) // count]
+            return part if isinstance(values, (list, tuple)) else iter(part)
+
+        selected = self._select(values, index, count)
+        if isinstance(values, (list, tuple)):
+            return values.__class__(selected)
+        return selected
+
+    def _select(self, values: Iterable[Any], index: int, count: int) -> Iterator[Any]:
+        key = self.key
+        for item in values:
+            if stable_hash(key(item) if key else item) % count == index:
+                yield item
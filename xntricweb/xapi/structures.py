@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from functools import partial
+from typing import Any, Callable, cast, get_type_hints, is_typeddict
+from weakref import WeakKeyDictionary
+
+from .arguments import (
+    ConversionError,
+    _convert,
+    _function_converter,
+    _get_converter,
+    _load_json,
+)
+from .const import NOT_SPECIFIED, AnyType, log
+
+type Plan = Callable[[Any], Any]
+"""Builds a value of a structured type from its parsed json."""
+
+
+def _passthrough(value: Any) -> Any:
+    return value
+
+
+def _coerce(annotation: type[Any], value: Any) -> Any:
+    return value if value.__class__ is annotation else annotation(value)
+
+
+def _get_element_converter(annotation: AnyType) -> Plan:
+    if annotation is None or annotation is Any:
+        return _passthrough
+
+    # json already produces str, int, float, bool, list and dict, plain
+    # classes only need calling when the parsed type differs
+    if isinstance(annotation, type) and _get_converter(annotation) in (
+        None,
+        _function_converter,
+    ):
+        return partial(_coerce, annotation)
+
+    return partial(_convert, annotation=annotation)
+
+
+def is_structure(origin: Any) -> bool:
+    """Whether `origin` is a dataclass or TypedDict."""
+    return isinstance(origin, type) and (
+        hasattr(origin, "__dataclass_fields__") or is_typeddict(origin)
+    )
+
+
+def get_fields(origin: type[Any]) -> dict[str, AnyType]:
+    """
+    Returns the annotation of each field `origin` is constructed from, in
+    declaration order.
+    """
+    hints = get_type_hints(origin, include_extras=True)
+    dataclass_fields = getattr(origin, "__dataclass_fields__", None)
+    if not dataclass_fields:
+        return hints
+
+    import dataclasses
+
+    # fields() leaves out ClassVar and InitVar pseudo fields, InitVar[T] is
+    # passed to __init__ as a T
+    initialized = {field.name for field in dataclasses.fields(origin) if field.init}
+    fields: dict[str, AnyType] = {}
+    for name in dataclass_fields:
+        annotation = hints.get(name, Any)
+        if isinstance(annotation, dataclasses.InitVar):
+            fields[name] = annotation.type
+        elif name in initialized:
+            fields[name] = annotation
+    return fields
+
+
+_dict_plans: dict[tuple[AnyType, ...], Plan] = {}
+
+_structure_plans: WeakKeyDictionary[type[Any], Plan] = WeakKeyDictionary()
+
+
+def get_dict_plan(origin_args: tuple[AnyType, ...]) -> Plan:
+    """Returns the plan converting the keys and values of a ``dict[K, V]``."""
+    if plan := _dict_plans.get(origin_args):
+        return plan
+
+    key, value = (
+        _get_element_converter(annotation) for annotation in origin_args
+    )
+
+    def dict_plan(data: Any) -> dict[Any, Any]:
+        if not isinstance(data, dict):
+            raise ConversionError(f"Expected a json object, found {data!r}")
+        return {key(k): value(v) for k, v in data.items()}
+
+    _dict_plans[origin_args] = dict_plan
+    return dict_plan
+
+
+def get_structure_plan(origin: type[Any]) -> Plan:
+    """
+    Returns the plan constructing the dataclass or TypedDict `origin`
+    from a json object, built once per type.
+    """
+    if plan := _structure_plans.get(origin):
+        return plan
+
+    log.debug("compiling structure plan for %r", origin)
+    fields = tuple(
+        (name, _get_element_converter(annotation))
+        for name, annotation in get_fields(origin).items()
+    )
+    names = frozenset(name for name, _ in fields)
+    instance_type = None if is_typeddict(origin) else origin
+
+    def structure_plan(data: Any) -> Any:
+        if instance_type and isinstance(data, instance_type):
+            return data
+        if not isinstance(data, dict):
+            raise ConversionError(f"Expected a json object, found {data!r}")
+        if unknown := data.keys() - names:
+            raise ConversionError(
+                f"Unknown fields for {origin.__name__}: {', '.join(sorted(unknown))}"
+            )
+
+        try:
+            return origin(
+                **{
+                    name: convert(data[name])
+                    for name, convert in fields
+                    if name in data
+                }
+            )
+        except TypeError as e:
+            if isinstance(e, ConversionError):
+                raise
+            raise ConversionError(f"Unable to build {origin.__name__}: {e}")
+
+    _structure_plans[origin] = structure_plan
+    return structure_plan
+
+
+type FlatField = tuple[str, AnyType, Any]
+"""A leaf field of a flattened structure: dotted path, annotation, default."""
+
+_flat_fields: WeakKeyDictionary[type[Any], tuple[FlatField, ...]] = (
+    WeakKeyDictionary()
+)
+
+
+def get_flat_fields(origin: type[Any]) -> tuple[FlatField, ...]:
+    """
+    Returns the leaf fields of the dataclass or TypedDict `origin`, nested
+    structures are expanded with dotted paths. Fields without a default
+    have a default of NOT_SPECIFIED.
+    """
+    if (flat := _flat_fields.get(origin)) is not None:
+        return flat
+
+    defaults: dict[str, Any] = {}
+    if dataclass_fields := getattr(origin, "__dataclass_fields__", None):
+        from dataclasses import MISSING
+
+        defaults = {
+            name: field.default
+            for name, field in dataclass_fields.items()
+            if field.default is not MISSING
+        }
+
+    leaves: list[FlatField] = []
+    for name, annotation in get_fields(origin).items():
+        if is_structure(annotation):
+            leaves.extend(
+                (f"{name}.{path}", leaf, default)
+                for path, leaf, default in get_flat_fields(cast(type, annotation))
+            )
+        else:
+            leaves.append((name, annotation, defaults.get(name, NOT_SPECIFIED)))
+
+    flat = _flat_fields[origin] = tuple(leaves)
+    return flat
+
+
+def _as_fields(value: Any) -> dict[str, Any]:
+    if isinstance(value, dict):
+        return dict(cast(dict[str, Any], value))
+    if dataclass_fields := getattr(value, "__dataclass_fields__", None):
+        return {name: getattr(value, name) for name in dataclass_fields}
+    raise ConversionError(f"Expected a json object, found {value!r}")
+
+
+def assemble(base: Any, values: dict[tuple[str, ...], Any]) -> dict[str, Any]:
+    """
+    Overlays the flattened option `values`, keyed by field path, onto
+    `base`: a json source, object or structure instance (or None).
+    """
+    if isinstance(base, (str, bytes)):
+        base = _load_json(base)
+
+    data = _as_fields(base) if base is not None else {}
+    for path, value in values.items():
+        node = data
+        for name in path[:-1]:
+            child = node.get(name)
+            node[name] = child = _as_fields(child) if child is not None else {}
+            node = child
+        node[path[-1]] = value
+    return data
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache, partial
+from typing import Any, Callable, Hashable, Optional, Sequence, cast
+
+CACHE_SIZE = 4096
+"""Parsed temporal values kept per process, they are immutable."""
+
+
+class TimeFormat:
+    """
+    A ``strptime`` format hint for datetime, date and time parameters,
+    e.g. ``Annotated[date, TimeFormat("%d/%m/%Y")]``. ``%s`` parses
+    seconds since the epoch, see :data:`EPOCH`.
+    """
+
+    __slots__ = ("format",)
+
+    def __init__(self, format: str):
+        self.format = format
+
+    def __eq__(self, other: Any):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.format == other.format
+
+    def __hash__(self):
+        return hash(self.format)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.format!r})"
+
+
+EPOCH = TimeFormat("%s")
+"""Parses seconds since the epoch into a UTC datetime (or date)."""
+
+
+_timedelta_units = {
+    "w": "weeks",
+    "d": "days",
+    "h": "hours",
+    "m": "minutes",
+    "s": "seconds",
+    "ms": "milliseconds",
+    "us": "microseconds",
+}
+
+_timedelta_part = re.compile(r"(\d+(?:\.\d*)?)(ms|us|[wdhms])")
+_timedelta_clock = re.compile(
+    r"(?:(\d+)\s*days?,\s*)?(\d+):(\d{2})(?::(\d{2}(?:\.\d*)?))?"
+)
+
+
+def _parse_timedelta(value: str) -> timedelta:
+    text = value.strip()
+    sign = -1 if text.startswith("-") else 1
+    text = text.lstrip("+-")
+
+    # plain seconds
+    try:
+        return timedelta(seconds=sign * float(text))
+    except ValueError:
+        pass
+
+    # [D day[s], ]H:MM[:SS[.ffffff]], as str(timedelta) renders it
+    if match := _timedelta_clock.fullmatch(text):
+        days, hours, minutes, seconds = match.groups()
+        return sign * timedelta(
+            days=int(days or 0),
+            hours=int(hours),
+            minutes=int(minutes),
+            seconds=float(seconds or 0),
+        )
+
+    # 1d2h30m, 1.5h, 500ms
+    parts = _timedelta_part.findall(text)
+    if parts and "".join(number + unit for number, unit in parts) == text:
+        return sign * timedelta(
+            **{_timedelta_units[unit]: float(number) for number, unit in parts}
+        )
+
+    raise ValueError(f"Invalid timedelta: {value!r}")
+
+
+def _parse_epoch(origin: type[Any], value: str | float) -> Any:
+    seconds = float(value)
+    if issubclass(origin, datetime):
+        return origin.fromtimestamp(seconds, tz=timezone.utc)
+
+    parsed = datetime.fromtimestamp(seconds, tz=timezone.utc)
+    if issubclass(origin, date):
+        return origin.fromordinal(parsed.toordinal())
+    return parsed.timetz()
+
+
+def _parse_uncached(origin: type[Any], format: Optional[str], value: str) -> Any:
+    if format == "%s":
+        return _parse_epoch(origin, value)
+
+    if issubclass(origin, timedelta):
+        delta = _parse_timedelta(value)
+        if origin is timedelta:
+            return delta
+        return origin(delta.days, delta.seconds, delta.microseconds)
+
+    if format is None:
+        return origin.fromisoformat(value)
+
+    if issubclass(origin, datetime):
+        return origin.strptime(value, format)
+
+    parsed = datetime.strptime(value, format)
+    if issubclass(origin, date):
+        return origin.fromordinal(parsed.toordinal())
+    return parsed.time()
+
+
+_parse_cached = lru_cache(maxsize=CACHE_SIZE)(_parse_uncached)
+
+
+def _parse(origin: type[Any], format: Optional[str], value: Any) -> Any:
+    if isinstance(value, origin):
+        return value
+
+    if isinstance(value, str):
+        # classes are hashable, lru_cache's stubs don't know that
+        return _parse_cached(cast(Hashable, origin), format, value)
+
+    if format == "%s" and isinstance(value, (int, float)):
+        return _parse_epoch(origin, value)
+
+    raise ValueError(f"Cannot parse {value!r} as {origin.__name__}")
+
+
+def get_parser(
+    origin: type[Any], metadata: Sequence[Any] = ()
+) -> Callable[[Any], Any]:
+    """
+    Returns a cached parser turning a token into an `origin` instance.
+
+    :param origin: datetime, date, time or timedelta (or a subclass).
+    :param metadata: ``Annotated`` metadata, the first :class:`TimeFormat`
+        selects the format, ISO 8601 is used otherwise.
+    """
+    format = None
+    for hint in metadata:
+        if isinstance(hint, TimeFormat):
+            format = hint.format
+            break
+
+    return partial(_parse, origin, format)
+
+
+def clear_cache():
+    """Drops every cached parse result."""
+    _parse_cached.cache_clear()
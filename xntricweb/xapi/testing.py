@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import os
+import sys
+from typing import Iterable, Optional, Sequence
+
+# runs in a fresh interpreter: imports the app, runs one invocation and
+# writes what it cost to the file named by the first argument
+_PROBE = """\
+import sys
+import time
+
+output, target, run = sys.argv[1], sys.argv[2], sys.argv[3] == "1"
+before = set(sys.modules)
+started = time.perf_counter()
+
+module, _, attribute = target.partition(":")
+__import__(module)
+code = 0
+if run:
+    app = getattr(sys.modules[module], attribute or "xapi")
+    try:
+        app.run(sys.argv[4:])
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else int(e.code is not None)
+
+elapsed = time.perf_counter() - started
+modules = sorted(set(sys.modules) - before)
+with open(output, "w") as f:
+    f.write(f"{elapsed}\\n{code}\\n" + " ".join(modules))
+sys.exit(code)
+"""
+
+
+class StartupProfile:
+    """What importing an app and running one invocation cost."""
+
+    elapsed_ms: float
+    """Milliseconds from importing the app until the invocation returned."""
+
+    wall_ms: float
+    """Milliseconds the whole process took, including interpreter startup."""
+
+    modules: frozenset[str]
+    """The modules imported on top of the interpreter's own."""
+
+    exit_code: int
+
+    __slots__ = ("elapsed_ms", "wall_ms", "modules", "exit_code")
+
+    def __init__(
+        self, elapsed_ms: float, wall_ms: float, modules: Iterable[str], exit_code: int
+    ):
+        self.elapsed_ms = elapsed_ms
+        self.wall_ms = wall_ms
+        self.modules = frozenset(modules)
+        self.exit_code = exit_code
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(elapsed_ms={self.elapsed_ms:.1f},"
+            f" wall_ms={self.wall_ms:.1f}, modules={len(self.modules)},"
+            f" exit_code={self.exit_code})"
+        )
+
+
+def measure_startup(
+    app: str,
+    argv: Optional[Sequence[str]] = None,
+    repeat: int = 1,
+    cwd: Optional[str | os.PathLike[str]] = None,
+    python: Optional[str] = None,
+) -> StartupProfile:
+    """
+    Runs `app` in a fresh interpreter and measures the invocation.
+
+    :param app: ``module:attribute`` naming the XAPI instance, the
+        attribute defaults to ``xapi``. A bare module is only imported when
+        `argv` is None.
+    :param argv: The command line to run, None only imports the app.
+    :param repeat: Runs measured, the fastest is returned.
+    :param cwd: The directory to run in, it is on the import path.
+    :param python: The interpreter, defaults to the running one.
+    """
+    import subprocess
+    import tempfile
+    from time import perf_counter
+
+    best: Optional[StartupProfile] = None
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "profile")
+        command = [
+            python or sys.executable,
+            "-c",
+            _PROBE,
+            output,
+            app,
+            "0" if argv is None else "1",
+            *(argv or ()),
+        ]
+        for _ in range(max(repeat, 1)):
+            started = perf_counter()
+            process = subprocess.run(command, capture_output=True, text=True, cwd=cwd)
+            wall_ms = (perf_counter() - started) * 1000
+
+            if not os.path.exists(output):
+                raise AssertionError(
+                    f"{app} {' '.join(argv or ())} failed:\n{process.stderr}"
+                )
+            with open(output) as f:
+                elapsed, code, modules = f.read().split("\n", 2)
+            os.unlink(output)
+
+            profile = StartupProfile(
+                float(elapsed) * 1000, wall_ms, modules.split(), int(code)
+            )
+            if best is None or profile.elapsed_ms < best.elapsed_ms:
+                best = profile
+
+    assert best
+    return best
+
+
+def assert_startup_budget(
+    app: str,
+    argv: Optional[Sequence[str]] = None,
+    max_ms: Optional[float] = None,
+    max_modules: Optional[int] = None,
+    forbidden_modules: Iterable[str] = (),
+    repeat: int = 3,
+    cwd: Optional[str | os.PathLike[str]] = None,
+    python: Optional[str] = None,
+) -> StartupProfile:
+    """
+    Fails when importing `app` and running `argv` in a fresh interpreter
+    is slower than `max_ms`, imports more than `max_modules` modules, or
+    imports any of `forbidden_modules`. The invocation must exit with 0.
+
+    Intended for CI, e.g. ``assert_startup_budget("myapp.cli:xapi",
+    ["--help"], max_ms=150, max_modules=80)``. Timing uses the fastest of
+    `repeat` runs and excludes the interpreter's own startup.
+
+    :returns: The measured profile.
+    """
+    profile = measure_startup(app, argv, repeat, cwd, python)
+    invocation = " ".join([app, *(argv or ())])
+
+    if profile.exit_code:
+        raise AssertionError(f"{invocation} exited with {profile.exit_code}")
+
+    if max_ms is not None and profile.elapsed_ms > max_ms:
+        raise AssertionError(
+            f"{invocation} took {profile.elapsed_ms:.1f} ms,"
+            f" the budget is {max_ms:.1f} ms"
+        )
+
+    if max_modules is not None and len(profile.modules) > max_modules:
+        raise AssertionError(
+            f"{invocation} imported {len(profile.modules)} modules, the budget"
+            f" is {max_modules}: {' '.join(sorted(profile.modules))}"
+        )
+
+    if imported := profile.modules.intersection(forbidden_modules):
+        raise AssertionError(
+            f"{invocation} imported {', '.join(sorted(imported))}"
+        )
+
+    return profile
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import os
+from contextvars import ContextVar, Token
+from threading import Lock
+from time import time_ns
+from typing import Any, Optional, Sequence
+
+from .const import log
+
+_tracer: ContextVar[Optional[Tracer]] = ContextVar("xapi_tracer", default=None)
+_current: ContextVar[Optional[Span]] = ContextVar("xapi_span", default=None)
+
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+_KIND_INTERNAL = 1
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64 bit integers are strings in OTLP json
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {
+            "arrayValue": {
+                "values": [_otlp_value(item) for item in value]  # type: ignore
+            }
+        }
+    return {"stringValue": value if isinstance(value, str) else repr(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+class Span:
+    """A timed operation within a trace, children nest by their parent id."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+
+    attributes: dict[str, Any]
+    """Details recorded with the span, str, bool, int, float or lists."""
+
+    error: Optional[str]
+    """The exception the operation ended with."""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "error",
+        "start",
+        "end",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        attributes: Optional[dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        self.start = time_ns()
+        self.end: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict[str, Any]:
+        """The span in the OpenTelemetry protocol's json encoding."""
+        span: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end or time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": (
+                {"code": _STATUS_ERROR, "message": self.error}
+                if self.error
+                else {"code": _STATUS_OK}
+            ),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name!r}, span_id={self.span_id!r})"
+
+
+class FileExporter:
+    """
+    Appends finished spans to a file as OTLP json lines, one export request
+    per line, the format OpenTelemetry collectors' file exporter writes
+    and trace viewers import.
+    """
+
+    path: str
+    service_name: str
+
+    __slots__ = ("path", "service_name")
+
+    def __init__(self, path: str | os.PathLike[str], service_name: str = "xapi"):
+        self.path = os.fspath(path)
+        self.service_name = service_name
+
+    def export(self, spans: Sequence[Span]):
+        import json
+
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": _otlp_attributes(
+                                {
+                                    "service.name": self.service_name,
+                                    "process.pid": os.getpid(),
+                                }
+                            )
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "xntricweb.xapi"},
+                                "spans": [span.to_otlp() for span in spans],
+                            }
+                        ],
+                    }
+                ]
+            },
+            separators=(",", ":"),
+        )
+        if directory := os.path.dirname(self.path):
+            os.makedirs(directory, exist_ok=True)
+        # a single append keeps lines whole when processes share the file
+        with open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class Tracer:
+    """
+    Buffers the spans of the invocations it traces and exports them once
+    the invocation ends. Enable it with :meth:`XAPI.trace
+    <xntricweb.xapi.xapi.XAPI.trace>`.
+    """
+
+    exporter: FileExporter
+
+    __slots__ = ("exporter", "_spans", "_pid", "_lock")
+
+    def __init__(self, exporter: FileExporter):
+        self.exporter = exporter
+        self._spans: list[Span] = []
+        self._pid = os.getpid()
+        self._lock = Lock()
+
+    def _finish(self, span: Span):
+        with self._lock:
+            if self._pid != os.getpid():
+                # a forked stage only exports the spans it finished itself
+                self._spans = []
+                self._pid = os.getpid()
+            self._spans.append(span)
+
+    def flush(self):
+        """Exports and drops the finished spans."""
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans:
+            return
+        try:
+            self.exporter.export(spans)
+        except Exception as e:
+            log.debug("exporting %d spans failed: %r", len(spans), e)
+
+
+class _SpanScope:
+    __slots__ = ("_tracer", "_span", "_token")
+
+    def __init__(self, tracer: Tracer, span: Span):
+        self._tracer = tracer
+        self._span = span
+        self._token: Optional[Token[Optional[Span]]] = None
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, error_type: Any, error: Optional[BaseException], _: Any):
+        span = self._span
+        span.end = time_ns()
+        if error is not None and not (
+            isinstance(error, SystemExit) and error.code in (0, None)
+        ):
+            span.error = f"{error.__class__.__name__}: {error}"
+        if self._token:
+            _current.reset(self._token)
+        self._tracer._finish(span)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *_: Any):
+        return None
+
+
+_no_span = _NoSpan()
+
+
+def span(name: str, **attributes: Any) -> _SpanScope | _NoSpan:
+    """
+    Starts a child span of the current one, for use as a context manager
+    inside a command: ``with span("load", rows=len(rows)): ...``.
+
+    Yields the :class:`Span`, or None when the invocation isn't traced.
+    """
+    if not (tracer := _tracer.get()):
+        return _no_span
+    return _SpanScope(tracer, Span(name, _current.get(), attributes))
+
+
+def current_span() -> Optional[Span]:
+    """The innermost active span, None when the invocation isn't traced."""
+    return _current.get() if _tracer.get() else None
+
+
+def flush():
+    """Exports the spans finished so far, e.g. before a forked stage exits."""
+    if tracer := _tracer.get():
+        tracer.flush()
+
+
+class trace:
+    """
+    Traces the code run inside it with `tracer`, under a root span that is
+    exported with its children when it ends.
+    """
+
+    __slots__ = ("_tracer", "_scope", "_token")
+
+    def __init__(self, tracer: Tracer, name: str, **attributes: Any):
+        self._tracer = tracer
+        self._scope = _SpanScope(tracer, Span(name, current_span(), attributes))
+        self._token: Optional[Token[Optional[Tracer]]] = None
+
+    def __enter__(self) -> Span:
+        self._token = _tracer.set(self._tracer)
+        return self._scope.__enter__()
+
+    def __exit__(self, *exc_info: Any):
+        self._scope.__exit__(*exc_info)
+        assert self._token
+        _tracer.reset(self._token)
+        self._tracer.flush()
@@ -1,4 +1,4 @@
-from typing import Optional, get_args, get_origin, Any
+from typing import Optional, TypeAliasType, get_args, get_origin, Any
 
 from .const import AnyType
 
@@ -7,8 +7,17 @@ def get_origin_args(_type: AnyType) -> tuple[AnyType, tuple[AnyType, ...]]:
     args = get_args(_type)
 
     if origin := get_origin(_type):
+        if isinstance(origin, TypeAliasType):
+            # a parametrized ``type`` alias, e.g. numpy's NDArray[float64],
+            # resolves to its value with the parameters substituted
+            return get_origin_args(
+                origin.__value__[args] if origin.__type_params__ else origin.__value__
+            )
         return origin, args
 
+    if isinstance(_type, TypeAliasType):
+        return get_origin_args(_type.__value__)
+
     if callable(_type):
         return _type, args
 
@@ -1,14 +1,26 @@
 from typing import Any, Callable, Optional
-from .const import log
+from .const import NOT_SPECIFIED, log
 
-try:
-    import docstring_parser as parser
-except ImportError:
-    log.warning(
-        "could not import docstring_parser, install it to supplement xapi "
-        "command information"
-    )
-    parser = None
+_parser: Any = NOT_SPECIFIED
+
+
+def _get_parser() -> Any:
+    """Imports docstring_parser the first time a docstring is needed."""
+    global _parser
+
+    if _parser is NOT_SPECIFIED:
+        try:
+            import docstring_parser
+
+            _parser = docstring_parser
+        except ImportError:
+            log.warning(
+                "could not import docstring_parser, install it to supplement "
+                "xapi command information"
+            )
+            _parser = None
+
+    return _parser
 
 
 class DocInfo:
@@ -19,10 +31,10 @@ class DocInfo:
         if not fn:
             return None
 
-        if not parser:
+        if not fn.__doc__:
             return None
 
-        if not fn.__doc__:
+        if not (parser := _get_parser()):
             return None
 
         if not hasattr(fn, "__doc__"):